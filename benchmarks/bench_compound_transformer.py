@@ -0,0 +1,72 @@
+# per event cost of CompoundTransformer.handler with 50 SimpleTransformer children over
+# 5000 symbols, the old list scan + dict rebuild vs the symbol routed in place merge
+# run from the repo root with model_manager on the path:
+#   PYTHONPATH=model_manager python benchmarks/bench_compound_transformer.py
+import random, time
+from src.transformers import CompoundTransformer
+
+
+class OldCompoundTransformer(CompoundTransformer):
+    # the pre-routing implementation of CompoundTransformer.handler
+    def handler(self, name, data):
+        for transformer in self.transformers:
+            if name in transformer.input_list:
+                transformer.handler(name, data)
+                if transformer.updated:
+                    self.updated = True
+                    self.latest_transformed = {
+                        **self.latest_transformed,
+                        **transformer.latest_transformed,
+                    }
+                    self.latest_input = {
+                        **self.latest_input,
+                        **transformer.latest_input,
+                    }
+
+
+def make_config(n_children=50, n_symbols=5000):
+    per_child = n_symbols // n_children
+    transformers = {}
+    for c in range(n_children):
+        symbols = [f"CHILD{c}:PV:{i}" for i in range(per_child)]
+        variables = {
+            f"c{c}_x{i}": {"formula": f"2 * {symbols[i]} + {symbols[(i + 1) % per_child]}"}
+            for i in range(per_child)
+        }
+        transformers[f"child_{c}"] = {
+            "type": "SimpleTransformer",
+            "config": {"variables": variables, "symbols": symbols},
+        }
+    return {"transformers": transformers}
+
+
+def time_events(transformer, names, n_events):
+    start = time.perf_counter()
+    for i in range(n_events):
+        transformer.handler(names[i % len(names)], {"value": float(i)})
+    return (time.perf_counter() - start) / n_events
+
+
+def main():
+    config = make_config()
+    random.seed(0)
+    results = {}
+    for label, transformer_class in [
+        ("old", OldCompoundTransformer),
+        ("new", CompoundTransformer),
+    ]:
+        transformer = transformer_class(config)
+        # warm up so every child has all of its symbols
+        for name in transformer.input_list:
+            transformer.handler(name, {"value": 1.0})
+        names = random.sample(transformer.input_list, 1000)
+        results[label] = time_events(transformer, names, 2000)
+        print(f"{label}: {results[label] * 1e6:>10.1f} us/event")
+    print(f"speedup: {results['old'] / results['new']:.0f}x")
+    summary = transformer.child_metrics.summary(window=False)
+    slowest = max(summary, key=lambda name: summary[name]["p99"] or 0)
+    print(f"slowest child by p99: {slowest} {summary[slowest]['p99'] / 1e3:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bytes copied per camera frame on the way from the PVA server to the model input,
+# old CAImageTransfomer (np.array + reshape) vs the view based path
+# run from the repo root with model_manager on the path:
+#   EPICS_PVA_ADDR_LIST=127.0.0.1 EPICS_PVA_AUTO_ADDR_LIST=NO \
+#   PYTHONPATH=model_manager python benchmarks/bench_image_copies.py
+import time
+import numpy as np
+from src.interfaces import SimlePVAInterfaceServer
+from src.transformers import CAImageTransfomer, PassThroughTransformer
+
+
+class OldCAImageTransfomer(CAImageTransfomer):
+    # the pre-view implementation of CAImageTransfomer.transform
+    def transform(self):
+        for key in self.img_list:
+            value = self.latest_input[self.variables[key]]
+            image = np.array(value).reshape(
+                (
+                    int(self.latest_input[self.variables[key + "_y"]]),
+                    int(self.latest_input[self.variables[key + "_x"]]),
+                ),
+                order="F" if self.variables[key + "_unfolding"] == "column_major" else "C",
+            )
+            if self.variables[key + "_unfolding"] == "column_major":
+                image = image.T
+            self.latest_transformed[key] = image
+        self.updated = True
+
+
+def copied(output, source):
+    # a stage copied the frame if its output doesn't share memory with its input
+    return 0 if np.shares_memory(output, source) else output.nbytes
+
+
+def run_frame(server, image_transformer, pass_through, size):
+    stats = {}
+    raw = server.shared_pvs["CAM"].current().raw.value
+
+    start = time.perf_counter()
+    _, value = server.get("CAM")
+    frame = value["value"].reshape(-1)  # CA style flat waveform
+    stats["get"] = copied(frame, raw)
+
+    image_transformer.handler("CAM_X", {"value": size})
+    image_transformer.handler("CAM_Y", {"value": size})
+    image_transformer.handler("CAM", {"value": frame})
+    image = image_transformer.latest_transformed["img"]
+    stats["image_transform"] = copied(image, frame)
+
+    pass_through.handler("img", {"value": image})
+    stats["pass_through"] = copied(pass_through.latest_transformed["model_img"], image)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    print(
+        f"{'frame':>11} | {'unfold':>12} | {'path':>4} | {'get':>10} | "
+        f"{'transform':>10} | {'pass':>10} | {'total MB':>9} | {'ms':>7}"
+    )
+    for size in [1024, 1448, 2048]:
+        server = SimlePVAInterfaceServer(
+            {
+                "variables": {
+                    "CAM": {
+                        "name": "CAM",
+                        "proto": "pva",
+                        "type": "image",
+                        "image_size": {"x": size, "y": size},
+                    }
+                }
+            }
+        )
+        server.put("CAM", np.random.rand(size, size))
+        for unfold in ["row_major", "column_major"]:
+            config = {
+                "variables": {
+                    "img": {
+                        "img_ch": "CAM",
+                        "img_x_ch": "CAM_X",
+                        "img_y_ch": "CAM_Y",
+                        "unfold": unfold,
+                    }
+                }
+            }
+            for label, transformer_class in [
+                ("old", OldCAImageTransfomer),
+                ("new", CAImageTransfomer),
+            ]:
+                image_transformer = transformer_class(config)
+                pass_through = PassThroughTransformer({"variables": {"model_img": "img"}})
+                runs = [
+                    run_frame(server, image_transformer, pass_through, size)
+                    for _ in range(10)
+                ]
+                stats = runs[-1]
+                total = stats["get"] + stats["image_transform"] + stats["pass_through"]
+                ms = np.median([run["seconds"] for run in runs]) * 1000
+                print(
+                    f"{size}x{size:<6} | {unfold:>12} | {label:>4} | {stats['get']:>10} | "
+                    f"{stats['image_transform']:>10} | {stats['pass_through']:>10} | "
+                    f"{total / 1e6:>9.1f} | {ms:>7.3f}"
+                )
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
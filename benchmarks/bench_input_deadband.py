@@ -0,0 +1,106 @@
+# inferences and CPU time for noisy readbacks with and without input deadbands,
+# model_main is fed 20 channels of noise (sigma 1e-4) around slow steps through a local server,
+# CPU time is the whole process so it includes the server posting the updates
+# run from the repo root with model_manager on the path:
+#   EPICS_PVA_ADDR_LIST=127.0.0.1 EPICS_PVA_AUTO_ADDR_LIST=NO \
+#   PYTHONPATH=model_manager python benchmarks/bench_input_deadband.py
+import argparse
+import asyncio
+import os
+import time
+import types
+import numpy as np
+from src.cli import STAGES, model_main
+from src.interfaces import SimplePVAInterface, SimlePVAInterfaceServer
+from src.logging_utils.make_logger import make_logger
+from src.metrics import StageMetrics
+from src.transformers import SimpleTransformer
+
+CHANNELS = 20
+
+
+class SumModel:
+    def evaluate(self, inputs):
+        return {"y": sum(inputs.values())}
+
+
+def run(deadband, seconds, rate):
+    names = [f"bench:deadband:{i}" for i in range(CHANNELS)]
+    variables = {}
+    for name in names:
+        variables[name] = {"name": name, "proto": "pva"}
+        if deadband is not None:
+            variables[name]["deadband"] = deadband
+    output = {"bench:deadband:y": {"name": "bench:deadband:y", "proto": "pva"}}
+    source = SimlePVAInterfaceServer({"variables": {**variables, **output}})
+    in_interface = SimplePVAInterface({"variables": variables})
+    out_interface = SimplePVAInterface({"variables": output})
+    in_transformer = SimpleTransformer(
+        {
+            "symbols": names,
+            "variables": {f"x{i}": {"formula": name} for i, name in enumerate(names)},
+        }
+    )
+    out_transformer = SimpleTransformer(
+        {"symbols": ["y"], "variables": {"bench:deadband:y": {"formula": "y"}}}
+    )
+    metrics = StageMetrics(STAGES)
+    rng = np.random.default_rng(0)
+
+    async def pipeline():
+        try:
+            await model_main(
+                in_interface,
+                out_interface,
+                in_transformer,
+                out_transformer,
+                SumModel(),
+                types.SimpleNamespace(model_type="local"),
+                argparse.Namespace(one_shot=False),
+                None,
+                metrics,
+            )
+        except SystemExit:
+            pass
+
+    async def drive():
+        main = asyncio.create_task(pipeline())
+        await asyncio.sleep(0.5)
+        cpu = time.process_time()
+        start = time.perf_counter()
+        tick = 0
+        while time.perf_counter() - start < seconds:
+            # a real step every second, noise on every update in between
+            level = float(int(time.perf_counter() - start))
+            for name in names:
+                source.put(name, level + rng.normal(0, 1e-4))
+            tick += 1
+            await asyncio.sleep(max(0, start + tick / rate - time.perf_counter()))
+        await asyncio.sleep(0.2)
+        cpu = time.process_time() - cpu
+        main.cancel()
+        await main
+        return cpu, tick * CHANNELS
+
+    cpu, updates = asyncio.run(drive())
+    source.close()
+    inferences = metrics.summary(window=False)["inference"]["count"]
+    return updates, inferences, cpu
+
+
+def main():
+    os.environ["PUBLISH"] = "True"
+    make_logger("model_manager", level="WARNING")
+    seconds, rate = 5, 200
+    print(f"{'deadband':>10} | {'updates':>8} | {'inferences':>10} | {'CPU s':>6}")
+    for label, deadband in [
+        ("none", None),
+        ("abs", 1e-3),
+        ("abs+rel", {"relative": 1e-3, "absolute": 1e-3}),
+    ]:
+        updates, inferences, cpu = run(deadband, seconds, rate)
+        print(f"{label:>10} | {updates:>8} | {inferences:>10} | {cpu:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# SimplePVAInterface (threaded client, called from the event loop) vs AsyncPVAInterface,
+# get_many / put_many round trip and the longest the event loop went without running
+# run from the repo root with model_manager on the path:
+#   EPICS_PVA_ADDR_LIST=127.0.0.1 EPICS_PVA_AUTO_ADDR_LIST=NO \
+#   PYTHONPATH=model_manager python benchmarks/bench_p4p_async.py
+import asyncio
+import inspect
+import time
+import numpy as np
+from src.interfaces import (
+    AsyncPVAInterface,
+    SimplePVAInterface,
+    SimlePVAInterfaceServer,
+)
+
+
+async def resolve(result):
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+async def loop_lag(stop, lags):
+    # a ticker that should wake every millisecond, a blocking call shows up as lag
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def run(interface, names, rounds):
+    stop = asyncio.Event()
+    lags = []
+    ticker = asyncio.create_task(loop_lag(stop, lags))
+    await asyncio.sleep(0.01)
+    get_times, put_times = [], []
+    for i in range(rounds):
+        start = time.perf_counter()
+        await resolve(interface.get_many(names))
+        get_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        await resolve(interface.put_many({name: float(i) for name in names}))
+        put_times.append(time.perf_counter() - start)
+    stop.set()
+    await ticker
+    return get_times, put_times, lags
+
+
+def main():
+    print(
+        f"{'PVs':>5} | {'interface':>9} | {'get_many ms':>11} | {'put_many ms':>11} | "
+        f"{'max loop lag ms':>15}"
+    )
+    for count in [10, 100, 1000]:
+        names = [f"bench:async:{i}" for i in range(count)]
+        variables = {name: {"name": name, "proto": "pva"} for name in names}
+        server = SimlePVAInterfaceServer({"variables": variables})
+        for name in names:
+            server.put(name, 0.0)
+        for label, interface_class in [
+            ("threaded", SimplePVAInterface),
+            ("async", AsyncPVAInterface),
+        ]:
+
+            async def bench():
+                interface = interface_class({"variables": variables, "timeout": 30})
+                await resolve(interface.get_many(names))  # connect
+                result = await run(interface, names, 20)
+                interface.close()
+                return result
+
+            get_times, put_times, lags = asyncio.run(bench())
+            print(
+                f"{count:>5} | {label:>9} | {np.median(get_times) * 1000:>11.2f} | "
+                f"{np.median(put_times) * 1000:>11.2f} | {max(lags) * 1000:>15.2f}"
+            )
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
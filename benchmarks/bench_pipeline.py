@@ -0,0 +1,433 @@
+# end to end pipeline benchmark, an in-process PVA server stands in for the machine and
+# model_main runs the whole interface -> transformer -> model -> transformer -> interface path
+# on the examples/ models and on synthetic scalar and image models
+# every event posts new inputs and waits for the matching output, per stage percentiles
+# (ns, from model_main's StageMetrics) and the end to end latency are written as JSON
+# run from the repo root with model_manager on the path:
+#   EPICS_PVA_ADDR_LIST=127.0.0.1 EPICS_PVA_AUTO_ADDR_LIST=NO \
+#   PYTHONPATH=model_manager python benchmarks/bench_pipeline.py --output results.json
+# and against a previous run, exits with 1 if a stage got slower than the tolerance:
+#   ... python benchmarks/bench_pipeline.py --compare results.json
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+import types
+import numpy as np
+from src.cli import STAGES, initailize_config, model_main
+from src.config.config_object import DeploymentConfig
+from src.interfaces import SimlePVAInterfaceServer, registered_interfaces
+from src.logging_utils.make_logger import make_logger
+from src.metrics import LatencyHistogram, StageMetrics
+from src.model_utils import registered_model_getters
+from src.transformers import registered_transformers
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCALAR_COUNTS = [10, 100, 1000]
+IMAGE_SIZES = [64, 256, 1024, 2048]
+
+
+class ObservedServer(SimlePVAInterfaceServer):
+    """Output server that resolves `waiter` once the sequence PV carries `expected`"""
+
+    def __init__(self, config, seq_pv):
+        super().__init__(config)
+        self.seq_pv = seq_pv
+        self.waiter = None
+        self.expected = None
+
+    def put_many(self, data, **kwargs):
+        super().put_many(data)
+        if self.waiter is None or self.waiter.done():
+            return
+        if float(data.get(self.seq_pv, -1)) == self.expected:
+            self.waiter.set_result(time.perf_counter_ns())
+
+
+class ScalarModel:
+    # x0 carries the sequence number, everything else is summed
+    def evaluate(self, inputs):
+        return {"seq": inputs["x0"], "total": sum(inputs.values())}
+
+
+class ImageModel:
+    # pixel (0, 0) carries the sequence number, the frame is published back
+    def evaluate(self, inputs):
+        image = inputs["image"]
+        return {"seq": image[0, 0], "mean": image.mean(), "image": image}
+
+
+def pva(names, **extra):
+    return {name: {"name": name, "proto": "pva", **extra} for name in names}
+
+
+def image_variable(name, y, x):
+    return pva([name], type="image", image_size={"x": x, "y": y})
+
+
+def scalar_case(count):
+    names = [f"bench:scalar:{i}" for i in range(count)]
+    values = np.random.rand(count)
+
+    def post(server, seq):
+        # a full refresh, the sequence PV is posted last
+        for i in range(1, count):
+            server.put(names[i], values[(seq + i) % count])
+        server.put(names[0], float(seq))
+
+    return {
+        "name": f"synthetic:scalars:{count}",
+        "inputs": pva(names),
+        "in_transformer": (
+            "SimpleTransformer",
+            {
+                "symbols": names,
+                "variables": {f"x{i}": {"formula": name} for i, name in enumerate(names)},
+            },
+        ),
+        "out_transformer": (
+            "SimpleTransformer",
+            {
+                "symbols": ["seq", "total"],
+                "variables": {
+                    "bench:out:seq": {"formula": "seq"},
+                    "bench:out:total": {"formula": "total"},
+                },
+            },
+        ),
+        "outputs": pva(["bench:out:seq", "bench:out:total"]),
+        "seq_pv": "bench:out:seq",
+        "model": ScalarModel(),
+        "model_getter": types.SimpleNamespace(model_type="local"),
+        "setup": lambda server: None,
+        "post": post,
+        "deployment": {"type": "continuous"},
+    }
+
+
+def image_case(size):
+    frame = np.random.rand(size, size)
+
+    def post(server, seq):
+        # the previous event has completed, so the frame can be reused
+        frame[0, 0] = seq
+        server.put("bench:image", frame)
+
+    return {
+        "name": f"synthetic:image:{size}x{size}",
+        "inputs": image_variable("bench:image", size, size),
+        "in_transformer": ("PassThroughTransformer", {"variables": {"image": "bench:image"}}),
+        "out_transformer": (
+            "CompoundTransformer",
+            {
+                "transformers": {
+                    "scalars": {
+                        "type": "SimpleTransformer",
+                        "config": {
+                            "symbols": ["seq", "mean"],
+                            "variables": {
+                                "bench:out:seq": {"formula": "seq"},
+                                "bench:out:mean": {"formula": "mean"},
+                            },
+                        },
+                    },
+                    "image": {
+                        "type": "PassThroughTransformer",
+                        "config": {"variables": {"bench:out:image": "image"}},
+                    },
+                }
+            },
+        ),
+        "outputs": {
+            **pva(["bench:out:seq", "bench:out:mean"]),
+            **image_variable("bench:out:image", size, size),
+        },
+        "seq_pv": "bench:out:seq",
+        "model": ImageModel(),
+        "model_getter": types.SimpleNamespace(model_type="local"),
+        "setup": lambda server: None,
+        "post": post,
+        "deployment": {"type": "continuous"},
+    }
+
+
+def example_case(name, mapping, model_path, seq_pv, post, setup, images=None):
+    """
+    One of the examples/ deployments, its interfaces are switched to the local stand-in.
+    images maps an image variable to its (y, x) size, which the config doesn't give for inputs.
+    """
+    config = initailize_config(os.path.join(REPO, mapping))
+    images = images or {}
+    inputs = {}
+    for key in config.input_data.config["variables"]:
+        if key in images:
+            inputs.update(image_variable(key, *images[key]))
+        else:
+            inputs.update(pva([key]))
+    outputs = {}
+    for key, variable in config.output_data_to.config["variables"].items():
+        outputs[key] = {**variable, "proto": "pva", "name": key}
+    model_getter = registered_model_getters["local"](
+        {"model_path": os.path.join(REPO, model_path), "model_factory_class": "ModelFactory"}
+    )
+    return {
+        "name": name,
+        "inputs": inputs,
+        "in_transformer": (config.input_data_to_model.type, config.input_data_to_model.config),
+        "out_transformer": (
+            config.output_model_to_data.type,
+            config.output_model_to_data.config,
+        ),
+        "outputs": outputs,
+        "seq_pv": seq_pv,
+        "model": model_getter.get_model(),
+        "model_getter": model_getter,
+        "setup": setup,
+        "post": post,
+        "deployment": dict(config.deployment),
+    }
+
+
+def generic_example():
+    # y = max(x1, x2), x2 stays at 0 and x1 carries the sequence number
+    def post(server, seq):
+        server.put("LUME:MLFLOW:TEST_A", float(seq))
+
+    return example_case(
+        "example:generic",
+        "examples/generic/pv_mapping.yaml",
+        "tests/model/model_definition.py",
+        "LUME:MLFLOW:TEST_G",
+        post,
+        lambda server: server.put("LUME:MLFLOW:TEST_B", 0.0),
+    )
+
+
+def image_example():
+    rows, cols = 480, 640
+    frame = np.random.rand(rows, cols)
+
+    def setup(server):
+        server.put("CAMR:IN20:186:N_OF_ROW", rows)
+        server.put("CAMR:IN20:186:N_OF_COL", cols)
+
+    def post(server, seq):
+        # y_max is the brightest pixel
+        frame[0, 0] = seq
+        server.put("CAMR:IN20:186:IMAGE", frame)
+
+    case = example_case(
+        "example:image",
+        "examples/image/pv_mapping.yaml",
+        "examples/image_model.py",
+        "LUME:MLFLOW:TEST_Y_MAX",
+        post,
+        setup,
+        images={"CAMR:IN20:186:IMAGE": (rows, cols)},
+    )
+    case["outputs"]["LUME:MLFLOW:TEST_IMAGE"]["image_size"] = {"x": cols, "y": rows}
+    return case
+
+
+def all_cases():
+    """(name, factory) of every case, factories load the model and build the configs"""
+    cases = [("example:generic", generic_example), ("example:image", image_example)]
+    for count in SCALAR_COUNTS:
+        cases.append((f"synthetic:scalars:{count}", lambda count=count: scalar_case(count)))
+    for size in IMAGE_SIZES:
+        cases.append((f"synthetic:image:{size}x{size}", lambda size=size: image_case(size)))
+    return cases
+
+
+def summarise(summary):
+    return {stage: stats for stage, stats in summary.items() if stats["count"] > 0}
+
+
+def run_case(case, args):
+    """Run model_main on the case until it has seen args.seconds worth of events"""
+    os.environ["PUBLISH"] = "True"
+    source = SimlePVAInterfaceServer({"variables": case["inputs"]})
+    case["setup"](source)
+    out_interface = ObservedServer({"variables": case["outputs"]}, case["seq_pv"])
+    in_interface = registered_interfaces[args.interface](
+        {"variables": case["inputs"], "timeout": args.timeout}
+    )
+    in_transformer = registered_transformers[case["in_transformer"][0]](
+        case["in_transformer"][1]
+    )
+    out_transformer = registered_transformers[case["out_transformer"][0]](
+        case["out_transformer"][1]
+    )
+    deployment = dict(case["deployment"])
+    if args.queue is not None:
+        deployment["queue"] = {"policy": args.queue}
+    deployment = DeploymentConfig(**deployment)
+
+    metrics = StageMetrics(STAGES)
+    end_to_end = LatencyHistogram()
+    post_time = LatencyHistogram()
+    result = {"case": case["name"], "interface": args.interface, "unit": "ns"}
+
+    async def pipeline():
+        # model_main closes both interfaces and exits when it is cancelled or fails
+        try:
+            await model_main(
+                in_interface,
+                out_interface,
+                in_transformer,
+                out_transformer,
+                case["model"],
+                case["model_getter"],
+                argparse.Namespace(one_shot=False),
+                deployment,
+                metrics,
+            )
+        except SystemExit:
+            pass
+
+    async def event(main, seq):
+        loop = asyncio.get_running_loop()
+        out_interface.expected = float(seq)
+        out_interface.waiter = loop.create_future()
+        start = time.perf_counter_ns()
+        case["post"](source, seq)
+        posted = time.perf_counter_ns()
+        await asyncio.wait(
+            [out_interface.waiter, main],
+            timeout=args.timeout,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if main.done():
+            raise RuntimeError("model_main exited, see the log")
+        if not out_interface.waiter.done():
+            raise RuntimeError(f"no output for event {seq} within {args.timeout} s")
+        return posted - start, out_interface.waiter.result() - start
+
+    async def drive():
+        main = asyncio.create_task(pipeline())
+        seq = 1
+        try:
+            for _ in range(args.warmup):
+                await event(main, seq)
+                seq += 1
+            for histogram in list(metrics.window.values()) + list(metrics.totals.values()):
+                histogram.reset()
+
+            start = time.perf_counter()
+            events = 0
+            while events < args.max_events and time.perf_counter() - start < args.seconds:
+                posted, done = await event(main, seq)
+                post_time.record(posted)
+                end_to_end.record(done)
+                seq += 1
+                events += 1
+            elapsed = time.perf_counter() - start
+            result["events"] = events
+            result["seconds"] = elapsed
+            result["events_per_second"] = events / elapsed
+        except RuntimeError as e:
+            result["error"] = str(e)
+        stages = metrics.summary(window=False)
+        result["inferences_per_event"] = (
+            stages["inference"]["count"] / result["events"] if result.get("events") else None
+        )
+        result["stages"] = summarise(stages)
+        result["stages"]["source_post"] = post_time.summary()
+        result["stages"]["end_to_end"] = end_to_end.summary()
+        main.cancel()
+        await main
+
+    asyncio.run(drive())
+    source.close()
+    return result
+
+
+def compare(results, baseline, tolerance, min_delta_ns=50000):
+    """
+    Stages whose p50 or p99 is more than `tolerance` times the baseline, differences below
+    min_delta_ns are noise for the microsecond stages and ignored
+    """
+    previous = {(run["case"], run.get("interface")): run for run in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        before = previous.get((run["case"], run.get("interface")))
+        if before is None or "stages" not in before or "stages" not in run:
+            continue
+        for stage, stats in run["stages"].items():
+            if stage not in before["stages"]:
+                continue
+            for key in ["p50", "p99"]:
+                old, new = before["stages"][stage][key], stats[key]
+                if old and new and new > tolerance * old and new - old > min_delta_ns:
+                    regressions.append(
+                        f"{run['case']} {stage} {key}: {old / 1e6:.3f} -> {new / 1e6:.3f} ms"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End to end pipeline benchmark")
+    parser.add_argument("--cases", nargs="*", help="only run cases containing these names")
+    parser.add_argument("--interface", default="p4p", choices=["p4p", "p4p_async"])
+    parser.add_argument("--queue", default=None, choices=["fifo", "latest", "block"])
+    parser.add_argument("--seconds", type=float, default=3.0, help="per case")
+    parser.add_argument("--max-events", type=int, default=1000, help="per case")
+    parser.add_argument("--warmup", type=int, default=5, help="events before measuring")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds per event")
+    parser.add_argument("--output", default=None, help="JSON file, stdout by default")
+    parser.add_argument("--compare", default=None, help="previous JSON results")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    parser.add_argument("--min-delta-ms", type=float, default=0.05)
+    args = parser.parse_args()
+
+    make_logger("model_manager", level="WARNING")
+    results = {"started": time.time(), "runs": []}
+    for name, make_case in all_cases():
+        if args.cases and not any(selected in name for selected in args.cases):
+            continue
+        # model_main prints to stdout, keep it clean for the JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                case = make_case()
+            except Exception as e:
+                # e.g. an example model whose dependencies aren't installed
+                print(f"skipping {name}: {e!r}")
+                results["runs"].append(
+                    {"case": name, "interface": args.interface, "skipped": repr(e)}
+                )
+                continue
+            print(f"running {case['name']}")
+            run = run_case(case, args)
+            results["runs"].append(run)
+            if "error" in run:
+                print(f"{case['name']}: {run['error']}")
+            else:
+                print(
+                    f"{case['name']}: {run['events_per_second']:.1f} events/s, end to end"
+                    f" p50 {run['stages']['end_to_end']['p50'] / 1e6:.2f}"
+                    f" p99 {run['stages']['end_to_end']['p99'] / 1e6:.2f} ms"
+                )
+
+    text = json.dumps(results, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            regressions = compare(
+                results, json.load(f), args.tolerance, args.min_delta_ms * 1e6
+            )
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
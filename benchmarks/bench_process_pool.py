@@ -0,0 +1,66 @@
+# throughput of a CPU bound model evaluated inline vs in ProcessInferenceExecutor workers,
+# plus the cost of handing an image over through shared memory vs pickling it
+# run from the repo root with model_manager on the path:
+#   PYTHONPATH=model_manager python benchmarks/bench_process_pool.py
+import os, tempfile, time
+import numpy as np
+from src.pipeline import ProcessInferenceExecutor
+
+MODEL = """
+import numpy as np
+
+
+class Model:
+    def evaluate(self, inputs):
+        # pure python work, holds the GIL the whole time
+        total = 0.0
+        for i in range(200000):
+            total += i * inputs["x"]
+        return {"y": total + float(inputs["image"][0, 0])}
+
+
+class ModelFactory:
+    def get_model(self):
+        return Model()
+"""
+
+
+def run(executor, n_requests, image):
+    start = time.perf_counter()
+    futures = [executor.submit({"x": float(i), "image": image}) for i in range(n_requests)]
+    for future in futures:
+        future.result()
+    return n_requests / (time.perf_counter() - start)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "model.py")
+    with open(path, "w") as f:
+        f.write(MODEL)
+    config = {"model_path": path, "model_factory_class": "ModelFactory"}
+    image = np.random.rand(1024, 1024)
+
+    namespace = {}
+    exec(MODEL, namespace)
+    model = namespace["Model"]()
+    n_requests = 32
+    start = time.perf_counter()
+    for i in range(n_requests):
+        model.evaluate({"x": float(i), "image": image})
+    print(f"{'inline':>22} | {n_requests / (time.perf_counter() - start):>8.1f} evals/s")
+
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        for label, shm_min_bytes in [("shared memory", 65536), ("pickled", 1 << 62)]:
+            executor = ProcessInferenceExecutor(
+                "local", config, workers=workers, shm_min_bytes=shm_min_bytes
+            )
+            try:
+                rate = run(executor, n_requests, image)
+            finally:
+                executor.close()
+            print(f"{workers:>2} workers {label:>13} | {rate:>8.1f} evals/s")
+
+
+if __name__ == "__main__":
+    main()
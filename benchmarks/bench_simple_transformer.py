@@ -0,0 +1,110 @@
+# benchmark for SimpleTransformer.transform, compares the compiled (lambdify) path
+# against the old per-update sympify + subs path, and a single symbol update (which only
+# re-evaluates dependent formulas) against a full transform, and a scale and offset
+# correction on waveforms against doing it one sample at a time
+# run from the repo root with model_manager on the path:
+#   PYTHONPATH=model_manager python benchmarks/bench_simple_transformer.py
+import time
+import numpy as np
+import sympy as sp
+from src.transformers.BaseTransformers import SimpleTransformer
+
+
+def make_config(n_formulas, n_symbols=10):
+    symbols = [f"TEST:PV:{i}" for i in range(n_symbols)]
+    variables = {}
+    for i in range(n_formulas):
+        a = symbols[i % n_symbols]
+        b = symbols[(i + 1) % n_symbols]
+        variables[f"x{i}"] = {"formula": f"2.5 * {a} + sin({b}) - {i}"}
+    return {"variables": variables, "symbols": symbols}
+
+
+def old_transform(transformer):
+    # the pre-compilation implementation of SimpleTransformer.transform
+    transformed = {}
+    pvs_renamed = {
+        key.replace(":", "_"): value for key, value in transformer.latest_input.items()
+    }
+    for key, value in transformer.pv_mapping.items():
+        transformed[key] = sp.sympify(value["formula"].replace(":", "_")).subs(
+            pvs_renamed
+        )
+        transformed[key] = float(transformed[key])
+    return transformed
+
+
+def time_it(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    print(f"{'formulas':>10} | {'old (ms)':>12} | {'new (ms)':>12} | {'speedup':>8}")
+    for n in [10, 100, 1000]:
+        transformer = SimpleTransformer(make_config(n))
+        for i, symbol in enumerate(transformer.input_list):
+            transformer.latest_input[symbol] = float(i)
+
+        # sanity check that both paths agree
+        expected = old_transform(transformer)
+        transformer.transform()
+        for key, value in expected.items():
+            assert abs(transformer.latest_transformed[key] - value) < 1e-9
+
+        old_repeats = max(1, 100 // n)
+        new_repeats = max(10, 10000 // n)
+        old = time_it(lambda: old_transform(transformer), old_repeats)
+        new = time_it(transformer.transform, new_repeats)
+        print(
+            f"{n:>10} | {old * 1000:>12.4f} | {new * 1000:>12.4f} | {old / new:>7.0f}x"
+        )
+
+
+def incremental():
+    # one symbol update with many outputs that each depend on one or two symbols,
+    # the full transform is what every update used to cost
+    print()
+    print(f"{'formulas':>10} | {'full (us)':>12} | {'update (us)':>12} | {'speedup':>8}")
+    for n in [100, 1000, 5000]:
+        transformer = SimpleTransformer(make_config(n, n_symbols=n // 2))
+        for i, symbol in enumerate(transformer.input_list):
+            transformer.handler(symbol, {"value": float(i)})
+        symbol = transformer.input_list[0]
+        repeats = max(10, 100000 // n)
+        full = time_it(transformer.transform, repeats)
+        update = time_it(lambda: transformer.handler(symbol, {"value": 1.0}), repeats * 10)
+        print(
+            f"{n:>10} | {full * 1e6:>12.1f} | {update * 1e6:>12.1f} | {full / update:>7.0f}x"
+        )
+
+
+def waveforms():
+    # a gain and offset correction on one waveform, per sample is what a model had to do
+    # itself while the transformer only took floats
+    print()
+    print(f"{'samples':>10} | {'loop (us)':>12} | {'update (us)':>12} | {'speedup':>8}")
+    config = {
+        "variables": {"corrected": {"formula": "GAIN * WAVE + OFFSET"}},
+        "symbols": ["WAVE", "GAIN", "OFFSET"],
+    }
+    for n in [100, 10000, 1000000]:
+        transformer = SimpleTransformer(config)
+        transformer.handler("GAIN", {"value": 2.5})
+        transformer.handler("OFFSET", {"value": -1.0})
+        wave = np.random.default_rng(0).random(n)
+        transformer.handler("WAVE", {"value": wave})
+        repeats = max(3, 1000000 // n)
+        loop = time_it(lambda: [2.5 * sample - 1.0 for sample in wave.tolist()], repeats)
+        update = time_it(lambda: transformer.handler("WAVE", {"value": wave}), repeats)
+        print(
+            f"{n:>10} | {loop * 1e6:>12.1f} | {update * 1e6:>12.1f} | {loop / update:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
+    incremental()
+    waveforms()
@@ -1,11 +1,25 @@
 def main():
-    from src.cli import model_main, setup
+    from src.cli import model_main, model_batch, setup, parse_args
+    from src.cli import setup_multi, multi_model_main
     from src.logging_utils import make_logger, reset_logging
     import os, logging, asyncio
 
     logger = make_logger("model_manager")
     logger.info("Starting model manager")
 
+    args = parse_args()
+    if args.multi:
+        pipelines, inputs, outputs, deployment = setup_multi(args)
+        if deployment.type != "continuous":
+            raise ValueError("Multi model deployments only support type continuous")
+        reset_logging()
+        if os.environ.get("DEBUG") == "True":
+            logger = make_logger("model_manager", level=logging.DEBUG)
+        else:
+            logger = make_logger("model_manager")
+        asyncio.run(multi_model_main(pipelines, inputs, outputs, args, deployment))
+        return
+
     (
         in_interface,
         out_interface,
@@ -14,8 +28,9 @@ def main():
         model,
         getter,
         args,
-        dep_type,
-    ) = setup()
+        deployment,
+    ) = setup(args)
+    dep_type = deployment.type
     logger.info(f"Model deployed with type: {dep_type}")
     print("resetting logging...")
     reset_logging()
@@ -35,10 +50,20 @@ def main():
                 model,
                 getter,
                 args,
+                deployment,
             )
         )
     elif dep_type == "batch":
-        raise NotImplementedError("Batch mode not implemented")
+        model_batch(
+            in_interface,
+            out_interface,
+            in_transformer,
+            out_transformer,
+            model,
+            getter,
+            args,
+            deployment,
+        )
 
 
 if __name__ == "__main__":
@@ -1,11 +1,16 @@
 import argparse
-import os, sys, json, time, traceback
+import os, sys, json, time, traceback, inspect
 from src.config import ConfigParser
 from src.logging_utils import get_logger, make_logger, reset_logging
 from src.model_utils import registered_model_getters
 from src.interfaces import registered_interfaces
+from src.interfaces.pipelined_puts import PutTracker
 from src.transformers import registered_transformers
-import torch
+from src.pipeline import UpdateQueue, MicroBatcher, TorchInputBuffer, evaluate_chunk
+from src.pipeline import ModelPipeline, SharedInterfaces, ProcessInferenceExecutor
+from src.pipeline import ChangeDetector, InputDeadband, OutputDeadband, RateScheduler
+from src.metrics import StageMetrics, MetricsPublisher
+from src.registry import startup_report
 import time, logging, asyncio
 
 logger = get_logger()
@@ -25,7 +30,10 @@ def get_model_getter(model_getter, config=None):
     """Get the model."""
     logger.debug(f"Getting model: {model_getter} with config: {config}")
     try:
-        model_getter = registered_model_getters[model_getter](config)
+        name = model_getter
+        model_getter = registered_model_getters[name](config)
+        # kept so worker processes can load the same model
+        model_getter.getter_spec = (name, config)
         return model_getter
     except Exception as e:
         logger.error(f"Error getting model getter: {e}")
@@ -46,8 +54,8 @@ def env_config(env_config):
         raise e
 
 
-def setup():
-    """Setup the model manager."""
+def parse_args():
+    """Parse the command line and configure logging, publishing and the environment."""
     parser = argparse.ArgumentParser(description="Model Manager CLI")
 
     parser.add_argument(
@@ -113,6 +121,29 @@ def setup():
         action="store_true",
     )
 
+    parser.add_argument(
+        "--offline",
+        help="Start the model from the local model cache without contacting the MLflow registry",
+        required=False,
+        default=False,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-m",
+        "--multi",
+        help="Path to a multi model configuration, runs every model listed in one process",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--startup-profile",
+        help="Log the import time of every plugin loaded and the total setup time",
+        required=False,
+        default=False,
+        action="store_true",
+    )
+
     # publish
     parser.add_argument(
         "-p",
@@ -150,6 +181,16 @@ def setup():
     if args.env:
         env_config(args.env)
 
+    return args
+
+
+def setup(args=None):
+    """Setup the model manager."""
+    setup_start = time.perf_counter()
+    if args is None:
+        args = parse_args()
+    logger = get_logger()
+
     if args.local is not None:
         # model getter
         model_getter = get_model_getter(
@@ -166,6 +207,7 @@ def setup():
             {
                 "model_name": args.model_name,
                 "model_version": args.model_version,
+                "offline": args.offline,
             },
         )
 
@@ -220,6 +262,10 @@ def setup():
     logger.info(f"Model: {args.model_name} version: {args.model_version} loaded")
     logger.info(f"Model type: {model_getter.model_type}")
 
+    if args.startup_profile:
+        logger.info(f"Plugins loaded:\n{startup_report()}")
+        logger.info(f"Setup took {(time.perf_counter() - setup_start) * 1000:.1f} ms")
+
     return (
         in_interface,
         out_interface,
@@ -228,8 +274,366 @@ def setup():
         model,
         model_getter,
         args,
-        config.deployment.type,
+        config.deployment,
+    )
+
+
+def setup_multi(args):
+    """Setup every model of a multi model deployment, interfaces are shared between models."""
+    setup_start = time.perf_counter()
+    logger = get_logger()
+    multi_config = ConfigParser(args.multi).parse_multi()
+    logger.info(f"Multi model deployment: {list(multi_config.models.keys())}")
+    deployment = multi_config.deployment
+    # rate_hz, queue, change_detection, output_deadband and metrics apply to every pipeline
+    if deployment.executor is not None:
+        raise ValueError("executor is not supported with multiple models")
+    if deployment.batching is not None:
+        logger.warning("Micro-batching is not supported with multiple models, ignoring")
+
+    # only input updates are routed to pipelines, a put echoed back on a monitored output
+    # channel is never taken for an input
+    inputs = SharedInterfaces(registered_interfaces, routed=True)
+    outputs = SharedInterfaces(registered_interfaces)
+    pipelines = []
+    for name, entry in multi_config.models.items():
+        model_getter = get_model_getter(entry.model_getter, entry.config)
+        model = model_getter.get_model()
+        if entry.pipeline is None:
+            logger.info(f"{name}: getting config from model artifacts")
+            config = initailize_config(model_getter.get_config())
+        else:
+            config = initailize_config(entry.pipeline)
+
+        pipeline = ModelPipeline(
+            name,
+            registered_transformers[config.input_data_to_model.type](
+                config.input_data_to_model.config
+            ),
+            registered_transformers[config.output_model_to_data.type](
+                config.output_model_to_data.config
+            ),
+            model,
+            model_getter,
+            config.input_data.config,
+            STAGES,
+        )
+        pipeline.in_key = inputs.add(
+            config.input_data.get_method, config.input_data.config, pipeline
+        )
+        pipeline.out_key = outputs.add(
+            config.output_data_to.put_method, config.output_data_to.config, pipeline
+        )
+        pipelines.append(pipeline)
+        logger.info(f"{name}: model type {model_getter.model_type} loaded")
+
+    inputs.build()
+    outputs.build()
+    for pipeline in pipelines:
+        pipeline.in_interface = inputs.interfaces[pipeline.in_key]
+        pipeline.out_interface = outputs.interfaces[pipeline.out_key]
+
+    if args.startup_profile:
+        logger.info(f"Plugins loaded:\n{startup_report()}")
+        logger.info(f"Setup took {(time.perf_counter() - setup_start) * 1000:.1f} ms")
+
+    return pipelines, inputs, outputs, multi_config.deployment
+
+
+# stages timed by model_main, in pipeline order
+STAGES = ["wake", "input_transform", "inference", "output_transform", "put"]
+
+
+def report_stats(
+    metrics,
+    publisher=None,
+    name=None,
+    queue=None,
+    puts=None,
+    outputs=None,
+    scheduler=None,
+    children=None,
+):
+    """Log percentiles of every stage recorded since the last report and start a new window."""
+    summary = metrics.roll_window() if metrics is not None else {}
+    stat_string = StageMetrics.format(summary)
+    if outputs is not None and stat_string != "":
+        counts = outputs.stats().values()
+        stat_string += (
+            f" | outputs: published {sum(count['published'] for count in counts)}"
+            f" | suppressed {sum(count['suppressed'] for count in counts)}"
+        )
+    counters = queue.stats() if queue is not None else None
+    # an idle queue isn't worth a log line on its own
+    if counters is not None and (stat_string != "" or counters["max_depth"] > 0):
+        stat_string += f" {UpdateQueue.format(counters)}"
+    put_stats = puts.stats() if puts is not None else None
+    if put_stats is not None and (stat_string != "" or put_stats["max_in_flight"] > 0):
+        stat_string += f" | {PutTracker.format(put_stats)}"
+        for channel, error in put_stats["errors"].items():
+            logger.warning(f"Put to {channel} failed: {error}")
+    schedule = scheduler.stats() if scheduler is not None else None
+    if schedule is not None:
+        stat_string += f" | {RateScheduler.format(schedule)}"
+    # handler time of each child of a compound transformer, only logged
+    for child_metrics in children or []:
+        child_string = StageMetrics.format(child_metrics.roll_window())
+        if child_string != "":
+            stat_string += f" | transformer children:{child_string}"
+
+    if stat_string == "":
+        logger.debug("No stats available")
+    elif name is not None:
+        logger.info(f"{name} | {stat_string}")
+    else:
+        logger.info(stat_string)
+    if publisher is not None:
+        publisher.publish(
+            summary, pipeline=name, counters=counters, puts=put_stats, schedule=schedule
+        )
+
+
+async def stats_reporter(
+    metrics,
+    publisher=None,
+    period=1,
+    name=None,
+    queue=None,
+    puts=None,
+    outputs=None,
+    scheduler=None,
+    children=None,
+):
+    """Report stats every `period` seconds, runs alongside model_main."""
+    while True:
+        await asyncio.sleep(period)
+        report_stats(
+            metrics, publisher, name, queue, puts, outputs, scheduler, children
+        )
+
+
+async def resolve(result):
+    """Interfaces may be threaded or asyncio based, results of the latter are awaited."""
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+async def flush_puts(interface, timeout=None):
+    """Wait for the background writes of an output interface, if it has any."""
+    if hasattr(interface, "flush"):
+        await resolve(interface.flush(timeout))
+
+
+def make_update_queue(deployment, interfaces=()):
+    """
+    Input hand-off with the policy from deployment.queue, unbounded fifo by default.
+
+    Inputs that push as fast as they can (a file replay at rate max) need a bounded queue,
+    otherwise all of their data ends up in it. Without a queue setting they get a blocking
+    one, an unbounded setting is rejected.
+    """
+    settings = {}
+    if deployment is not None and deployment.queue is not None:
+        settings = deployment.queue
+    if any(getattr(interface, "needs_backpressure", False) for interface in interfaces):
+        if not settings:
+            settings = {"policy": "block", "maxsize": 1024}
+            logger.info(f"Input needs back pressure, using a {settings} queue")
+        elif settings.get("policy", "fifo") != "latest" and not settings.get("maxsize"):
+            raise ValueError(
+                "An input replayed at rate max needs a bounded queue, set "
+                "deployment.queue.maxsize or use the latest policy"
+            )
+    return UpdateQueue(asyncio.get_running_loop(), **settings)
+
+
+async def run_inference(
+    in_transformer,
+    out_transformer,
+    out_interface,
+    model,
+    model_getter,
+    metrics,
+    torch_inputs=None,
+    deadband=None,
+):
+    """Evaluate the model on the latest transformed input and publish the output."""
+    # this part can maybe be handled by lume-model
+    if torch_inputs is not None:
+        inputs = torch_inputs.fill(in_transformer.latest_transformed)
+    else:
+        inputs = in_transformer.latest_transformed
+
+    inference_start = time.perf_counter_ns()
+    output = model.evaluate(inputs)
+    metrics.record("inference", time.perf_counter_ns() - inference_start)
+    logger.debug(f"Output from model.evaluate: {output}")
+
+    await publish_output(output, out_transformer, out_interface, metrics, deadband)
+    in_transformer.updated = False
+
+
+async def publish_output(output, out_transformer, out_interface, metrics, deadband=None):
+    """Transform one model output and put it to the output interface."""
+    time_start = time.perf_counter_ns()
+    for key in output:
+        logger.debug(f"Output: {key}: {output[key]}")
+        out_transformer.handler(key, {"value": output[key]})
+    metrics.record("output_transform", time.perf_counter_ns() - time_start)
+
+    if out_transformer.updated:
+        time_start = time.perf_counter_ns()
+
+        data = out_transformer.latest_transformed
+        changed = getattr(out_transformer, "dirty", None)
+        if changed is not None:
+            # only the outputs recomputed since the last put, the others haven't changed
+            data = {key: data[key] for key in changed}
+            changed.clear()
+        if os.environ["PUBLISH"] == "True":
+            if deadband is not None:
+                # unchanged outputs and changes within their deadband aren't put again
+                data = deadband.filter(data)
+            if data:
+                logger.debug("Publishing data")
+                try:
+                    await resolve(out_interface.put_many(data))
+                except Exception:
+                    # the values weren't written, so they mustn't suppress the next ones and
+                    # are put again on the next cycle even if they aren't recomputed
+                    if deadband is not None:
+                        deadband.failed(data)
+                    if changed is not None:
+                        changed.update(data)
+                    raise
+        else:
+            logger.debug("Not publishing data, to publish use -p or --publish")
+        out_transformer.updated = False
+
+        metrics.record("put", time.perf_counter_ns() - time_start)
+
+
+async def run_batched_inference(
+    snapshots, out_transformer, out_interface, model, model_getter, metrics, deadband=None
+):
+    """Evaluate several input snapshots in one call and publish the outputs in order."""
+    inputs = MicroBatcher.stack(snapshots, model_getter.model_type)
+
+    inference_start = time.perf_counter_ns()
+    output = model.evaluate(inputs)
+    metrics.record("inference", time.perf_counter_ns() - inference_start)
+    logger.debug(f"Evaluated a batch of {len(snapshots)}")
+
+    for sample in MicroBatcher.unstack(output, len(snapshots)):
+        await publish_output(sample, out_transformer, out_interface, metrics, deadband)
+
+
+def transformer_children(*transformers):
+    """The per child handler times of the compound transformers among `transformers`."""
+    return [
+        transformer.child_metrics
+        for transformer in transformers
+        if hasattr(transformer, "child_metrics")
+    ]
+
+
+def make_scheduler(deployment):
+    """Fixed rate ticks if deployment.rate_hz is set, None runs on every input update."""
+    if deployment is None or deployment.rate_hz is None:
+        return None
+    logger.info(f"Running inference at a fixed {deployment.rate_hz} Hz")
+    return RateScheduler(deployment.rate_hz)
+
+
+def make_change_detector(deployment):
+    """Change detection is on unless deployment.change_detection is false."""
+    setting = True if deployment is None else deployment.change_detection
+    if setting is None or setting is False:
+        return None
+    if setting is True:
+        return ChangeDetector()
+    changes = ChangeDetector(**setting)
+    if changes.arrays == "sample":
+        logger.warning(
+            f"Array change detection samples {changes.sample_size} elements, "
+            "updates that only change other elements are dropped"
+        )
+    return changes
+
+
+def make_input_deadband(interfaces):
+    """Deadbands from the `deadband` settings of the input variables, None if none are set."""
+    variables = {}
+    for interface in interfaces:
+        variables.update(getattr(interface, "variables", {}))
+    deadband = InputDeadband(variables)
+    if not deadband.settings:
+        return None
+    logger.info(f"Input deadbands on {len(deadband.settings)} variables")
+    return deadband
+
+
+def make_output_deadband(interface, deployment):
+    """
+    Deadbands from the `deadband` settings of the output variables, with
+    deployment.output_deadband as the default for the others. None if neither is set.
+    """
+    default = None if deployment is None else deployment.output_deadband
+    deadband = OutputDeadband(getattr(interface, "variables", {}), default)
+    if not deadband.settings and default is None:
+        return None
+    logger.info(
+        f"Output deadbands on {len(deadband.settings)} variables, default {default}"
     )
+    # pipelined puts fail after put_many returned, they are reported by the tracker
+    tracker = getattr(interface, "put_tracker", None)
+    if tracker is not None:
+        tracker.on_failure(deadband.failed)
+    return deadband
+
+
+def submit_inference(in_transformer, executor):
+    """Hand the latest transformed input to the worker processes, returns the result future."""
+    time_start = time.perf_counter_ns()
+    future = executor.submit(dict(in_transformer.latest_transformed))
+    in_transformer.updated = False
+    return future, time_start
+
+
+async def publish_results(
+    results, out_transformer, out_interface, metrics, deadband=None
+):
+    """Publish worker results in the order they were submitted."""
+    while True:
+        future, submitted = await results.get()
+        try:
+            output = await asyncio.wrap_future(future)
+            # inference is timed from submission, so it includes time queued for a worker
+            metrics.record("inference", time.perf_counter_ns() - submitted)
+            await publish_output(
+                output, out_transformer, out_interface, metrics, deadband
+            )
+        finally:
+            results.task_done()
+
+
+async def collect_batch(updates, apply_update, batcher):
+    """Apply queued updates until the batch is full or its time budget has run out."""
+    while not batcher.full():
+        item = updates.get_nowait()
+        if item is None:
+            if len(batcher) == 0 or batcher.remaining() <= 0:
+                return
+            try:
+                item = await asyncio.wait_for(updates.get(), batcher.remaining())
+            except asyncio.TimeoutError:
+                return
+            if item is None:
+                # the input has ended
+                return
+        name, value, _ = item
+        apply_update(name, value)
 
 
 async def model_main(
@@ -240,6 +644,8 @@ async def model_main(
     model,
     model_getter,
     args,
+    deployment=None,
+    metrics=None,
 ):
     """Main."""
     # monitor and send to transformer handle
@@ -249,150 +655,437 @@ async def model_main(
     logger = get_logger()
     logger.info("Starting model manager")
 
-    stats_inference = []
-    stats_input_transform = []
-    stats_output_transform = []
-    stats_put = []
-    last_stat_report = time.time()
+    # wake is the time from an update arriving to inference starting
+    if metrics is None:
+        metrics = StageMetrics(STAGES)
+    publisher = None
+    reporter = None
+    batcher = None
+    torch_inputs = None
+    executor = None
+    results_task = None
+    changes = None
+    deadband = None
+    out_deadband = None
+    scheduler = None
+    updates = None
 
     try:
-        # in_interface.monitor(in_transformer.handler)
-        logger.info("Monitoring input interface")
+        if deployment is not None and deployment.metrics is not None:
+            if deployment.metrics.get("publish", False):
+                publisher = MetricsPublisher(
+                    STAGES, deployment.metrics.get("prefix", "MODEL_MANAGER:METRICS")
+                )
+        out_deadband = make_output_deadband(out_interface, deployment)
+        if deployment is not None and deployment.executor is not None:
+            if deployment.batching is not None:
+                raise ValueError("executor and batching can't be used together")
+            getter_name, getter_config = model_getter.getter_spec
+            executor = ProcessInferenceExecutor(
+                getter_name, getter_config, **deployment.executor
+            )
+            # bounded so a slow model applies back pressure instead of queueing forever
+            results = asyncio.Queue(maxsize=2 * executor.workers)
+            results_task = asyncio.create_task(
+                publish_results(
+                    results, out_transformer, out_interface, metrics, out_deadband
+                )
+            )
+        elif model_getter.model_type == "torch":
+            torch_inputs = TorchInputBuffer(in_transformer.latest_transformed.keys())
+        if deployment is not None and deployment.batching is not None:
+            if deployment.rate_hz is not None:
+                raise ValueError("rate_hz and batching can't be used together")
+            batcher = MicroBatcher(**deployment.batching)
+            logger.info(f"Micro-batching enabled: {deployment.batching}")
+        scheduler = make_scheduler(deployment)
 
-        # initialise variables using get
-        for key in in_interface.variable_list:
-            _, value = in_interface.get(key)
-            # measure size of value in bytes
+        changes = make_change_detector(deployment)
+        deadband = make_input_deadband([in_interface])
 
-            in_transformer.handler(key, value)
-        last_input_update = time.time()
-        while True:
-            if time.time() - last_stat_report > 1:
-                stat_string = ""
-                last_stat_report = time.time()
-                if len(stats_inference) > 0:
-                    stat = sum(stats_inference) / len(stats_inference)
-                    stat = stat * 1000
-                    # display 2 decimal places
-                    stat_temp = f" | Inference time: {stat:.2f} ms |"
-                    spaces = 20 - len(stat_temp)
-                    stat_string += stat_temp + " " * spaces
-
-                if len(stats_input_transform) > 0:
-                    stat = sum(stats_input_transform) / len(stats_input_transform)
-                    stat = stat * 1000
-                    stat_temp = f" Input transform time: {stat:.2f} ms |"
-                    spaces = 20 - len(stat_temp)
-                    stat_string += stat_temp + " " * spaces
-                if len(stats_output_transform) > 0:
-                    stat = sum(stats_output_transform) / len(stats_output_transform)
-                    stat = stat * 1000
-                    stat_temp = f" Output transform time: {stat:.2f} ms |"
-                    spaces = 20 - len(stat_temp)
-                    stat_string += stat_temp + " " * spaces
-
-                if len(stats_put) > 0:
-                    stat = sum(stats_put) / len(stats_put)
-                    stat = stat * 1000
-                    stat_temp = f" Put time: {stat:.2f} ms |"
-                    spaces = 20 - len(stat_temp)
-                    stat_string += stat_temp + " " * spaces
-
-                if stat_string == "":
-                    print("No stats available")
-                    pass
-                else:
-                    logger.info(stat_string)
-                    # last_stat_report = time.time()
-                    stats_inference = []
-                    stats_input_transform = []
-                    stats_output_transform = []
-                    stats_put = []
-                    
-            # # do update at 10 Hz 
-            if True:
-                for key in in_interface.variable_list:
-                    _, value = in_interface.get(key)
-                    if value["value"] == in_transformer.latest_input[key]:
-                        pass
-                    else:
-                        in_transformer.handler(key, value)
-
-            if in_transformer.updated:
-                try:
-                    stats_input_transform.append(in_transformer.handler_time)
-                except:
-                    logger.warning("No handler time available for stats")
-                    stats_input_transform.append(0)
-                # logger.debug("Input transformer updated")
-                # logger.debug(
-                #     f"Input transformer latest transformed: {in_transformer.latest_transformed}"
-                # )
-
-                # logger.debug("Evaluating model")
-
-                # this part can maybe be handled by lume-model
-                if model_getter.model_type == "torch":
-                    latest_transformed = in_transformer.latest_transformed
-                    for key in latest_transformed:
-                        # convert to tensor
-                        latest_transformed[key] = torch.tensor(
-                            latest_transformed[key], dtype=torch.float32
-                        )
+        # input transform time accumulated since the last inference
+        transform_ns = [0]
 
-                else:
-                    latest_transformed = in_transformer.latest_transformed
-
-                inference_start = time.time()
-                output = model.evaluate(in_transformer.latest_transformed)
-                inference_time = time.time() - inference_start
-                stats_inference.append(inference_time)
-                logger.debug(f"Output from model.evaluate: {output}")
-                # print("=" * 20)
-                # print("Output from model.evaluate: ")
-                # print(output)
-                # print("=" * 20)
-                for key in output:
-                    logger.debug(f"Output: {key}: {output[key]}")
-                    out_transformer.handler(key, {"value": output[key]})
-
-                if out_transformer.updated:
-                    try:
-                        stats_output_transform.append(out_transformer.handler_time)
-                    except:
-                        logger.warning("No handler time available for stats")
-                        stats_output_transform.append(0)
-                    time_start = time.time()
-
-                    if os.environ["PUBLISH"] == "True":
-                        logger.debug("Publishing data")
-                        out_interface.put_many(out_transformer.latest_transformed)
-                    else:
-                        logger.debug(
-                            "Not publishing data, to publish use -p or --publish"
-                        )
-                    out_transformer.updated = False
+        def apply_update(name, value):
+            # re-reads and repeated deliveries of the same value don't reach the transformer
+            if changes is not None and not changes.changed(name, value):
+                return
+            # nor do changes within a variable's deadband
+            if deadband is not None and not deadband.passes(name, value):
+                return
+            time_start = time.perf_counter_ns()
+            in_transformer.handler(name, value)
+            # with micro-batching every new input snapshot is kept rather than only the latest
+            if batcher is not None and in_transformer.updated:
+                batcher.add(dict(in_transformer.latest_transformed))
+                in_transformer.updated = False
+            transform_ns[0] += time.perf_counter_ns() - time_start
 
-                    time_end = time.time()
-                    stats_put.append(time_end - time_start)
+        updates = make_update_queue(deployment, [in_interface])
 
-                in_transformer.updated = False
-                # print("in_transformer.updated = False")
+        # initialise variables from one snapshot of every input
+        for key, value in await resolve(
+            in_interface.get_many(in_interface.variable_list)
+        ):
+            apply_update(key, value)
+
+        # interfaces push updates from their own threads, the loop only wakes on new data
+        # inputs that end (a file replay) close the queue once everything is handed over
+        await resolve(in_interface.monitor(updates.put, on_end=updates.close))
+        logger.info("Monitoring input interface")
+        reporter = asyncio.create_task(
+            stats_reporter(
+                metrics,
+                publisher,
+                queue=updates,
+                puts=getattr(out_interface, "put_tracker", None),
+                outputs=out_deadband,
+                scheduler=scheduler,
+                children=transformer_children(in_transformer, out_transformer),
+            )
+        )
+
+        wake_time = None
+        # set once the input transformer has produced a full set of inputs
+        primed = False
+        while True:
+            ready = in_transformer.updated if batcher is None else len(batcher) > 0
+            primed = primed or ready
+            # at a fixed rate every tick evaluates the latest inputs, changed or not, but
+            # only once every input has a value
+            if ready or (scheduler is not None and primed):
+                if wake_time is not None:
+                    metrics.record("wake", time.perf_counter_ns() - wake_time)
+                metrics.record("input_transform", transform_ns[0])
+                transform_ns[0] = 0
+                if executor is not None:
+                    # a failed evaluation in a worker stops the loop like an inline one would
+                    if results_task.done():
+                        results_task.result()
+                    await results.put(submit_inference(in_transformer, executor))
+                elif batcher is None:
+                    await run_inference(
+                        in_transformer,
+                        out_transformer,
+                        out_interface,
+                        model,
+                        model_getter,
+                        metrics,
+                        torch_inputs,
+                        out_deadband,
+                    )
+                else:
+                    await run_batched_inference(
+                        batcher.take(),
+                        out_transformer,
+                        out_interface,
+                        model,
+                        model_getter,
+                        metrics,
+                        out_deadband,
+                    )
+                if scheduler is not None:
+                    overran = scheduler.finished()
+                    if overran:
+                        logger.debug(f"Inference overran {overran} deadlines")
 
                 if args.one_shot:
+                    if executor is not None:
+                        await results.join()
+                    await flush_puts(out_interface)
                     logger.info("One shot mode, exiting")
                     break
+            elif scheduler is not None:
+                scheduler.skip()
+
+            if updates.exhausted():
+                if executor is not None:
+                    await results.join()
+                await flush_puts(out_interface)
+                logger.info("Input ended and every update was processed, exiting")
+                break
 
-            await asyncio.sleep(
-                0.0001
-            )  # makes the loop less cpu intensive 100% - > 15% cpu usage , more refactoring needed to make it more efficient
+            if scheduler is not None:
+                # sleep until the next tick, then apply everything that queued up meanwhile
+                await scheduler.wait()
+                for name, value, _ in updates.drain():
+                    apply_update(name, value)
+                continue
+
+            # sleep until an input changes, then apply everything that queued up meanwhile
+            item = await updates.get()
+            if item is None:
+                continue
+            name, value, wake_time = item
+            apply_update(name, value)
+            if batcher is None:
+                for name, value, _ in updates.drain():
+                    apply_update(name, value)
+            else:
+                await collect_batch(updates, apply_update, batcher)
 
     except Exception as e:
         logger.error(f"Error monitoring: {traceback.format_exc()}")
         raise e
     finally:
+        if changes is not None:
+            logger.info(
+                f"Change detection suppressed {sum(changes.suppressed.values())} updates"
+            )
+        if deadband is not None:
+            logger.info(deadband.summary())
+        if out_deadband is not None:
+            logger.info(out_deadband.summary())
+        if scheduler is not None:
+            logger.info(RateScheduler.format(scheduler.stats(reset=False)))
+        if reporter is not None:
+            reporter.cancel()
+        if results_task is not None:
+            results_task.cancel()
+        if executor is not None:
+            executor.close()
+        if publisher is not None:
+            publisher.close()
+        # releases monitor threads blocked on a full queue, so the interfaces can close
+        if updates is not None:
+            updates.close()
         out_interface.close()
         in_interface.close()
 
         logger.info("Exiting")
         sys.exit(0)
+
+
+async def multi_model_main(pipelines, inputs, outputs, args, deployment=None):
+    """Run several models in one process, every input channel is monitored once."""
+    logger = get_logger()
+    logger.info(f"Starting {len(pipelines)} pipelines")
+
+    publisher = None
+    reporters = []
+    changes = None
+    deadband = None
+    scheduler = None
+    updates = None
+
+    try:
+        if deployment is not None and deployment.metrics is not None:
+            if deployment.metrics.get("publish", False):
+                publisher = MetricsPublisher(
+                    STAGES,
+                    deployment.metrics.get("prefix", "MODEL_MANAGER:METRICS"),
+                    pipelines=[pipeline.name for pipeline in pipelines],
+                )
+        for pipeline in pipelines:
+            if pipeline.model_getter.model_type == "torch":
+                pipeline.torch_inputs = TorchInputBuffer(
+                    pipeline.in_transformer.latest_transformed.keys()
+                )
+            pipeline.out_deadband = make_output_deadband(
+                pipeline.out_interface, deployment
+            )
+
+        changes = make_change_detector(deployment)
+        deadband = make_input_deadband(inputs.interfaces.values())
+        scheduler = make_scheduler(deployment)
+
+        def apply_update(source, value):
+            # updates are queued as ((group key, channel), value), the same channel name on
+            # two input interfaces is two different inputs
+            key, name = source
+            if changes is not None and not changes.changed(source, value):
+                return
+            if deadband is not None and not deadband.passes(name, value):
+                return
+            # fan the update out to every pipeline that reads this channel
+            for pipeline in inputs.pipelines_for(key, name):
+                time_start = time.perf_counter_ns()
+                pipeline.in_transformer.handler(name, value)
+                pipeline.transform_ns += time.perf_counter_ns() - time_start
+
+        updates = make_update_queue(deployment, inputs.interfaces.values())
+
+        # the queue is closed once every input has ended, live inputs never do
+        ended = set()
+
+        def routed(key):
+            def handler(name, value):
+                updates.put((key, name), value)
+
+            return handler
+
+        def input_ended(key):
+            def on_end():
+                ended.add(key)
+                if len(ended) == len(inputs.interfaces):
+                    updates.close()
+
+            return on_end
+
+        for key, interface in inputs.interfaces.items():
+            values = await resolve(interface.get_many(interface.variable_list))
+            for name, value in values:
+                apply_update((key, name), value)
+        for key, interface in inputs.interfaces.items():
+            await resolve(interface.monitor(routed(key), on_end=input_ended(key)))
+        logger.info(f"Monitoring {len(inputs.interfaces)} shared input interfaces")
+
+        for pipeline in pipelines:
+            reporters.append(
+                asyncio.create_task(
+                    stats_reporter(
+                        pipeline.metrics,
+                        publisher,
+                        name=pipeline.name,
+                        outputs=pipeline.out_deadband,
+                        children=transformer_children(
+                            pipeline.in_transformer, pipeline.out_transformer
+                        ),
+                    )
+                )
+            )
+        # the input queue is shared by every pipeline so it is reported on its own
+        reporters.append(
+            asyncio.create_task(
+                stats_reporter(None, publisher, queue=updates, scheduler=scheduler)
+            )
+        )
+        # as are the writes of each shared output interface, these are only logged
+        for (method, _), interface in outputs.interfaces.items():
+            if getattr(interface, "put_tracker", None) is not None:
+                reporters.append(
+                    asyncio.create_task(
+                        stats_reporter(
+                            None, name=f"{method} output", puts=interface.put_tracker
+                        )
+                    )
+                )
+
+        wake_time = None
+        while True:
+            ran = False
+            for pipeline in pipelines:
+                pipeline.primed = pipeline.primed or pipeline.in_transformer.updated
+                # at a fixed rate every tick evaluates every model on its latest inputs,
+                # as soon as all of them have a value
+                if not pipeline.in_transformer.updated and (
+                    scheduler is None or not pipeline.primed
+                ):
+                    continue
+                if wake_time is not None:
+                    pipeline.metrics.record("wake", time.perf_counter_ns() - wake_time)
+                pipeline.metrics.record("input_transform", pipeline.transform_ns)
+                pipeline.transform_ns = 0
+                await run_inference(
+                    pipeline.in_transformer,
+                    pipeline.out_transformer,
+                    pipeline.out_interface,
+                    pipeline.model,
+                    pipeline.model_getter,
+                    pipeline.metrics,
+                    pipeline.torch_inputs,
+                    pipeline.out_deadband,
+                )
+                ran = True
+            if scheduler is not None:
+                overran = scheduler.finished() if ran else scheduler.skip()
+                if overran:
+                    logger.debug(f"Inference overran {overran} deadlines")
+
+            if ran and args.one_shot:
+                for interface in outputs.interfaces.values():
+                    await flush_puts(interface)
+                logger.info("One shot mode, exiting")
+                break
+
+            if updates.exhausted():
+                for interface in outputs.interfaces.values():
+                    await flush_puts(interface)
+                logger.info("Inputs ended and every update was processed, exiting")
+                break
+
+            if scheduler is not None:
+                await scheduler.wait()
+                for name, value, _ in updates.drain():
+                    apply_update(name, value)
+                continue
+
+            item = await updates.get()
+            if item is None:
+                continue
+            name, value, wake_time = item
+            apply_update(name, value)
+            for name, value, _ in updates.drain():
+                apply_update(name, value)
+
+    except Exception as e:
+        logger.error(f"Error monitoring: {traceback.format_exc()}")
+        raise e
+    finally:
+        if changes is not None:
+            logger.info(
+                f"Change detection suppressed {sum(changes.suppressed.values())} updates"
+            )
+        if deadband is not None:
+            logger.info(deadband.summary())
+        for pipeline in pipelines:
+            if pipeline.out_deadband is not None:
+                logger.info(f"{pipeline.name} | {pipeline.out_deadband.summary()}")
+        if scheduler is not None:
+            logger.info(RateScheduler.format(scheduler.stats(reset=False)))
+        for reporter in reporters:
+            reporter.cancel()
+        if publisher is not None:
+            publisher.close()
+        if updates is not None:
+            updates.close()
+        outputs.close()
+        inputs.close()
+
+        logger.info("Exiting")
+        sys.exit(0)
+
+
+def model_batch(
+    in_interface,
+    out_interface,
+    in_transformer,
+    out_transformer,
+    model,
+    model_getter,
+    args,
+    deployment,
+):
+    """Run archived data from an h5df file through the model in vectorised chunks."""
+    logger = get_logger()
+    chunk_size = deployment.chunk_size
+    n_rows = in_interface.num_rows(in_transformer.input_list)
+    logger.info(f"Batch mode: {n_rows} rows in chunks of {chunk_size}")
+
+    time_start = time.time()
+    try:
+        for start in range(0, n_rows, chunk_size):
+            stop = min(start + chunk_size, n_rows)
+            columns = in_interface.read_columns(in_transformer.input_list, start, stop)
+            inputs = in_transformer.transform_batch(columns)
+            outputs = evaluate_chunk(
+                model,
+                model_getter.model_type,
+                inputs,
+                stop - start,
+                vectorized=deployment.vectorized,
+            )
+            out_interface.write_columns(out_transformer.transform_batch(outputs), start)
+
+            elapsed = time.time() - time_start
+            logger.info(
+                f"Processed {stop}/{n_rows} rows | {stop / max(elapsed, 1e-9):.0f} rows/s"
+            )
+    except Exception as e:
+        logger.error(f"Error in batch mode: {traceback.format_exc()}")
+        raise e
+    finally:
+        out_interface.close()
+        in_interface.close()
+
+    logger.info(f"Batch finished: {n_rows} rows in {time.time() - time_start:.2f} s")
@@ -1,15 +1,45 @@
 import pydantic
-from typing import Dict, Any, Literal
+from typing import Dict, Any, Literal, Optional
 
 from ..transformers import registered_transformers
 
 
 allowed_transformers = list(registered_transformers.keys())
+# transformers without transform_batch, they can't be used in batch deployments
+stream_only_transformers = ["CAImageTransfomer"]
+# interfaces that can only be read from
+input_only_interfaces = ["h5df_replay"]
+
+
+def transformer_types(transformer_type, config):
+    """The transformer type and, for a CompoundTransformer, the types of its children"""
+    types = [transformer_type]
+    if transformer_type == "CompoundTransformer":
+        for child in config["transformers"].values():
+            types += transformer_types(child["type"], child["config"])
+    return types
 
 
 # all of the below objects need more work
 class DeploymentConfig(pydantic.BaseModel):
     type: str
+    # batch deployments only
+    chunk_size: int = 100000
+    vectorized: bool = True
+    # optional, {publish: bool, prefix: str} to host stage latencies as PVs
+    metrics: Any = None
+    # optional, {max_batch_size: int, max_wait_ms: float} to evaluate input snapshots in batches
+    batching: Any = None
+    # optional, {workers: int, shm_min_bytes: int} to evaluate the model in worker processes
+    executor: Any = None
+    # optional, {policy: fifo|latest|block, maxsize: int} for the input to inference hand-off
+    queue: Any = None
+    # skip updates that carry no new data, false to disable or {arrays, sample_size}
+    change_detection: Any = True
+    # optional, deadband for outputs without their own `deadband`, 0 skips unchanged values
+    output_deadband: Any = None
+    # optional, run inference at this fixed rate on the latest inputs instead of on every update
+    rate_hz: Optional[float] = None
 
 
 class InputDataConfig(pydantic.BaseModel):
@@ -47,6 +77,12 @@ class OutputDataToConfig(pydantic.BaseModel):
     put_method: str
     config: Any
 
+    @pydantic.validator("put_method")
+    def check_put_method(cls, v):
+        if v in input_only_interfaces:
+            raise ValueError(f"{v} is input only and can't be used as an output")
+        return v
+
 
 class OutputModelConfig(pydantic.BaseModel):
     config: Any
@@ -60,6 +96,45 @@ class ConfigObject(pydantic.BaseModel):
     output_data_to: OutputDataToConfig
     outputs_model: OutputModelConfig
 
+    @pydantic.root_validator(skip_on_failure=True)
+    def check_batch_transformers(cls, values):
+        if values["deployment"].type != "batch":
+            return values
+        # model_batch reads and writes whole columns, which only the h5df interface can do
+        get_method = values["input_data"].get_method
+        put_method = values["output_data_to"].put_method
+        if get_method != "h5df" or put_method != "h5df":
+            raise ValueError(
+                f"batch deployments read from and write to h5df, got {get_method} and "
+                f"{put_method}"
+            )
+        output_config = values["output_data_to"].config or {}
+        if output_config.get("mode", "r") not in ["w", "a"]:
+            raise ValueError(
+                "the h5df output of a batch deployment needs mode: w (or a to append)"
+            )
+        for transformer in [values["input_data_to_model"], values["output_model_to_data"]]:
+            for transformer_type in transformer_types(transformer.type, transformer.config):
+                if transformer_type in stream_only_transformers:
+                    raise ValueError(
+                        f"{transformer_type} can't be used in batch deployments"
+                    )
+        return values
+
+
+
+class ModelEntryConfig(pydantic.BaseModel):
+    # model getter name and its config, e.g. {model_name, model_version} for mlflow
+    model_getter: str = "mlflow"
+    config: Any
+    # pipeline (pv_mapping) config path, taken from the model artifacts if not given
+    pipeline: Optional[str] = None
+
+
+class MultiModelConfig(pydantic.BaseModel):
+    deployment: DeploymentConfig
+    models: Dict[str, ModelEntryConfig]
+
 
 # input_data:
 #   get_method: "k2eg"
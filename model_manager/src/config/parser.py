@@ -1,5 +1,5 @@
 import yaml
-from .config_object import ConfigObject
+from .config_object import ConfigObject, MultiModelConfig
 
 
 class ConfigParser:
@@ -14,3 +14,12 @@ class ConfigParser:
             except yaml.YAMLError as exc:
                 print(exc)
                 return None
+
+    def parse_multi(self):
+        with open(self.config_path, "r") as stream:
+            try:
+                data = yaml.safe_load(stream)
+                return MultiModelConfig(**data)
+            except yaml.YAMLError as exc:
+                print(exc)
+                return None
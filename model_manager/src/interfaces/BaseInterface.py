@@ -30,13 +30,13 @@ class BaseInterface(ABC):
     def get(self, name, **kwargs):
         pass
 
-    @abstractmethod
+    # input only interfaces (h5df_replay) leave these out, config validation keeps them
+    # from being used as outputs
     def put(self, name, value, **kwargs):
-        pass
+        raise NotImplementedError(f"{type(self).__name__} is input only")
 
-    @abstractmethod
     def put_many(self, data, **kwargs):
-        pass
+        raise NotImplementedError(f"{type(self).__name__} is input only")
 
     @abstractmethod
     def get_many(self, data, **kwargs):
@@ -1,27 +1,33 @@
-registered_interfaces = {}
+from src.registry import LazyRegistry
 
-try:
-    from .k2eg_interface import K2EGInterface
+# backends are only imported when a config names them, so a p4p only deployment
+# doesn't need k2eg or h5py installed
+registered_interfaces = LazyRegistry("model_manager.interfaces")
+registered_interfaces.register("k2eg", "src.interfaces.k2eg_interface:K2EGInterface")
+registered_interfaces.register("p4p", "src.interfaces.p4p_interface:SimplePVAInterface")
+registered_interfaces.register(
+    "p4p_server", "src.interfaces.p4p_interface:SimlePVAInterfaceServer"
+)
+registered_interfaces.register(
+    "p4p_async", "src.interfaces.p4p_async_interface:AsyncPVAInterface"
+)
+registered_interfaces.register("h5df", "src.interfaces.file_interface:h5dfInterface")
+registered_interfaces.register(
+    "h5df_replay", "src.interfaces.file_interface:h5dfReplayInterface"
+)
 
-    registered_interfaces["k2eg"] = K2EGInterface
-except ImportError as e:
-    print(f"Error importing k2eg interface: {e}")
-    raise e
+_classes = {
+    "K2EGInterface": "k2eg",
+    "SimplePVAInterface": "p4p",
+    "SimlePVAInterfaceServer": "p4p_server",
+    "AsyncPVAInterface": "p4p_async",
+    "h5dfInterface": "h5df",
+    "h5dfReplayInterface": "h5df_replay",
+}
 
-try:
-    from .p4p_interface import SimplePVAInterface
-    from .p4p_interface import SimlePVAInterfaceServer
 
-    registered_interfaces["p4p"] = SimplePVAInterface
-    registered_interfaces["p4p_server"] = SimlePVAInterfaceServer
-except ImportError as e:
-    print(f"Error importing pva interface: {e}")
-    raise e
-
-try:
-    from .file_interface import h5dfInterface
-
-    registered_interfaces["h5df"] = h5dfInterface
-except ImportError as e:
-    print(f"Error importing h5df interface: {e}")
-    raise e
+def __getattr__(name):
+    # keeps `from src.interfaces import SimplePVAInterface` working without eager imports
+    if name in _classes:
+        return registered_interfaces[_classes[name]]
+    raise AttributeError(f"module {__name__} has no attribute {name}")
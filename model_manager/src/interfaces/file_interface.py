@@ -1,5 +1,10 @@
-from .BaseInterface import BaseDataInterface
+from .BaseInterface import BaseDataInterface, BaseInterface
+from src.logging_utils import get_logger
 import h5py
+import numpy as np
+import heapq, threading, time
+
+logger = get_logger()
 
 
 # This is a simple interface that reads and writes to a h5df file
@@ -9,12 +14,22 @@ import h5py
 class h5dfInterface(BaseDataInterface):
     def __init__(self, config):
         self.path = config["path"]
-        # check if file exists
-        try:
-            with open(self.path, "r") as f:
-                pass
-        except FileNotFoundError:
-            raise FileNotFoundError(f"File {self.path} not found")
+        # "r" reads an existing file, "w" creates (or truncates) one, "a" appends
+        self.mode = config["mode"] if "mode" in config else "r"
+        self.file = None
+        if self.mode == "r":
+            # check if file exists
+            try:
+                with open(self.path, "r") as f:
+                    pass
+            except FileNotFoundError:
+                raise FileNotFoundError(f"File {self.path} not found")
+
+    def __get_file(self):
+        # keep one handle open so chunked reads and writes don't reopen the file
+        if self.file is None:
+            self.file = h5py.File(self.path, self.mode)
+        return self.file
 
     # we want to be able to read one or write one at a time, yeild one at a time, in a generator fashion, this is for backtesting
     def load(self, **kwargs):
@@ -27,6 +42,187 @@ class h5dfInterface(BaseDataInterface):
             for key, value in data:
                 f.create_dataset(key, data=value)
 
+    def num_rows(self, names):
+        """Number of rows that can be read for all of the given datasets"""
+        f = self.__get_file()
+        lengths = [f[name].shape[0] for name in names]
+        if len(set(lengths)) > 1:
+            raise ValueError(f"Datasets {names} have different lengths: {lengths}")
+        return lengths[0] if len(lengths) > 0 else 0
+
+    def read_columns(self, names, start, stop):
+        """Read rows [start, stop) of each dataset, only this slice is loaded"""
+        f = self.__get_file()
+        return {name: f[name][start:stop] for name in names}
+
+    def write_columns(self, data, start):
+        """Write a chunk of rows starting at `start`, datasets grow as needed"""
+        f = self.__get_file()
+        for name, value in data.items():
+            value = np.asarray(value)
+            stop = start + value.shape[0]
+            if name not in f:
+                f.create_dataset(
+                    name,
+                    shape=(stop,) + value.shape[1:],
+                    maxshape=(None,) + value.shape[1:],
+                    dtype=value.dtype,
+                    chunks=True,
+                )
+            elif f[name].shape[0] < stop:
+                f[name].resize(stop, axis=0)
+            f[name][start:stop] = value
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
     def monitor(self, handler, **kwargs):
         # this is a faux monitor, it will just read the file and call the handler with each key value pair
         pass
+
+
+class h5dfReplayInterface(BaseInterface):
+    """
+    Replays archived data from a h5df file as if it was a live system, for backtesting
+    and for benchmarking the continuous pipeline without EPICS.
+
+    Each variable is a dataset with time along the first axis, rows can be scalars or images.
+    Datasets are streamed chunk_size rows at a time so files larger than memory can be used,
+    and the variables are interleaved by timestamp before being handed to the monitor handlers.
+
+    config:
+        path: file to replay
+        rate: "realtime", "max" (as fast as possible) or a number to scale real time by
+        chunk_size: rows read per dataset at a time
+        timestamps: optional dataset of timestamps (seconds) shared by all variables
+        variables:
+            <variable>:
+                name: dataset name
+                timestamps: optional dataset of timestamps for this variable only
+    without any timestamps the row index is used as the time in seconds
+
+    The replay thread calls the monitor handlers directly, so at rate "max" it only slows
+    down when a handler blocks, model_main gives it a bounded, blocking input queue for
+    that (see `needs_backpressure`). Once the last row has been handed over the `on_end`
+    callbacks passed to monitor() are called, so a replay run can finish on its own.
+    Input only, it can't be configured as an output.
+    """
+
+    def __init__(self, config):
+        self.path = config["path"]
+        self.rate = config["rate"] if "rate" in config else "realtime"
+        self.chunk_size = config["chunk_size"] if "chunk_size" in config else 10000
+        if self.rate not in ["realtime", "max"]:
+            self.rate = float(self.rate)
+            if self.rate <= 0:
+                raise ValueError(f"Replay rate must be positive, got {self.rate}")
+
+        pv_dict = config["variables"]
+        self.variable_list = list(pv_dict.keys())
+        self.variables = pv_dict
+        self.datasets = {pv: pv_dict[pv]["name"] for pv in pv_dict}
+        self.timestamps = {}
+        for pv in pv_dict:
+            if "timestamps" in pv_dict[pv]:
+                self.timestamps[pv] = pv_dict[pv]["timestamps"]
+            elif "timestamps" in config:
+                self.timestamps[pv] = config["timestamps"]
+            else:
+                self.timestamps[pv] = None
+
+        try:
+            self.file = h5py.File(self.path, "r")
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File {self.path} not found")
+
+        # nothing else paces a replay at full speed, the consumer has to push back
+        self.needs_backpressure = self.rate == "max"
+
+        self.latest = {}
+        self.monitor_handlers = []
+        self.end_handlers = []
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.finished = threading.Event()
+        self.replayed = 0
+
+    def __stream(self, name):
+        # yields (timestamp, name, value) one row at a time while only holding one chunk
+        dataset = self.file[self.datasets[name]]
+        ts_name = self.timestamps[name]
+        timestamps = self.file[ts_name] if ts_name is not None else None
+        for start in range(0, dataset.shape[0], self.chunk_size):
+            stop = min(start + self.chunk_size, dataset.shape[0])
+            values = dataset[start:stop]
+            if timestamps is not None:
+                times = timestamps[start:stop]
+            else:
+                times = np.arange(start, stop, dtype=float)
+            for t, value in zip(times, values):
+                yield float(t), name, value
+
+    def __wrap(self, t, value):
+        if isinstance(value, np.ndarray) and value.ndim == 0:
+            value = value.item()
+        elif isinstance(value, np.generic):
+            value = value.item()
+        return {"value": value, "timestamp": t}
+
+    def __replay(self):
+        merged = heapq.merge(
+            *[self.__stream(name) for name in self.variable_list], key=lambda x: x[0]
+        )
+        wall_start = None
+        t0 = None
+        for t, name, value in merged:
+            if self.stop_event.is_set():
+                break
+            if self.rate != "max":
+                if wall_start is None:
+                    wall_start = time.monotonic()
+                    t0 = t
+                scale = 1.0 if self.rate == "realtime" else self.rate
+                delay = wall_start + (t - t0) / scale - time.monotonic()
+                if delay > 0 and self.stop_event.wait(delay):
+                    break
+            value = self.__wrap(t, value)
+            self.latest[name] = value
+            self.replayed += 1
+            for handler in self.monitor_handlers:
+                handler(name, value)
+        if self.stop_event.is_set():
+            logger.info(f"Replay of {self.path} stopped after {self.replayed} updates")
+            return
+        logger.info(f"Replay of {self.path} finished after {self.replayed} updates")
+        self.finished.set()
+        for on_end in self.end_handlers:
+            on_end()
+
+    def monitor(self, handler, on_end=None, **kwargs):
+        """Start the replay, on_end() is called once every row has been handed over"""
+        self.monitor_handlers.append(handler)
+        if on_end is not None:
+            self.end_handlers.append(on_end)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.__replay, daemon=True)
+            self.thread.start()
+
+    def get(self, name, **kwargs):
+        if name not in self.latest:
+            # nothing replayed yet, start from the first row
+            value = self.file[self.datasets[name]][0]
+            ts_name = self.timestamps[name]
+            t = float(self.file[ts_name][0]) if ts_name is not None else 0.0
+            return name, self.__wrap(t, value)
+        return name, self.latest[name]
+
+    def get_many(self, data, **kwargs):
+        return [self.get(name) for name in data]
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.file.close()
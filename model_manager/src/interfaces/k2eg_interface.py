@@ -1,10 +1,9 @@
-import k2eg, os, uuid
+import k2eg, os, uuid, time, threading
 from .BaseInterface import BaseInterface
+from .pipelined_puts import PipelinedPuts
 from src.logging_utils import get_logger
 from concurrent.futures import ThreadPoolExecutor
 
-executor = ThreadPoolExecutor(20)
-
 logger = get_logger()
 
 # _dir = os.path.dirname(os.path.abspath(__file__))
@@ -21,7 +20,7 @@ class K2EGInterface(BaseInterface):
                 group_name=f"model-deployment-{str(uuid.uuid4())[0:15]}",
             )
         except Exception as e:
-            print(f"Error initializing K2EGInterface: {e}")
+            logger.error(f"Error initializing K2EGInterface: {e}")
             self.close()
             raise e
 
@@ -32,12 +31,40 @@ class K2EGInterface(BaseInterface):
         self.pv_url_list = pv_url_list
         self.symbol_list = list(pv_dict.keys())
         self.variable_list = list(pv_dict.keys())
+        self.variables = pv_dict
         self.url_lookup = {
             pv_dict[pv]["proto"] + "://" + pv_dict[pv]["name"]: pv for pv in pv_dict
         }
         self.reverse_url_lookup = {
             pv: pv_dict[pv]["proto"] + "://" + pv_dict[pv]["name"] for pv in pv_dict
         }
+        # k2eg calls monitor handlers with the bare pv name
+        self.name_lookup = {pv_dict[pv]["name"]: pv for pv in pv_dict}
+
+        # latest values are cached from a single monitor subscription so reads stay local,
+        # max_age (seconds) optionally bounds how stale a cached value may get before
+        # get() falls back to a request over kafka
+        self.max_age = config["max_age"] if "max_age" in config else None
+        self.cache = {pv: None for pv in pv_dict}
+        self.cache_time = {pv: None for pv in pv_dict}
+        self.update_count = {pv: 0 for pv in pv_dict}
+        # update count of the value last returned by get / get_many, anything newer is
+        # replayed to a handler when it is added
+        self.served_count = {pv: 0 for pv in pv_dict}
+        self.monitor_handlers = []
+        self.subscribed = False
+        self.lock = threading.Lock()
+
+        # puts of one put_many are issued concurrently on this instance's own pool, created
+        # on first use so input only interfaces don't start threads, with pipelined_puts:
+        # true put_many hands them to a background writer
+        self.put_workers = config["put_workers"] if "put_workers" in config else 20
+        self.executor = None
+        self.puts = None
+        self.put_tracker = None
+        if "pipelined_puts" in config and config["pipelined_puts"]:
+            self.puts = PipelinedPuts(self.__put_now, name="k2eg")
+            self.put_tracker = self.puts.tracker
 
         logger.debug(f"K2EGInterface initialized with pv_url_list: {self.pv_url_list}")
         logger.debug(f"K2EGInterface initialized with symbol_list: {self.symbol_list}")
@@ -46,40 +73,119 @@ class K2EGInterface(BaseInterface):
             f"K2EGInterface initialized with reverse_url_lookup: {self.reverse_url_lookup}"
         )
 
-    def monitor(self, handler, **kwargs):
-        logger.debug(f"Monitoring {self.pv_url_list}")
-
+    def __subscribe(self):
+        # one subscription for every pv, made on first read so output only interfaces never subscribe
+        if self.subscribed:
+            return
         try:
-            self.client.monitor_many(self.pv_url_list, handler, timeout=1000)
+            self.client.monitor_many(self.pv_url_list, self.__cache_handler, timeout=1000)
+            self.subscribed = True
         except Exception as e:
-            print(f"Error monitoring: {e}")
+            logger.error(f"Error monitoring: {e}")
             raise e
 
+    def __store(self, name, value):
+        with self.lock:
+            self.update_count[name] += 1
+            if isinstance(value, dict):
+                # the counter lets change detection tell a new update from a re-read of the cache
+                value = {**value, "counter": self.update_count[name]}
+            self.cache[name] = value
+            self.cache_time[name] = time.monotonic()
+            return value
+
+    def __cache_handler(self, pv_name, value):
+        name = self.name_lookup.get(pv_name, pv_name)
+        value = self.__store(name, value)
+        for handler in self.monitor_handlers:
+            handler(name, value)
+
+    def monitor(self, handler, **kwargs):
+        # the interface is usually already subscribed, handlers are fed from the cache updates
+        logger.debug(f"Monitoring {self.pv_url_list}")
+        with self.lock:
+            self.monitor_handlers.append(handler)
+            # updates that arrived after the last get / get_many would otherwise never reach
+            # the handler, they are replayed under the lock so a newer monitor update can't
+            # overtake them, one that was stored just before may be delivered twice, which
+            # change detection drops by its counter
+            for name in self.variable_list:
+                if self.update_count[name] > self.served_count[name]:
+                    handler(name, self.cache[name])
+        self.__subscribe()
+
+    def __is_stale(self, name):
+        if self.cache[name] is None:
+            return True
+        if self.max_age is None:
+            return False
+        return time.monotonic() - self.cache_time[name] > self.max_age
+
     def get(self, name, **kwargs):
-        url = self.reverse_url_lookup[name]
-        value = self.client.get(url)
-        return name, value
+        self.__subscribe()
+        if self.__is_stale(name):
+            logger.debug(f"Cached value for {name} missing or stale, fetching")
+            url = self.reverse_url_lookup[name]
+            self.__store(name, self.client.get(url))
+        with self.lock:
+            self.served_count[name] = self.update_count[name]
+            return name, self.cache[name]
 
     def put(self, name, value, **kwargs):
         # print(f"putting {name} with value {value}")
         try:
             self.client.put(self.reverse_url_lookup[name], value)
         except Exception as e:
-            print(f"Error putting: {e}")
+            logger.error(f"Error putting {name}: {e}")
             raise e
 
+    def __put_now(self, data):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                self.put_workers, thread_name_prefix="k2eg-put"
+            )
+        futures = {
+            name: self.executor.submit(self.put, name, value)
+            for name, value in data.items()
+        }
+        failures = {}
+        for name, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                failures[name] = error
+        return failures
+
     def put_many(self, data, **kwargs):
-        results = []
-        for name, value in data.items():
-            res = executor.submit(self.put, name, value)
-            results.append(res)
-        for res in results:
-            res.result()
+        if self.puts is not None:
+            # returns at once, completion and failures are counted in put_tracker
+            self.puts.put(data)
+            return
+        failures = self.__put_now(data)
+        if failures:
+            raise next(iter(failures.values()))
+
+    def flush(self, timeout=None):
+        """Wait for the puts handed to the background writer, False if the timeout ran out"""
+        if self.puts is None:
+            return True
+        return self.puts.flush(timeout)
 
     def get_many(self, data, **kwargs):
-        pass
+        self.__subscribe()
+        for name in data:
+            if self.__is_stale(name):
+                self.get(name)
+        # read every value under one lock so the result is a consistent snapshot
+        with self.lock:
+            for name in data:
+                self.served_count[name] = self.update_count[name]
+            return [(name, self.cache[name]) for name in data]
 
     def close(self):
+        if getattr(self, "puts", None) is not None:
+            self.puts.close()
+        if getattr(self, "executor", None) is not None:
+            self.executor.shutdown(wait=False)
         self.client.close()
-        print("K2EGInterface closed")
+        logger.debug("K2EGInterface closed")
         return True
@@ -0,0 +1,140 @@
+from p4p.client.asyncio import Context
+from p4p.nt import NTNDArray
+
+from .p4p_interface import SimplePVAInterface
+from .pipelined_puts import PutTracker
+from src.logging_utils import get_logger
+import asyncio
+import time
+import numpy as np
+
+logger = get_logger()
+
+
+class AsyncPVAInterface(SimplePVAInterface):
+    """
+    SimplePVAInterface on p4p's asyncio client, same config and image handling.
+
+    get, get_many, put, put_many and monitor are coroutines and must be awaited from the
+    event loop model_main runs on. PVA round trips no longer block the loop, and the
+    requests of get_many / put_many are all in flight at once. `timeout` (seconds, default 5)
+    bounds every request.
+
+    put_many awaits the writes. With pipelined_puts: true it returns once the values are
+    handed to a writer task instead, like the threaded interface values still waiting for
+    the previous write to finish are replaced by newer ones.
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        # the threaded writer is replaced by a task on the loop
+        self.puts = None
+        self.put_tracker = None
+        if "pipelined_puts" in config and config["pipelined_puts"]:
+            self.put_tracker = PutTracker()
+        self.pending = {}
+        self.pending_since = None
+        self.writer = None
+
+    def _make_context(self):
+        return Context("pva", nt=False)
+
+    def __handler_wrapper(self, handler, name):
+        # p4p runs monitor callbacks as coroutines on the loop
+        async def wrapped_handler(value):
+            if isinstance(value, Exception):
+                logger.warning(f"Monitor for {name}: {value!r}")
+                return
+            handler(name, self._unwrap(value))
+
+        return wrapped_handler
+
+    async def monitor(self, handler, **kwargs):
+        for pv in self.pv_list:
+            try:
+                self.subscriptions.append(
+                    self.ctxt.monitor(pv, self.__handler_wrapper(handler, pv))
+                )
+            except Exception as e:
+                logger.error(f"Error monitoring {pv} in AsyncPVAInterface: {e}")
+                raise e
+
+    async def get(self, name, **kwargs):
+        value = await asyncio.wait_for(self.ctxt.get(name), self.timeout)
+        return name, self._unwrap(value)
+
+    async def get_many(self, data, **kwargs):
+        names = list(data)
+        values = await asyncio.wait_for(self.ctxt.get(names), self.timeout)
+        return [(name, self._unwrap(value)) for name, value in zip(names, values)]
+
+    @staticmethod
+    def __wrap(value):
+        if type(value) == np.ndarray:
+            return NTNDArray().wrap(value)
+        return value
+
+    async def put(self, name, value, **kwargs):
+        return await asyncio.wait_for(
+            self.ctxt.put(name, self.__wrap(value)), self.timeout
+        )
+
+    async def __put_now(self, data):
+        # every channel is written concurrently, failed channels come back as exceptions
+        names = list(data.keys())
+        results = await asyncio.gather(
+            *[self.put(name, value) for name, value in data.items()],
+            return_exceptions=True,
+        )
+        return {
+            name: result
+            for name, result in zip(names, results)
+            if isinstance(result, Exception)
+        }
+
+    async def __write_pending(self):
+        while self.pending:
+            data, self.pending = self.pending, {}
+            since, self.pending_since = self.pending_since, None
+            failures = await self.__put_now(data)
+            if failures:
+                logger.warning(
+                    f"{len(failures)} of {len(data)} p4p_async puts failed: "
+                    f"{next(iter(failures.values()))!r}"
+                )
+            self.put_tracker.finished(
+                len(data), failures, time.perf_counter_ns() - since
+            )
+
+    async def put_many(self, data, **kwargs):
+        if self.put_tracker is None:
+            failures = await self.__put_now(data)
+            if failures:
+                raise next(iter(failures.values()))
+            return
+        replaced = sum(1 for name in data if name in self.pending)
+        self.put_tracker.issued(len(data))
+        if replaced:
+            self.put_tracker.replaced(replaced)
+        self.pending.update(data)
+        if self.pending_since is None:
+            self.pending_since = time.perf_counter_ns()
+        if self.writer is None or self.writer.done():
+            self.writer = asyncio.get_running_loop().create_task(self.__write_pending())
+
+    async def flush(self, timeout=None):
+        """Wait for the writer task, False if the timeout ran out"""
+        if self.writer is None:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(self.writer), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def close(self):
+        if self.writer is not None and not self.writer.done():
+            # close() is synchronous, whatever hasn't been written by now is dropped
+            logger.warning(f"Closing with {self.put_tracker.in_flight} puts in flight")
+            self.writer.cancel()
+        super().close()
@@ -6,6 +6,7 @@ from p4p.nt import NTScalar, NTNDArray
 from p4p.wrapper import Value,Type
 
 from .BaseInterface import BaseInterface
+from .pipelined_puts import PipelinedPuts
 from src.logging_utils import get_logger
 import os, time
 import numpy as np
@@ -17,7 +18,8 @@ logger = get_logger()
 
 class SimplePVAInterface(BaseInterface):
     def __init__(self, config):
-        self.ctxt = Context("pva", nt=False)
+        self.ctxt = self._make_context()
+        self.subscriptions = []
         if "EPICS_PVA_NAME_SERVERS" in os.environ:
             logger.debug(
                 f"EPICS_PVA_NAME_SERVERS: {os.environ['EPICS_PVA_NAME_SERVERS']}"
@@ -46,14 +48,55 @@ class SimplePVAInterface(BaseInterface):
             pv_list.append(pv_dict[pv]["name"])
         self.pv_list = pv_list
         self.variable_list = list(pv_dict.keys())
+        self.variables = pv_dict
+        # seconds for every request, p4p's default unless configured
+        self.timeout = config["timeout"] if "timeout" in config else 5.0
+        # with pipelined_puts: true put_many hands writes to a background writer, failures
+        # are then only counted in put_tracker and logged
+        self.puts = None
+        self.put_tracker = None
+        if "pipelined_puts" in config and config["pipelined_puts"]:
+            self.puts = PipelinedPuts(self.__put_now, name="p4p")
+            self.put_tracker = self.puts.tracker
         logger.debug(f"SimplePVAInterface initialized with pv_url_list: {self.pv_list}")
 
+    def _make_context(self):
+        return Context("pva", nt=False)
+
+    @staticmethod
+    def _unwrap(value):
+        # unwrap p4p.Value into {"value": ...}, images are reshaped to (y, x)
+        # p4p hands out read-only arrays over the received buffer and the reshape is a view,
+        # so images are not copied here
+        if type(value["value"]) == np.ndarray:
+            y_size = value["dimension"][0]["size"]
+            x_size = value["dimension"][1]["size"]
+            unwrapped = {"value": value["value"].reshape((y_size, x_size))}
+        else:
+            unwrapped = {"value": value["value"]}
+        timestamp = SimplePVAInterface._timestamp(value)
+        if timestamp is not None:
+            unwrapped["timestamp"] = timestamp
+        return unwrapped
+
+    @staticmethod
+    def _timestamp(value):
+        # seconds since epoch, None if the PV has no timestamp or it was never set
+        try:
+            seconds = value["timeStamp"]["secondsPastEpoch"]
+            nanoseconds = value["timeStamp"]["nanoseconds"]
+        except (KeyError, AttributeError):
+            return None
+        if seconds == 0 and nanoseconds == 0:
+            return None
+        return seconds + nanoseconds * 1e-9
+
     def __handler_wrapper(self, handler, name):
         # unwrap p4p.Value into name, value
         def wrapped_handler(value):
             # logger.debug(f"SimplePVAInterface handler for {name, value['value']}")
 
-            handler(name, {"value": value["value"]})
+            handler(name, self._unwrap(value))
 
         return wrapped_handler
 
@@ -61,7 +104,8 @@ class SimplePVAInterface(BaseInterface):
         for pv in self.pv_list:
             try:
                 new_handler = self.__handler_wrapper(handler, pv)
-                self.ctxt.monitor(pv, new_handler)
+                # p4p closes a subscription once it is garbage collected, so keep them
+                self.subscriptions.append(self.ctxt.monitor(pv, new_handler))
             except Exception as e:
                 logger.error(
                     f"Error monitoring in function monitor for SimplePVAInterface: {e}"
@@ -71,33 +115,58 @@ class SimplePVAInterface(BaseInterface):
         # pass # bugged out
 
     def get(self, name, **kwargs):
-        value = self.ctxt.get(name)        
-        if type(value["value"]) == np.ndarray:
-            y_size = value["dimension"][0]["size"]
-            x_size = value["dimension"][1]["size"]
-            value = value["value"].reshape((y_size, x_size))
-        else:
-            value = value["value"]
-            
-        value  = {"value": value}
-        return name, value
+        value = self.ctxt.get(name, timeout=self.timeout)
+        return name, self._unwrap(value)
 
     def put(self, name, value, **kwargs):
         if type(value) == np.ndarray:
             value = NTNDArray().wrap(value)
         else:
             value = value
-        return self.ctxt.put(name, value)
+        return self.ctxt.put(name, value, timeout=self.timeout)
+
+    def __put_now(self, data):
+        # a list put issues every write at once, failed channels come back as exceptions
+        names = list(data.keys())
+        values = [
+            NTNDArray().wrap(value) if type(value) == np.ndarray else value
+            for value in data.values()
+        ]
+        results = self.ctxt.put(names, values, timeout=self.timeout, throw=False)
+        return {
+            name: result
+            for name, result in zip(names, results)
+            if isinstance(result, Exception)
+        }
 
     def put_many(self, data, **kwargs):
-        for key, value in data.items():
-            self.put(key, value)
+        if self.puts is not None:
+            # returns at once, completion and failures are counted in put_tracker
+            self.puts.put(data)
+            return
+        failures = self.__put_now(data)
+        if failures:
+            raise next(iter(failures.values()))
+
+    def flush(self, timeout=None):
+        """Wait for the puts handed to the background writer, False if the timeout ran out"""
+        if self.puts is None:
+            return True
+        return self.puts.flush(timeout)
 
     def get_many(self, data, **kwargs):
-        pass
+        # a list get issues all requests at once and returns when every one has completed
+        names = list(data)
+        values = self.ctxt.get(names, timeout=self.timeout)
+        return [(name, self._unwrap(value)) for name, value in zip(names, values)]
 
     def close(self):
         logger.debug("Closing SimplePVAInterface")
+        if self.puts is not None:
+            self.puts.close()
+        for subscription in self.subscriptions:
+            subscription.close()
+        self.subscriptions = []
         self.ctxt.close()
 
 
@@ -108,7 +177,11 @@ class SimlePVAInterfaceServer(SimplePVAInterface):
 
     def __init__(self, config):
         super().__init__(config)
+        # posts to the hosted PVs are local, put_many stays synchronous
+        self.puts = None
+        self.put_tracker = None
         self.shared_pvs = {}
+        self.monitor_handlers = []
 
         if "init" in config:
             # print(f"config['init']: {config['init']}")
@@ -149,12 +222,7 @@ class SimlePVAInterfaceServer(SimplePVAInterface):
                 pv_item[pv] = SharedPV(nt=pv_type_nt, initial=None)
                 # logger.debug(f"pv_item[pv]: {pv_item[pv]}")
 
-            @pv_item[pv].put
-            def put(pv: SharedPV, op: ServOpWrap):
-                # logger.debug(f"Put {pv} {op}")
-                # logger.debug(f"type(pv): {type(op.value())}")
-                pv.post(op.value(), timestamp=time.time())
-                op.done()
+            pv_item[pv].put(self.__put_handler(pv))
 
             self.shared_pvs[pv] = pv_item[pv]
             # this feels ugly
@@ -163,6 +231,28 @@ class SimlePVAInterfaceServer(SimplePVAInterface):
             providers=[{name: pv} for name, pv in self.shared_pvs.items()]
         )
 
+    def __put_handler(self, name):
+        # remote puts are posted and forwarded to anything monitoring this server
+        def put(pv: SharedPV, op: ServOpWrap):
+            # logger.debug(f"Put {pv} {op}")
+            # logger.debug(f"type(pv): {type(op.value())}")
+            pv.post(op.value(), timestamp=time.time())
+            op.done()
+            self.__notify(name)
+
+        return put
+
+    def __notify(self, name):
+        if len(self.monitor_handlers) == 0:
+            return
+        _, value = self.get(name)
+        for handler in self.monitor_handlers:
+            handler(name, value)
+
+    def monitor(self, handler, **kwargs):
+        # the PVs are hosted here so there is no need to go through a client context
+        self.monitor_handlers.append(handler)
+
     def close(self):
         logger.debug("Closing SimplePVAInterfaceServer")
         self.server.stop()
@@ -174,6 +264,7 @@ class SimlePVAInterfaceServer(SimplePVAInterface):
         #     value = value.T # quick fix for the fact that the image is flipped
         
         self.shared_pvs[name].post(value, timestamp=time.time())
+        self.__notify(name)
 
     def get(self, name, **kwargs):
         # print(f"Getting {name}")
@@ -181,6 +272,7 @@ class SimlePVAInterfaceServer(SimplePVAInterface):
 
         # print(f"value_raw_type: {type(value_raw.value)}")
         if type(value_raw.value) == np.ndarray:
+            # read-only view over the posted value, no copy
             value = value_raw.value
             x_size = value_raw.dimension[0].size
             y_size = value_raw.dimension[1].size
@@ -189,7 +281,14 @@ class SimlePVAInterfaceServer(SimplePVAInterface):
             value = value_raw.value
 
         # print(f"value: {value}")
-        return name, {"value": value}
+        unwrapped = {"value": value}
+        timestamp = self._timestamp(value_raw)
+        if timestamp is not None:
+            unwrapped["timestamp"] = timestamp
+        return name, unwrapped
+
+    def get_many(self, data, **kwargs):
+        return [self.get(name) for name in data]
 
     def put_many(self, data, **kwargs):
         for key, value in data.items():
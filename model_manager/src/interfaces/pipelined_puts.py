@@ -0,0 +1,174 @@
+from src.logging_utils.make_logger import get_logger
+from src.metrics import LatencyHistogram
+import threading
+import time
+
+logger = get_logger()
+
+
+class PutTracker:
+    """
+    Book keeping for output writes that complete in the background.
+
+    in_flight counts channel writes that were handed over and haven't completed yet,
+    superseded ones were replaced by a newer value before they were issued. latency is the
+    time from handing a put_many over to its completion, one sample per put_many.
+    Handlers registered with on_failure are called with the {channel: exception} of every
+    completion that had failures. Thread safe, completions may be reported from any thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.superseded = 0
+        self.errors = {}
+        self.latency = LatencyHistogram()
+        self.failure_handlers = []
+
+    def on_failure(self, handler):
+        """Call handler(failures) from the writer whenever some writes failed"""
+        self.failure_handlers.append(handler)
+
+    def issued(self, count):
+        with self.lock:
+            self.in_flight += count
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def replaced(self, count):
+        with self.lock:
+            self.in_flight -= count
+            self.superseded += count
+            self.lock.notify_all()
+
+    def finished(self, count, failures, latency_ns):
+        """count writes completed, failures maps channel -> exception for the ones that failed"""
+        with self.lock:
+            self.in_flight -= count
+            self.completed += count - len(failures)
+            self.failed += len(failures)
+            for name, error in failures.items():
+                self.errors[name] = repr(error)
+            self.latency.record(latency_ns)
+            self.lock.notify_all()
+        if failures:
+            for handler in self.failure_handlers:
+                handler(failures)
+
+    def wait(self, timeout=None):
+        """Block until nothing is in flight, False if the timeout ran out first"""
+        with self.lock:
+            return self.lock.wait_for(lambda: self.in_flight == 0, timeout)
+
+    def stats(self, reset=True):
+        """
+        Counters and latency summary, completed, failed and superseded are totals, latency,
+        max_in_flight and errors are since the last reset.
+        """
+        with self.lock:
+            stats = {
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "superseded": self.superseded,
+                "latency": self.latency.summary(),
+                "errors": dict(self.errors),
+            }
+            if reset:
+                self.max_in_flight = self.in_flight
+                self.errors = {}
+                self.latency.reset()
+        return stats
+
+    @staticmethod
+    def format(stats):
+        stat_string = (
+            f"puts: in flight {stats['in_flight']} (max {stats['max_in_flight']}) | "
+            f"completed {stats['completed']} | failed {stats['failed']} | "
+            f"superseded {stats['superseded']}"
+        )
+        latency = stats["latency"]
+        if latency["count"]:
+            stat_string += (
+                f" | put p50 {latency['p50'] / 1e6:.2f} p99 {latency['p99'] / 1e6:.2f}"
+                f" max {latency['max'] / 1e6:.2f} ms"
+            )
+        return stat_string
+
+
+class PipelinedPuts:
+    """
+    Hands put_many writes to a background writer thread so the caller never waits on them.
+
+    put(data) queues the values and returns at once. The writer calls write(data), a blocking
+    function that issues every channel of one batch concurrently and returns
+    {channel: exception} for the ones that failed. Batches are written in order. Values still
+    waiting when a newer value for the same channel arrives are replaced by it, so a slow
+    output can't build up a backlog, at most one batch is pending behind the one being written.
+    """
+
+    def __init__(self, write, name="output"):
+        self.write = write
+        self.name = name
+        self.tracker = PutTracker()
+        self.pending = {}
+        self.pending_since = None
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = None
+
+    def put(self, data):
+        with self.condition:
+            if self.closed:
+                raise RuntimeError(f"{self.name} puts are closed")
+            replaced = sum(1 for name in data if name in self.pending)
+            # counted before the writer can see the values, so in_flight never goes negative
+            self.tracker.issued(len(data))
+            if replaced:
+                self.tracker.replaced(replaced)
+            self.pending.update(data)
+            if self.pending_since is None:
+                self.pending_since = time.perf_counter_ns()
+            # started on first use, interfaces that never write don't get a thread
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.__run, name=f"{self.name}-puts", daemon=True
+                )
+                self.thread.start()
+            self.condition.notify()
+
+    def __run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.closed)
+                if not self.pending:
+                    return
+                data, self.pending = self.pending, {}
+                since, self.pending_since = self.pending_since, None
+            try:
+                failures = self.write(data)
+            except Exception as e:
+                failures = {name: e for name in data}
+            if failures:
+                logger.warning(
+                    f"{len(failures)} of {len(data)} {self.name} puts failed: "
+                    f"{next(iter(failures.values()))!r}"
+                )
+            self.tracker.finished(len(data), failures, time.perf_counter_ns() - since)
+
+    def flush(self, timeout=None):
+        """Wait for everything handed over so far to be written"""
+        return self.tracker.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Write what is pending, then stop the writer"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                logger.warning(f"{self.name} puts still in flight after {timeout} s")
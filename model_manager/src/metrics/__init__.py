@@ -0,0 +1,2 @@
+from src.metrics.histogram import LatencyHistogram, StageMetrics
+from src.metrics.publisher import MetricsPublisher
@@ -0,0 +1,156 @@
+from src.logging_utils.make_logger import get_logger
+import math
+
+logger = get_logger()
+
+
+class LatencyHistogram:
+    """
+    Fixed memory log-linear histogram of latencies in nanoseconds (HDR style).
+
+    Values below 2**sub_bucket_bits are counted exactly, above that every power of two
+    is split into 2**(sub_bucket_bits - 1) linear buckets, so the relative error of any
+    percentile is at most 2**-(sub_bucket_bits - 1) (~1.6% for the default of 7).
+    max_shift=40 covers values up to ~2**47 ns (~39 hours), anything larger is clamped.
+    Not thread safe, record from the event loop thread.
+    """
+
+    def __init__(self, sub_bucket_bits=7, max_shift=40):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_count = self.sub_bucket_count >> 1
+        self.max_shift = max_shift
+        self.counts = [0] * (self.sub_bucket_count + max_shift * self.half_count)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        if shift > self.max_shift:
+            return len(self.counts) - 1
+        mantissa = value >> shift
+        return self.sub_bucket_count + (shift - 1) * self.half_count + (
+            mantissa - self.half_count
+        )
+
+    def __upper_bound(self, index):
+        # highest value that lands in the bucket
+        if index < self.sub_bucket_count:
+            return index
+        shift = (index - self.sub_bucket_count) // self.half_count + 1
+        mantissa = (index - self.sub_bucket_count) % self.half_count + self.half_count
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value_ns):
+        value_ns = max(int(value_ns), 0)
+        self.counts[self.__index(value_ns)] += 1
+        self.count += 1
+        self.total += value_ns
+        if self.max is None or value_ns > self.max:
+            self.max = value_ns
+        if self.min is None or value_ns < self.min:
+            self.min = value_ns
+
+    def percentile(self, percentile):
+        """Value (ns) at the given percentile (0-100), None if nothing was recorded"""
+        if self.count == 0:
+            return None
+        target = max(1, math.ceil(percentile / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                # never report more than the largest value actually seen
+                return min(self.__upper_bound(index), self.max)
+        return self.max
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def summary(self):
+        """count, mean, p50, p90, p99 and max, all in nanoseconds"""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class StageMetrics:
+    """
+    Latency histograms per pipeline stage.
+
+    Values are recorded into a window that is folded into the running totals each time
+    the window is reported, so both the last period and the whole run are available.
+    """
+
+    def __init__(self, stages=None):
+        self.window = {}
+        self.totals = {}
+        for stage in stages or []:
+            self.add_stage(stage)
+
+    def add_stage(self, stage):
+        if stage not in self.window:
+            self.window[stage] = LatencyHistogram()
+            self.totals[stage] = LatencyHistogram()
+
+    def record(self, stage, value_ns):
+        if stage not in self.window:
+            self.add_stage(stage)
+        self.window[stage].record(value_ns)
+
+    def summary(self, window=True):
+        """Per stage summary of the current window, or of the whole run if window=False"""
+        if window:
+            return {stage: hist.summary() for stage, hist in self.window.items()}
+        totals = {}
+        for stage, hist in self.totals.items():
+            merged = LatencyHistogram()
+            merged.merge(hist)
+            merged.merge(self.window[stage])
+            totals[stage] = merged.summary()
+        return totals
+
+    def roll_window(self):
+        """Fold the window into the totals and start a new one, returns the window summary"""
+        summary = self.summary()
+        for stage, hist in self.window.items():
+            self.totals[stage].merge(hist)
+            hist.reset()
+        return summary
+
+    @staticmethod
+    def format(summary):
+        stat_string = ""
+        for stage, stats in summary.items():
+            if stats["count"] == 0:
+                continue
+            stat_string += (
+                f" {stage}: p50 {stats['p50'] / 1e6:.2f} p90 {stats['p90'] / 1e6:.2f}"
+                f" p99 {stats['p99'] / 1e6:.2f} max {stats['max'] / 1e6:.2f} ms"
+                f" (n={stats['count']}) |"
+            )
+        return stat_string
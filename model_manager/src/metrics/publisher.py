@@ -0,0 +1,86 @@
+from src.logging_utils.make_logger import get_logger
+
+logger = get_logger()
+
+
+class MetricsPublisher:
+    """
+    Publishes stage summaries as PVs through the p4p_server interface.
+
+    For every stage <prefix>:<STAGE>:COUNT, :P50, :P90, :P99 and :MAX are hosted,
+    latencies are published in ms. With `pipelines` (multi model deployments) the names are
+    <prefix>:<PIPELINE>:<STAGE>:<STAT>, all hosted by the same server. Input queue counters
+    are hosted as <prefix>:QUEUE:DEPTH, :MAX_DEPTH, :DROPPED and :COALESCED, background
+    output writes as <prefix>:PUTS:IN_FLIGHT, :COMPLETED, :FAILED, :SUPERSEDED and their
+    latency as <prefix>:PUTS:P50, :P90, :P99 and :MAX. Fixed rate deployments add
+    <prefix>:SCHEDULE:TICKS, :MISSED, :SKIPPED and the jitter as <prefix>:SCHEDULE:P50 to :MAX.
+    """
+
+    STATS = ["count", "p50", "p90", "p99", "max"]
+    # input queue counters, hosted once as <prefix>:QUEUE:<COUNTER>
+    COUNTERS = ["depth", "max_depth", "dropped", "coalesced"]
+    # background output writes, hosted once as <prefix>:PUTS:<COUNTER or STAT>
+    PUT_COUNTERS = ["in_flight", "completed", "failed", "superseded"]
+    # fixed rate scheduling, hosted once as <prefix>:SCHEDULE:<COUNTER or STAT>
+    SCHEDULE_COUNTERS = ["ticks", "missed", "skipped"]
+
+    def __init__(self, stages, prefix, pipelines=None):
+        # imported here so deployments that don't publish metrics don't need p4p
+        from src.interfaces import registered_interfaces
+
+        self.names = {}
+        variables = {}
+        for pipeline in pipelines if pipelines is not None else [None]:
+            pipeline_prefix = prefix if pipeline is None else f"{prefix}:{pipeline.upper()}"
+            for stage in stages:
+                for stat in self.STATS:
+                    name = f"{pipeline_prefix}:{stage.upper()}:{stat.upper()}"
+                    self.names[(pipeline, stage, stat)] = name
+                    variables[name] = {"name": name, "proto": "pva"}
+        for counter in self.COUNTERS:
+            name = f"{prefix}:QUEUE:{counter.upper()}"
+            self.names[(None, "queue", counter)] = name
+            variables[name] = {"name": name, "proto": "pva"}
+        for counter in self.PUT_COUNTERS + self.STATS[1:]:
+            name = f"{prefix}:PUTS:{counter.upper()}"
+            self.names[(None, "puts", counter)] = name
+            variables[name] = {"name": name, "proto": "pva"}
+        for counter in self.SCHEDULE_COUNTERS + self.STATS[1:]:
+            name = f"{prefix}:SCHEDULE:{counter.upper()}"
+            self.names[(None, "schedule", counter)] = name
+            variables[name] = {"name": name, "proto": "pva"}
+        self.interface = registered_interfaces["p4p_server"]({"variables": variables})
+        logger.info(f"Publishing metrics under {prefix}")
+
+    def publish(self, summary, pipeline=None, counters=None, puts=None, schedule=None):
+        data = {}
+        if counters is not None:
+            for counter in self.COUNTERS:
+                data[self.names[(None, "queue", counter)]] = counters[counter]
+        if puts is not None:
+            for counter in self.PUT_COUNTERS:
+                data[self.names[(None, "puts", counter)]] = puts[counter]
+            for stat in self.STATS[1:]:
+                value = puts["latency"][stat]
+                data[self.names[(None, "puts", stat)]] = 0 if value is None else value / 1e6
+        if schedule is not None:
+            for counter in self.SCHEDULE_COUNTERS:
+                data[self.names[(None, "schedule", counter)]] = schedule[counter]
+            for stat in self.STATS[1:]:
+                value = schedule["jitter"][stat]
+                data[self.names[(None, "schedule", stat)]] = (
+                    0 if value is None else value / 1e6
+                )
+        for (name_pipeline, stage, stat), name in self.names.items():
+            if stage in ["queue", "puts", "schedule"]:
+                continue
+            if name_pipeline != pipeline or stage not in summary:
+                continue
+            value = summary[stage][stat]
+            if value is None:
+                value = 0
+            data[name] = value if stat == "count" else value / 1e6
+        self.interface.put_many(data)
+
+    def close(self):
+        self.interface.close()
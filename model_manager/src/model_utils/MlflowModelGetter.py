@@ -1,11 +1,13 @@
 import mlflow
-from mlflow.models.model import get_model_info
+from mlflow.models import Model
 from mlflow import MlflowClient
 import pandas as pd
 import yaml
+import os
 import sympy as sp
 from lume_model.models import TorchModule, TorchModel
 from src.model_utils import ModelGetterBase
+from src.model_utils.ModelCache import ModelArtifactCache
 
 from src.logging_utils import get_logger
 
@@ -23,53 +25,126 @@ class MLflowModelGetter(ModelGetterBase):
         self.model_type = None
         self.tags = None
 
-    def get_config(self):
-        self.get_tags()
-        version = self.client.get_model_version(self.model_name, self.model_version)
+        # downloaded artifacts are cached locally, offline skips the registry entirely
+        max_gb = config.get(
+            "cache_max_gb", os.environ.get("MODEL_MANAGER_CACHE_MAX_GB", None)
+        )
+        self.cache = ModelArtifactCache(
+            root=config.get("cache_dir", None),
+            max_size_bytes=float(max_gb) * 1e9 if max_gb is not None else None,
+        )
+        # the cli always passes its --offline flag, the environment can still turn it on
+        self.offline = (
+            bool(config.get("offline", False))
+            or os.environ.get("MODEL_MANAGER_OFFLINE", "False") == "True"
+        )
+        self.resolved = None
 
-        if "artifact_location" in self.tags.keys():
-            artifact_location = self.tags["artifact_location"]
-            logger.debug(f"Artifact location: {artifact_location}")
-        else:
-            artifact_location = version.name
-            logger.debug(f"Artifact location: {artifact_location}")
-        self.client.download_artifacts(
-            version.run_id, f"{artifact_location}/pv_mapping.yaml", "."
+    def resolve(self):
+        """
+        Resolve the requested version or alias to a version number and run id, falling back to
+        the last resolution in the cache if the registry can't be reached.
+        """
+        if self.resolved is not None:
+            return self.resolved
+        try:
+            if self.offline:
+                raise ConnectionError("offline mode")
+            if str(self.model_version).isdigit():
+                version = self.client.get_model_version(
+                    self.model_name, self.model_version
+                )
+            else:
+                version = self.client.get_model_version_by_alias(
+                    self.model_name, self.model_version
+                )
+            self.get_tags()
+            if "artifact_location" in self.tags.keys():
+                artifact_location = self.tags["artifact_location"]
+            else:
+                artifact_location = version.name
+            self.resolved = {
+                "version": version.version,
+                "run_id": version.run_id,
+                "source": version.source,
+                "artifact_location": artifact_location,
+            }
+            self.cache.remember(self.model_name, self.model_version, self.resolved)
+        except Exception as e:
+            resolved = self.cache.resolve_offline(self.model_name, self.model_version)
+            if resolved is None:
+                raise e
+            logger.warning(
+                f"Model registry not used ({e}), starting {self.model_name} "
+                f"version {resolved['version']} from cache"
+            )
+            self.resolved = resolved
+        logger.debug(f"Resolved {self.model_name} {self.model_version} to {self.resolved}")
+        return self.resolved
+
+    def __cached(self, kind, populate):
+        resolved = self.resolve()
+        key = self.cache.key(
+            self.model_name, resolved["version"], resolved["run_id"], kind
         )
+        path = self.cache.lookup(key)
+        if path is None:
+            if self.offline:
+                raise FileNotFoundError(
+                    f"{kind} for {self.model_name} version {resolved['version']} is not cached"
+                )
+            path = self.cache.store(
+                key,
+                populate,
+                {"model_name": self.model_name, "version": resolved["version"]},
+            )
+        return path
+
+    def get_config(self):
+        resolved = self.resolve()
+        artifact_location = resolved["artifact_location"]
+        logger.debug(f"Artifact location: {artifact_location}")
+
+        def populate(directory):
+            self.client.download_artifacts(
+                resolved["run_id"], f"{artifact_location}/pv_mapping.yaml", directory
+            )
+
+        path = self.__cached("pv_mapping", populate)
         # return yaml.load(
         #     open(f"{artifact_location}/pv_mapping.yaml", "r"), Loader=yaml.FullLoader
         # )
-        return f"{artifact_location}/pv_mapping.yaml"
+        return os.path.join(path, artifact_location, "pv_mapping.yaml")
 
     def get_tags(self):
         registry_model = self.client.get_registered_model(self.model_name)
         self.tags = registry_model.tags
 
-    def get_requirements(self):
-        # Get dependencies
-        if int(self.model_version) >= 0:
-            version = self.client.get_model_version(self.model_name, self.model_version)
-        elif self.model_version == "champion":  # this is stupid I need to change it
-            version_no = self.client.get_model_version_by_alias(
-                self.model_name, self.model_version
+    def __model_path(self):
+        resolved = self.resolve()
+
+        def populate(directory):
+            mlflow.artifacts.download_artifacts(
+                artifact_uri=resolved["source"], dst_path=os.path.join(directory, "model")
             )
-            version = self.client.get_model_version(self.model_name, version_no.version)
 
-        deps = mlflow.artifacts.download_artifacts(f"{version.source}/requirements.txt")
-        return deps
+        return os.path.join(self.__cached("model", populate), "model")
+
+    def get_requirements(self):
+        # Get dependencies
+        return os.path.join(self.__model_path(), "requirements.txt")
 
     def get_model(self):
-        self.get_tags()
-        version = self.client.get_model_version(self.model_name, self.model_version)
+        model_uri = self.__model_path()
 
-        # flavor
-        flavor = get_model_info(model_uri=version.source).flavors
+        # flavor, read from the local MLmodel file so no registry call is needed
+        flavor = Model.load(os.path.join(model_uri, "MLmodel")).flavors
         loader_module = flavor["python_function"]["loader_module"]
         logger.debug(f"Loader module: {loader_module}")
 
         if loader_module == "mlflow.pyfunc.model":
             logger.debug("Loading pyfunc model")
-            model_pyfunc = mlflow.pyfunc.load_model(model_uri=version.source)
+            model_pyfunc = mlflow.pyfunc.load_model(model_uri=model_uri)
 
             # check if model has.get_lume_model() method
             if not hasattr(model_pyfunc.unwrap_python_model(), "get_lume_model"):
@@ -94,7 +169,7 @@ class MLflowModelGetter(ModelGetterBase):
 
         elif loader_module == "mlflow.pytorch":
             print("Loading torch model")
-            model_torch_module = mlflow.pytorch.load_model(model_uri=version.source)
+            model_torch_module = mlflow.pytorch.load_model(model_uri=model_uri)
             assert isinstance(model_torch_module, TorchModule)
             model = model_torch_module.model
             assert isinstance(model, TorchModel)
@@ -0,0 +1,163 @@
+from src.logging_utils import get_logger
+import hashlib, json, os, shutil, tempfile, time
+
+logger = get_logger()
+
+
+class ModelArtifactCache:
+    """
+    Local on-disk cache of downloaded model artifacts.
+
+    Entries are keyed by a hash of (model name, resolved version, run id, artifact kind) and
+    stored as <root>/entries/<key>/ with a manifest.json holding the sha256 of every file.
+    Entries are checked against their manifest before use and dropped if anything changed.
+    The manifest mtime records the last access, once the cache grows past max_size_bytes the
+    least recently used entries are removed.
+
+    How a requested version or alias was resolved is kept in <root>/index.json so the model can
+    be started from the cache when the registry is unreachable.
+    """
+
+    def __init__(self, root=None, max_size_bytes=None, verify=True):
+        if root is None:
+            root = os.environ.get(
+                "MODEL_MANAGER_CACHE_DIR",
+                os.path.join(os.path.expanduser("~"), ".cache", "model_manager"),
+            )
+        self.root = root
+        self.entries = os.path.join(root, "entries")
+        self.index_path = os.path.join(root, "index.json")
+        self.max_size_bytes = max_size_bytes
+        self.verify = verify
+        os.makedirs(self.entries, exist_ok=True)
+
+    @staticmethod
+    def key(model_name, version, run_id, kind):
+        identity = f"{model_name}|{version}|{run_id}|{kind}"
+        return hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def __hash_file(path):
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def __hash_tree(self, path):
+        files = {}
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                rel = os.path.relpath(full, path)
+                if rel == "manifest.json":
+                    continue
+                files[rel] = self.__hash_file(full)
+        return files
+
+    def __manifest_path(self, key):
+        return os.path.join(self.entries, key, "manifest.json")
+
+    def manifest(self, key):
+        with open(self.__manifest_path(key), "r") as f:
+            return json.load(f)
+
+    def lookup(self, key):
+        """Path of a valid cache entry, or None if it is missing or fails the integrity check"""
+        path = os.path.join(self.entries, key)
+        if not os.path.exists(self.__manifest_path(key)):
+            return None
+        if self.verify:
+            expected = self.manifest(key)["files"]
+            if self.__hash_tree(path) != expected:
+                logger.warning(f"Cache entry {key} failed integrity check, removing it")
+                shutil.rmtree(path, ignore_errors=True)
+                return None
+        # the manifest mtime is the last access time used for LRU eviction
+        os.utime(self.__manifest_path(key))
+        logger.debug(f"Cache hit for {key}")
+        return path
+
+    def store(self, key, populate, meta=None):
+        """
+        Create an entry by calling populate(directory) to download into a temporary directory,
+        which is then hashed and moved into place. Returns the entry path.
+        """
+        tmp = tempfile.mkdtemp(dir=self.entries, prefix=".tmp-")
+        try:
+            populate(tmp)
+            files = self.__hash_tree(tmp)
+            manifest = {
+                "key": key,
+                "files": files,
+                "size": sum(
+                    os.path.getsize(os.path.join(tmp, rel)) for rel in files.keys()
+                ),
+                "created": time.time(),
+                "meta": meta or {},
+            }
+            with open(os.path.join(tmp, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+            path = os.path.join(self.entries, key)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.replace(tmp, path)
+        except Exception as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise e
+        logger.info(f"Cached {key} ({manifest['size'] / 1e6:.1f} MB)")
+        self.evict(keep=key)
+        return path
+
+    def get_or_store(self, key, populate, meta=None):
+        path = self.lookup(key)
+        if path is None:
+            path = self.store(key, populate, meta)
+        return path
+
+    def size(self):
+        total = 0
+        for key in os.listdir(self.entries):
+            if os.path.exists(self.__manifest_path(key)):
+                total += self.manifest(key)["size"]
+        return total
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in max_size_bytes"""
+        if self.max_size_bytes is None:
+            return
+        entries = []
+        for key in os.listdir(self.entries):
+            manifest_path = self.__manifest_path(key)
+            if os.path.exists(manifest_path):
+                entries.append(
+                    (os.path.getmtime(manifest_path), key, self.manifest(key)["size"])
+                )
+        total = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total <= self.max_size_bytes:
+                break
+            if key == keep:
+                continue
+            logger.info(f"Evicting {key} from model cache")
+            shutil.rmtree(os.path.join(self.entries, key), ignore_errors=True)
+            total -= size
+
+    def __read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, "r") as f:
+            return json.load(f)
+
+    def remember(self, model_name, requested_version, resolved):
+        """Record how a requested version or alias was resolved, e.g. version number and run id"""
+        index = self.__read_index()
+        index[f"{model_name}|{requested_version}"] = resolved
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, self.index_path)
+
+    def resolve_offline(self, model_name, requested_version):
+        """The last resolution recorded by remember(), or None"""
+        return self.__read_index().get(f"{model_name}|{requested_version}")
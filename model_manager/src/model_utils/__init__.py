@@ -1,20 +1,14 @@
-registered_model_getters = {}
 # stole this way from lume model
+from src.registry import LazyRegistry
 
 # base class
 from src.model_utils.ModelGetterBase import ModelGetterBase
 
-try:
-    from src.model_utils.MlflowModelGetter import MLflowModelGetter
-
-    registered_model_getters["mlflow"] = MLflowModelGetter
-
-except Exception as e:
-    print(f"Error importing MLflowModelGetter: {e}")
-
-try:
-    from src.model_utils.LocalModelGetter import LocalModelGetter
-
-    registered_model_getters["local"] = LocalModelGetter
-except Exception as e:
-    print(f"Error importing LocalModelGetter: {e}")
+# getters are imported on first use, mlflow and lume_model are only needed for "mlflow"
+registered_model_getters = LazyRegistry("model_manager.model_getters")
+registered_model_getters.register(
+    "mlflow", "src.model_utils.MlflowModelGetter:MLflowModelGetter"
+)
+registered_model_getters.register(
+    "local", "src.model_utils.LocalModelGetter:LocalModelGetter"
+)
@@ -0,0 +1,9 @@
+from src.pipeline.update_queue import UpdateQueue
+from src.pipeline.batch import evaluate_chunk
+from src.pipeline.batching import MicroBatcher
+from src.pipeline.torch_inputs import TorchInputBuffer
+from src.pipeline.multi import ModelPipeline, SharedInterfaces
+from src.pipeline.process_pool import ProcessInferenceExecutor
+from src.pipeline.change import ChangeDetector
+from src.pipeline.deadband import InputDeadband, OutputDeadband
+from src.pipeline.scheduler import RateScheduler
@@ -0,0 +1,50 @@
+from src.logging_utils.make_logger import get_logger
+import numpy as np
+
+logger = get_logger()
+
+
+def to_numpy(value):
+    # torch tensors need to leave the graph / device before numpy can use them
+    if hasattr(value, "detach"):
+        return value.detach().cpu().numpy()
+    return np.asarray(value)
+
+
+def evaluate_chunk(model, model_type, inputs, n_rows, vectorized=True):
+    """
+    Evaluate a chunk of rows with the model, returns dict of output -> array.
+
+    Vectorised models get every input column in one model.evaluate call. Models that
+    only handle one sample at a time (vectorized=False) are evaluated row by row.
+    """
+    if model_type == "torch":
+        import torch
+
+        inputs = {
+            key: torch.as_tensor(value, dtype=torch.float32)
+            for key, value in inputs.items()
+        }
+
+    if not vectorized:
+        rows = [
+            model.evaluate({key: value[i] for key, value in inputs.items()})
+            for i in range(n_rows)
+        ]
+        if n_rows == 0:
+            return {}
+        return {
+            key: np.stack([to_numpy(row[key]) for row in rows]) for key in rows[0]
+        }
+
+    output = model.evaluate(inputs)
+    outputs = {}
+    for key, value in output.items():
+        value = to_numpy(value)
+        if value.ndim == 0 or value.shape[0] != n_rows:
+            raise ValueError(
+                f"Model output {key} has shape {value.shape}, expected {n_rows} rows. "
+                "Set deployment.vectorized to false for models that evaluate one sample at a time"
+            )
+        outputs[key] = value
+    return outputs
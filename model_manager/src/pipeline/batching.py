@@ -0,0 +1,73 @@
+from src.logging_utils.make_logger import get_logger
+import numpy as np
+import time
+
+logger = get_logger()
+
+
+class MicroBatcher:
+    """
+    Collects input snapshots so that several can be evaluated in one model.evaluate call.
+
+    A batch is ready once it holds max_batch_size snapshots or max_wait_ms has passed
+    since its first snapshot arrived, whichever comes first.
+    """
+
+    def __init__(self, max_batch_size=16, max_wait_ms=5.0):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.snapshots = []
+        self.started = None
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def add(self, snapshot):
+        if len(self.snapshots) == 0:
+            self.started = time.monotonic()
+        self.snapshots.append(snapshot)
+
+    def full(self):
+        return len(self.snapshots) >= self.max_batch_size
+
+    def remaining(self):
+        """Seconds left in the time budget of the current batch"""
+        if self.started is None:
+            return self.max_wait
+        return max(0.0, self.started + self.max_wait - time.monotonic())
+
+    def take(self):
+        snapshots = self.snapshots
+        self.snapshots = []
+        self.started = None
+        return snapshots
+
+    @staticmethod
+    def stack(snapshots, model_type):
+        """Stack snapshots into one input dict with the batch along the first axis"""
+        inputs = {
+            key: np.stack([np.asarray(snapshot[key]) for snapshot in snapshots])
+            for key in snapshots[0]
+        }
+        if model_type == "torch":
+            import torch
+
+            inputs = {
+                key: torch.as_tensor(value, dtype=torch.float32)
+                for key, value in inputs.items()
+            }
+        return inputs
+
+    @staticmethod
+    def unstack(output, batch_size):
+        """Split a batched model output back into one output dict per snapshot, in order"""
+        for key, value in output.items():
+            shape = tuple(value.shape) if hasattr(value, "shape") else np.shape(value)
+            if len(shape) == 0 or shape[0] != batch_size:
+                raise ValueError(
+                    f"Model output {key} has shape {shape}, expected a batch of {batch_size}. "
+                    "Micro-batching needs a model that evaluates batched inputs"
+                )
+        return [
+            {key: value[i] for key, value in output.items()} for i in range(batch_size)
+        ]
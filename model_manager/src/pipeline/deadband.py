@@ -0,0 +1,150 @@
+from src.logging_utils.make_logger import get_logger
+import numpy as np
+
+logger = get_logger()
+
+
+class InputDeadband:
+    """
+    Per variable input deadbands, an update only reaches the transformer once it has moved
+    further than the deadband from the last value that was let through.
+
+    Set on the input variables as `deadband: 0.01` (absolute) or
+    `deadband: {absolute: 0.01, relative: 0.001}`, relative being a fraction of the last value
+    let through. With both the larger threshold applies, so absolute acts as a floor around
+    zero. Comparing against the last value let through rather than the last one seen means a
+    slow drift still gets through once it adds up. Arrays pass once any element has moved
+    further than its threshold or the shape changed, values that can't be compared always pass.
+    """
+
+    label = "Input"
+
+    def __init__(self, variables):
+        self.settings = {}
+        # interfaces report updates by variable key or by channel name, state is kept by key
+        self.keys = {}
+        for key, variable in variables.items():
+            if not isinstance(variable, dict) or "deadband" not in variable:
+                continue
+            self.settings[key] = self.parse(key, variable["deadband"])
+            self.keys[key] = key
+            self.keys[variable.get("name", key)] = key
+        self.last = {}
+        self.suppressed = {}
+        self.passed = {}
+
+    @staticmethod
+    def parse(key, deadband):
+        """(absolute, relative) thresholds from a variable's deadband setting"""
+        if isinstance(deadband, (int, float)) and not isinstance(deadband, bool):
+            absolute, relative = float(deadband), 0.0
+        elif isinstance(deadband, dict):
+            unknown = set(deadband) - {"absolute", "relative"}
+            if unknown:
+                raise ValueError(f"Unknown deadband settings for {key}: {sorted(unknown)}")
+            absolute = float(deadband.get("absolute", 0.0))
+            relative = float(deadband.get("relative", 0.0))
+        else:
+            raise ValueError(
+                f"Deadband for {key} must be a number or {{absolute, relative}}, got {deadband}"
+            )
+        if absolute < 0 or relative < 0:
+            raise ValueError(f"Deadband for {key} can't be negative")
+        return absolute, relative
+
+    @staticmethod
+    def within(data, last, absolute, relative):
+        if isinstance(data, np.ndarray) or isinstance(last, np.ndarray):
+            data, last = np.asarray(data), np.asarray(last)
+            if data.shape != last.shape:
+                return False
+            if absolute == 0 and relative == 0:
+                # exact equality needs no temporary difference array
+                return bool(np.array_equal(data, last))
+            threshold = absolute
+            if relative > 0:
+                threshold = np.maximum(absolute, relative * np.abs(last))
+            return bool(np.all(np.abs(data - last) <= threshold))
+        if absolute == 0 and relative == 0:
+            return bool(data == last)
+        return abs(data - last) <= max(absolute, relative * abs(last))
+
+    def passes(self, name, value):
+        """False if `value` is within the deadband of `name`, True (and remembered) otherwise"""
+        name = self.keys.get(name)
+        if name is None:
+            return True
+        setting = self.settings[name]
+        data = value["value"] if isinstance(value, dict) else value
+        last = self.last.get(name)
+        if last is not None:
+            try:
+                within = self.within(data, last, *setting)
+            except (TypeError, ValueError):
+                within = False
+            if within:
+                self.suppressed[name] = self.suppressed.get(name, 0) + 1
+                return False
+        if isinstance(data, np.ndarray) and data.flags.writeable:
+            # read-only views are never modified by the interfaces, anything else may be reused
+            data = data.copy()
+        self.last[name] = data
+        self.passed[name] = self.passed.get(name, 0) + 1
+        return True
+
+    def summary(self, top=5):
+        """Suppressed total and the variables with the most suppressed updates"""
+        total = sum(self.suppressed.values())
+        noisiest = sorted(self.suppressed.items(), key=lambda item: -item[1])[:top]
+        details = ", ".join(
+            f"{name} {count}/{count + self.passed.get(name, 0)}" for name, count in noisiest
+        )
+        return f"{self.label} deadbands suppressed {total} updates" + (
+            f" ({details})" if details else ""
+        )
+
+
+class OutputDeadband(InputDeadband):
+    """
+    Output deadbands, values within the deadband of the last value published aren't put again.
+
+    Set per output variable as `deadband: ...`, same settings as the input deadbands, with
+    `deadband: 0` publishing only values that changed at all. `default` applies to every
+    output without a setting of its own, deployment.output_deadband: 0 suppresses all
+    unchanged outputs. Arrays with a zero deadband are compared with np.array_equal.
+
+    A value only counts as published once it was written, failed() forgets the last value
+    of the outputs whose put failed so the next value is put whatever it is.
+    """
+
+    label = "Output"
+
+    def __init__(self, variables, default=None):
+        super().__init__(variables)
+        self.default = None if default is None else self.parse("default", default)
+
+    def filter(self, data):
+        """The entries of `data` that have to be published, the others are counted as suppressed"""
+        if self.default is not None:
+            for name in data:
+                if name not in self.keys:
+                    self.keys[name] = name
+                    self.settings[name] = self.default
+        return {name: value for name, value in data.items() if self.passes(name, value)}
+
+    def failed(self, names):
+        """Called with the outputs whose put failed, their next value is always published"""
+        for name in names:
+            key = self.keys.get(name)
+            if key is not None:
+                self.last.pop(key, None)
+
+    def stats(self):
+        """Published and suppressed counts per output variable"""
+        return {
+            name: {
+                "published": self.passed.get(name, 0),
+                "suppressed": self.suppressed.get(name, 0),
+            }
+            for name in self.settings
+        }
@@ -0,0 +1,111 @@
+from src.logging_utils.make_logger import get_logger
+from src.metrics import StageMetrics
+import json
+
+logger = get_logger()
+
+
+class ModelPipeline:
+    """
+    One model with its input and output transformers, as hosted by a multi model deployment.
+
+    `inputs` is every name the shared input interface may hand over for this pipeline, the
+    variable keys and the channel names of its input config. Each pipeline keeps its own
+    StageMetrics so timing is reported per model.
+    """
+
+    def __init__(
+        self,
+        name,
+        in_transformer,
+        out_transformer,
+        model,
+        model_getter,
+        input_config,
+        stages,
+    ):
+        self.name = name
+        self.in_transformer = in_transformer
+        self.out_transformer = out_transformer
+        self.model = model
+        self.model_getter = model_getter
+        self.metrics = StageMetrics(stages)
+        self.inputs = set()
+        for key, variable in input_config["variables"].items():
+            self.inputs.add(key)
+            self.inputs.add(variable.get("name", key))
+        self.in_interface = None
+        self.out_interface = None
+        self.torch_inputs = None
+        self.out_deadband = None
+        # input transform time accumulated since the last inference
+        self.transform_ns = 0
+        # set once the input transformer has produced a full set of inputs
+        self.primed = False
+
+
+class SharedInterfaces:
+    """
+    De-duplicates interfaces between pipelines.
+
+    Pipelines whose interface configs share a method and the same options (everything apart
+    from `variables`) are served by one interface created with the union of their variables,
+    so each channel is opened once no matter how many models use it. With routed=True (the
+    inputs) updates are fanned out to every pipeline that listed the channel. Routes are
+    keyed by (group key, channel), so the same name on two interfaces never cross-feeds.
+    """
+
+    def __init__(self, registry, routed=False):
+        self.registry = registry
+        self.routed = routed
+        self.groups = {}
+        self.interfaces = {}
+        self.routes = {}
+
+    @staticmethod
+    def __group_key(method, config):
+        options = {key: value for key, value in config.items() if key != "variables"}
+        return method, json.dumps(options, sort_keys=True, default=str)
+
+    def add(self, method, config, pipeline=None):
+        """Register a pipeline's interface config, returns the key of the group it joined"""
+        key = self.__group_key(method, config)
+        if key not in self.groups:
+            self.groups[key] = {
+                "method": method,
+                "config": {**config, "variables": {}},
+                "pipelines": [],
+            }
+        group = self.groups[key]
+        variables = group["config"]["variables"]
+        for name, variable in config["variables"].items():
+            if name in variables and variables[name] != variable:
+                raise ValueError(
+                    f"Variable {name} is configured differently by two models: "
+                    f"{variables[name]} and {variable}"
+                )
+            variables[name] = variable
+        if pipeline is not None:
+            group["pipelines"].append(pipeline)
+            if self.routed:
+                for name in pipeline.inputs:
+                    self.routes.setdefault((key, name), []).append(pipeline)
+        return key
+
+    def build(self):
+        """Create one interface per group"""
+        for key, group in self.groups.items():
+            self.interfaces[key] = self.registry[group["method"]](group["config"])
+            logger.info(
+                f"{group['method']} interface with {len(group['config']['variables'])} "
+                f"variables shared by {len(group['pipelines'])} pipelines"
+            )
+        return self.interfaces
+
+    def pipelines_for(self, key, name):
+        """Pipelines that read channel `name` of the interface of group `key`"""
+        return self.routes.get((key, name), [])
+
+    def close(self):
+        for interface in self.interfaces.values():
+            interface.close()
@@ -0,0 +1,205 @@
+from src.logging_utils.make_logger import get_logger
+from src.pipeline.batch import to_numpy
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from queue import Empty
+import multiprocessing
+import numpy as np
+import os
+import threading
+import time
+
+logger = get_logger()
+
+# worker process state, set once by _load_model
+_model = None
+_model_type = None
+_attached = {}
+_started = None
+
+
+def _load_model(getter_name, getter_config, started, loaded):
+    # runs once in every worker, the model is loaded the same way setup() loads it
+    global _model, _model_type, _started
+    from src.model_utils import registered_model_getters
+
+    _started = started
+    try:
+        model_getter = registered_model_getters[getter_name](getter_config)
+        _model = model_getter.get_model()
+        _model_type = model_getter.model_type
+    except BaseException as e:
+        # the parent is waiting on a report from every worker, a failed one included
+        loaded.put((os.getpid(), repr(e)))
+        raise
+    loaded.put((os.getpid(), None))
+
+
+def _ready():
+    # every worker holds on to its check-in until all of them have loaded the model, so
+    # the pool has to start a new worker for each one
+    _started.wait()
+    return os.getpid(), _model_type
+
+
+def _attach(name):
+    # blocks are reused by the parent, so attachments are kept for the life of the worker
+    if name not in _attached:
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    return _attached[name]
+
+
+def _evaluate(inputs, shared):
+    for key, (name, shape, dtype) in shared.items():
+        block = _attach(name)
+        inputs[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    if _model_type == "torch":
+        import torch
+
+        inputs = {
+            key: torch.as_tensor(value, dtype=torch.float32)
+            for key, value in inputs.items()
+        }
+    output = _model.evaluate(inputs)
+    # tensors are sent back as numpy, pickling them would go through torch's own sharing
+    return {
+        key: to_numpy(value) if hasattr(value, "detach") else value
+        for key, value in output.items()
+    }
+
+
+class SharedBlockPool:
+    """
+    Reusable shared memory blocks for passing large arrays to the workers.
+
+    A block is checked out for the lifetime of one request and returned when its result
+    arrives, the smallest free block that fits is reused before a new one is created.
+    """
+
+    def __init__(self):
+        self.free = []
+        self.blocks = []
+        self.lock = threading.Lock()
+
+    def acquire(self, nbytes):
+        with self.lock:
+            fitting = [block for block in self.free if block.size >= nbytes]
+            if fitting:
+                block = min(fitting, key=lambda block: block.size)
+                self.free.remove(block)
+                return block
+        block = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        with self.lock:
+            self.blocks.append(block)
+        return block
+
+    def release(self, blocks):
+        with self.lock:
+            self.free.extend(blocks)
+
+    def close(self):
+        with self.lock:
+            for block in self.blocks:
+                block.close()
+                block.unlink()
+            self.blocks = []
+            self.free = []
+
+
+class ProcessInferenceExecutor:
+    """
+    Evaluates the model in a pool of worker processes so CPU heavy models don't hold the
+    GIL of the event loop.
+
+    Every worker loads the model once through registered_model_getters. Arrays of at least
+    shm_min_bytes are copied into shared memory blocks and read in place by the worker,
+    everything else is pickled. submit() returns a concurrent.futures.Future with the
+    model output, the caller keeps the futures in submission order to publish in order.
+    The pool only counts as ready once every worker has loaded the model, a worker that
+    dies while loading it or doesn't report within load_timeout seconds fails the pool.
+    """
+
+    def __init__(
+        self,
+        getter_name,
+        getter_config,
+        workers=2,
+        shm_min_bytes=65536,
+        start_method="spawn",
+        load_timeout=600.0,
+    ):
+        self.shm_min_bytes = shm_min_bytes
+        self.workers = workers
+        self.blocks = SharedBlockPool()
+        self.pending = set()
+        context = multiprocessing.get_context(start_method)
+        started = context.Barrier(workers)
+        loaded = context.Queue()
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_load_model,
+            initargs=(getter_name, getter_config, started, loaded),
+        )
+        # fail here rather than on the first update if the model can't be loaded
+        checks = [self.pool.submit(_ready) for _ in range(workers)]
+        deadline = time.monotonic() + load_timeout
+        reported = 0
+        while reported < workers:
+            try:
+                pid, error = loaded.get(timeout=1.0)
+                reported += 1
+            except Empty:
+                # a worker killed while loading never reports, the pool breaks instead and
+                # fails the pending checks
+                pid = "pool"
+                failed = [check for check in checks if check.done() and check.exception()]
+                if failed:
+                    error = repr(failed[0].exception())
+                elif time.monotonic() > deadline:
+                    error = f"no report within {load_timeout}s"
+                else:
+                    continue
+            if error is not None:
+                # releases the workers that did load the model
+                started.abort()
+                self.close()
+                raise RuntimeError(f"Worker {pid} failed to load the model: {error}")
+        ready = [check.result() for check in checks]
+        pids = {pid for pid, _ in ready}
+        if len(pids) != workers:
+            self.close()
+            raise RuntimeError(f"Only {len(pids)} of {workers} workers started")
+        logger.info(
+            f"Inference executor with {workers} worker processes ready, "
+            f"model type {ready[0][1]}"
+        )
+
+    def submit(self, inputs):
+        plain = {}
+        shared = {}
+        used = []
+        for key, value in inputs.items():
+            if isinstance(value, np.ndarray) and value.nbytes >= self.shm_min_bytes:
+                block = self.blocks.acquire(value.nbytes)
+                used.append(block)
+                np.ndarray(value.shape, dtype=value.dtype, buffer=block.buf)[...] = value
+                shared[key] = (block.name, value.shape, value.dtype.str)
+            else:
+                plain[key] = value
+        future = self.pool.submit(_evaluate, plain, shared)
+        self.pending.add(future)
+        future.add_done_callback(lambda _: self.__done(future, used))
+        return future
+
+    def __done(self, future, used):
+        self.pending.discard(future)
+        self.blocks.release(used)
+
+    def close(self):
+        # shutdown(cancel_futures=True) needs python 3.9, requests that haven't started yet
+        # are cancelled here instead
+        for future in list(self.pending):
+            future.cancel()
+        self.pool.shutdown(wait=True)
+        self.blocks.close()
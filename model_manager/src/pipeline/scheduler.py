@@ -0,0 +1,93 @@
+from src.logging_utils.make_logger import get_logger
+from src.metrics import LatencyHistogram
+import asyncio
+import time
+
+logger = get_logger()
+
+
+class RateScheduler:
+    """
+    Fixed rate ticks for inference, in place of running on every input update.
+
+    Deadlines are laid on a fixed grid, start + n * period on time.perf_counter_ns(), so sleep
+    errors and the time spent working never accumulate into drift. wait() sleeps until the
+    next deadline and records how late it woke (jitter). finished() is called once the
+    tick's work is done. If the work ran past one or more later deadlines they are counted
+    as missed and skipped, so the schedule picks up on the grid again rather than running
+    the missed ticks back to back. A tick with nothing to evaluate yet is passed to skip()
+    instead, it still counts towards the schedule. Not thread safe, use from the event loop.
+    """
+
+    def __init__(self, rate_hz):
+        if rate_hz is None or rate_hz <= 0:
+            raise ValueError(f"rate_hz must be positive, got {rate_hz}")
+        self.rate_hz = rate_hz
+        self.period_ns = round(1e9 / rate_hz)
+        self.next_deadline = None
+        self.ticks = 0
+        self.missed = 0
+        self.skipped = 0
+        self.jitter = LatencyHistogram()
+
+    async def wait(self):
+        """Sleep until the next deadline, returns the deadline (ns)"""
+        now = time.perf_counter_ns()
+        if self.next_deadline is None:
+            # the grid starts at the first tick
+            self.next_deadline = now
+        remaining = self.next_deadline - now
+        if remaining > 0:
+            await asyncio.sleep(remaining / 1e9)
+        deadline = self.next_deadline
+        # the loop may wake a little early, only lateness counts as jitter
+        self.jitter.record(time.perf_counter_ns() - deadline)
+        self.ticks += 1
+        self.next_deadline += self.period_ns
+        return deadline
+
+    def finished(self):
+        """Called when the work of a tick is done, returns the number of deadlines it overran"""
+        if self.next_deadline is None:
+            return 0
+        now = time.perf_counter_ns()
+        if now <= self.next_deadline:
+            return 0
+        missed = (now - self.next_deadline) // self.period_ns + 1
+        self.missed += missed
+        self.next_deadline += missed * self.period_ns
+        return missed
+
+    def skip(self):
+        """In place of finished() for a tick that had nothing to evaluate"""
+        self.skipped += 1
+        return self.finished()
+
+    def stats(self, reset=True):
+        """Tick and missed deadline totals, jitter since the last reset"""
+        stats = {
+            "rate_hz": self.rate_hz,
+            "ticks": self.ticks,
+            "missed": self.missed,
+            "skipped": self.skipped,
+            "jitter": self.jitter.summary(),
+        }
+        if reset:
+            self.jitter.reset()
+        return stats
+
+    @staticmethod
+    def format(stats):
+        stat_string = (
+            f"schedule: {stats['rate_hz']} Hz | ticks {stats['ticks']} | "
+            f"missed {stats['missed']}"
+        )
+        if stats["skipped"]:
+            stat_string += f" | skipped {stats['skipped']}"
+        jitter = stats["jitter"]
+        if jitter["count"]:
+            stat_string += (
+                f" | jitter p50 {jitter['p50'] / 1e6:.2f} p99 {jitter['p99'] / 1e6:.2f}"
+                f" max {jitter['max'] / 1e6:.2f} ms"
+            )
+        return stat_string
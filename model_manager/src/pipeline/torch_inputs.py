@@ -0,0 +1,60 @@
+from src.logging_utils.make_logger import get_logger
+import numpy as np
+import warnings
+
+logger = get_logger()
+
+
+class TorchInputBuffer:
+    """
+    Persistent float32 input tensors for torch models.
+
+    One tensor per input, in the order of the transformer's latest_transformed, is allocated
+    on first use (or when an image changes shape) and then filled in place through a numpy
+    view, so the hot loop allocates nothing and the transformer state is never modified.
+    C-contiguous float32 images are passed through with torch.from_numpy (no copy), read-only
+    ones included, which is what transformed frames and p4p arrays are. torch can't mark a
+    tensor read-only, the model is trusted not to write to its inputs.
+    """
+
+    def __init__(self, keys):
+        import torch
+
+        self.torch = torch
+        self.keys = list(keys)
+        self.tensors = {}
+        self.views = {}
+        self.inputs = {}
+
+    def __allocate(self, key, shape):
+        tensor = self.torch.zeros(shape, dtype=self.torch.float32)
+        self.tensors[key] = tensor
+        # numpy view over the tensor memory, writing to it fills the tensor
+        self.views[key] = tensor.numpy()
+        return tensor
+
+    def fill(self, values):
+        """Copy the latest values into the buffers, returns the dict of input tensors"""
+        for key in self.keys:
+            value = values[key]
+            if isinstance(value, self.torch.Tensor):
+                value = value.detach().cpu().numpy()
+
+            if isinstance(value, np.ndarray) and value.ndim > 0:
+                if value.dtype == np.float32 and value.flags.c_contiguous:
+                    with warnings.catch_warnings():
+                        # torch warns about sharing read-only memory, inputs aren't written
+                        warnings.filterwarnings(
+                            "ignore", message="The given NumPy array is not writable"
+                        )
+                        self.inputs[key] = self.torch.from_numpy(value)
+                    continue
+                shape = value.shape
+            else:
+                shape = ()
+
+            if key not in self.tensors or self.views[key].shape != shape:
+                self.__allocate(key, shape)
+            np.copyto(self.views[key], value, casting="unsafe")
+            self.inputs[key] = self.tensors[key]
+        return self.inputs
@@ -0,0 +1,164 @@
+from src.logging_utils.make_logger import get_logger
+import asyncio
+import collections
+import threading
+import time
+
+logger = get_logger()
+
+
+class UpdateQueue:
+    """
+    Bounded hand-off from interface monitor threads to the event loop.
+
+    put() has the same (name, value) signature as a transformer handler so it can be
+    passed straight to interface.monitor(). Each update is stamped with
+    time.perf_counter_ns() when it is received so wake-to-inference latency can be measured.
+
+    policy decides what happens when updates arrive faster than they are consumed:
+        fifo: every update is kept in order, past maxsize the oldest one is dropped
+        latest: one pending update per channel, a newer value replaces (coalesces) the
+            waiting one, latency is bounded by one inference however bursty the input
+        block: past maxsize the monitor thread waits for room, pushing back on the source
+    maxsize 0 means unbounded. Updates are queued in the calling thread under a lock and the
+    loop is only woken when the queue goes from empty to non-empty, so a busy loop doesn't
+    build up an unbounded backlog of callbacks.
+
+    close() ends the hand-off: producers waiting for room are released and their updates,
+    like any put afterwards, are dropped. Updates already queued can still be taken, get()
+    returns None once the queue is closed and empty.
+    """
+
+    POLICIES = ["fifo", "latest", "block"]
+
+    def __init__(self, loop=None, policy="fifo", maxsize=0):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Queue policy must be one of {self.POLICIES}, got {policy}")
+        self.loop = loop if loop is not None else asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.policy = policy
+        self.maxsize = maxsize
+        if policy == "latest":
+            self.items = collections.OrderedDict()
+        else:
+            self.items = collections.deque()
+        self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
+        self.event = asyncio.Event()
+        self.signalled = False
+        self.closed = False
+
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    def put(self, name, value):
+        # called from p4p / k2eg / file replay threads, hand over to the event loop
+        received = time.perf_counter_ns()
+        with self.lock:
+            if self.closed:
+                return
+            if self.policy == "latest":
+                if name in self.items:
+                    self.coalesced += 1
+                # the channel keeps its place in the queue, wake is timed from the newest value
+                self.items[name] = (value, received)
+            else:
+                if self.maxsize and len(self.items) >= self.maxsize:
+                    if self.policy == "fifo":
+                        self.items.popleft()
+                        self.dropped += 1
+                    elif threading.get_ident() != self.loop_thread:
+                        # waiting on the loop thread itself would deadlock, it overflows instead
+                        while len(self.items) >= self.maxsize and not self.closed:
+                            self.not_full.wait()
+                        if self.closed:
+                            return
+                self.items.append((name, value, received))
+            self.max_depth = max(self.max_depth, len(self.items))
+            wake = not self.signalled
+            self.signalled = True
+        if wake:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    def __pop(self):
+        # lock must be held
+        if self.policy == "latest":
+            name, (value, received) = self.items.popitem(last=False)
+            return name, value, received
+        item = self.items.popleft()
+        self.not_full.notify()
+        return item
+
+    async def get(self):
+        """Wait for the next update, returns (name, value, received_time), None once closed"""
+        while True:
+            with self.lock:
+                if len(self.items) > 0:
+                    return self.__pop()
+                if self.closed:
+                    return None
+                # the next put() has to wake the loop
+                self.signalled = False
+                self.event.clear()
+            await self.event.wait()
+
+    def get_nowait(self):
+        """Next update if one is waiting, otherwise None"""
+        with self.lock:
+            if len(self.items) == 0:
+                return None
+            return self.__pop()
+
+    def drain(self):
+        """Return all updates that are already waiting without blocking"""
+        items = []
+        with self.lock:
+            while len(self.items) > 0:
+                items.append(self.__pop())
+        return items
+
+    def qsize(self):
+        return len(self.items)
+
+    def close(self):
+        """Stop accepting updates and release producers blocked waiting for room"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.not_full.notify_all()
+            wake = not self.signalled
+            self.signalled = True
+        if wake:
+            if threading.get_ident() == self.loop_thread:
+                self.event.set()
+            elif not self.loop.is_closed():
+                self.loop.call_soon_threadsafe(self.event.set)
+
+    def exhausted(self):
+        """True once the queue is closed and everything queued has been taken"""
+        with self.lock:
+            return self.closed and len(self.items) == 0
+
+    def stats(self, reset=True):
+        """
+        Queue counters, dropped and coalesced are totals, max_depth is since the last reset.
+        """
+        with self.lock:
+            stats = {
+                "depth": len(self.items),
+                "max_depth": self.max_depth,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+            }
+            if reset:
+                self.max_depth = len(self.items)
+        return stats
+
+    @staticmethod
+    def format(stats):
+        return (
+            f"queue: depth {stats['depth']} (max {stats['max_depth']}) | "
+            f"dropped {stats['dropped']} | coalesced {stats['coalesced']}"
+        )
@@ -0,0 +1,98 @@
+# lazy registries for interfaces, transformers and model getters
+from src.logging_utils.make_logger import get_logger
+import importlib, importlib.metadata
+import time
+
+logger = get_logger()
+
+# every registry created, used for the startup profile
+registries = []
+
+
+class LazyRegistry:
+    """
+    name -> class registry that only imports a backend when its name is looked up.
+
+    Built in backends are registered as "module:attribute" strings. Third party packages
+    can add backends through the entry point group, e.g. in their setup.py:
+
+        entry_points={"model_manager.interfaces": ["my_iface = my_pkg.iface:MyInterface"]}
+
+    Import time of every backend that gets loaded is kept in import_times (seconds).
+    """
+
+    def __init__(self, group):
+        self.group = group
+        self.targets = {}
+        self.loaded = {}
+        self.import_times = {}
+        self.entry_points = None
+        registries.append(self)
+
+    def register(self, name, target):
+        """target is either the class itself or a "module:attribute" string"""
+        if isinstance(target, str):
+            self.targets[name] = target
+        else:
+            self.loaded[name] = target
+
+    def __load_entry_points(self):
+        # reading entry points only touches package metadata, nothing is imported here
+        if self.entry_points is None:
+            eps = importlib.metadata.entry_points()
+            if hasattr(eps, "select"):
+                eps = eps.select(group=self.group)
+            else:
+                eps = eps.get(self.group, [])  # python < 3.10
+            self.entry_points = {ep.name: ep.value for ep in eps}
+        return self.entry_points
+
+    def __target(self, name):
+        if name in self.targets:
+            return self.targets[name]
+        return self.__load_entry_points().get(name)
+
+    def __getitem__(self, name):
+        if name in self.loaded:
+            return self.loaded[name]
+        target = self.__target(name)
+        if target is None:
+            raise KeyError(f"{name} is not registered in {self.group}, choose from {self.keys()}")
+
+        module_name, attribute = target.split(":")
+        time_start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        self.import_times[name] = time.perf_counter() - time_start
+        logger.debug(
+            f"Loaded {self.group} {name} from {target} in {self.import_times[name] * 1000:.1f} ms"
+        )
+        self.loaded[name] = getattr(module, attribute)
+        return self.loaded[name]
+
+    def __contains__(self, name):
+        return name in self.loaded or self.__target(name) is not None
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        names = list(self.loaded.keys())
+        for name in list(self.targets.keys()) + list(self.__load_entry_points().keys()):
+            if name not in names:
+                names.append(name)
+        return names
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+
+def startup_report():
+    """Import time of every plugin loaded so far, slowest first"""
+    rows = []
+    for registry in registries:
+        for name, seconds in registry.import_times.items():
+            rows.append((seconds, registry.group, name))
+    lines = [f"{'plugin':<50} {'import (ms)':>12}"]
+    for seconds, group, name in sorted(rows, reverse=True):
+        lines.append(f"{group + ':' + name:<50} {seconds * 1000:>12.1f}")
+    return "\n".join(lines)
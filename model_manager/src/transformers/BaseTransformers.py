@@ -27,10 +27,26 @@ class SimpleTransformer:
         logger.debug(f"Symbol List: {self.input_list}")
         self.pv_mapping = pv_mapping
 
+        # sympy names cannot contain ":" so symbols are mangled once here
+        self.symbol_lookup = {
+            symbol.replace(":", "_"): symbol for symbol in self.input_list
+        }
+        self.compiled = {}
         for key, value in self.pv_mapping.items():
-            self.__validate_formulas(value["formula"])
+            self.compiled[key] = self.__compile_formula(value["formula"])
+
+        # symbol -> outputs whose formula uses it, so an update only re-evaluates those
+        self.dependents = {symbol: [] for symbol in self.input_list}
+        for key, (_, args) in self.compiled.items():
+            for arg in args:
+                self.dependents[arg].append(key)
+
         self.latest_input = {symbol: None for symbol in self.input_list}
         self.latest_transformed = {key: 0 for key in self.pv_mapping.keys()}
+        # symbols without a value yet, nothing is transformed until this reaches 0
+        self.missing = len(self.latest_input)
+        # outputs recomputed since the consumer last cleared the set
+        self.dirty = set()
         self.updated = False
         self.handler_time = None
 
@@ -38,54 +54,142 @@ class SimpleTransformer:
 
     def __validate_formulas(self, formula: str):
         try:
-            sp.sympify(formula.replace(":", "_"))
+            return sp.sympify(formula.replace(":", "_"))
         except:
             raise Exception(f"Invalid formula: {formula}")
 
+    def __compile_formula(self, formula: str):
+        """Parse a formula once and lambdify it into a numeric callable.
+
+        Returns a tuple of (callable, argument symbols) where the argument
+        symbols are the original (unmangled) input names in call order.
+        """
+        expr = self.__validate_formulas(formula)
+        arg_names = sorted(str(symbol) for symbol in expr.free_symbols)
+        unknown = [name for name in arg_names if name not in self.symbol_lookup]
+        if unknown:
+            raise Exception(f"Invalid formula: {formula}, unknown symbols {unknown}")
+        func = sp.lambdify(arg_names, expr, modules="numpy")
+        return func, [self.symbol_lookup[name] for name in arg_names]
+
+    @staticmethod
+    def as_input(value):
+        """Scalars become floats, waveforms and images stay numpy arrays of their own dtype"""
+        if isinstance(value, (list, tuple)):
+            value = np.asarray(value)
+        if isinstance(value, np.ndarray) and value.ndim > 0:
+            return value
+        return float(value)
+
+    @staticmethod
+    def as_output(result):
+        # scalar results are floats as before, array results keep the dtype numpy gave them
+        if np.ndim(result) == 0:
+            return float(result)
+        return np.asarray(result)
+
     def handler(self, pv_name, value):
         # logger.debug(f"SimpleTransformer handler for {pv_name} with value {value}")
 
-        # assert valus is float
         try:
-            # logger.debug(f"Converting value to float: {value}")
-            # logger.debug(f"Value type: {type(value)}")
-            # logger.debug(f"Value: {value['value']}")
-            value = float(value["value"])
+            value = self.as_input(value["value"])
         except Exception as e:
-            logger.error(f"Error converting value to float: {e}")
+            logger.error(f"Error converting value to float or array: {e}")
             raise e
 
+        first = False
+        if self.missing > 0 and pv_name in self.latest_input:
+            if self.latest_input[pv_name] is None:
+                self.missing -= 1
+                first = self.missing == 0
         self.latest_input[pv_name] = value
         try:
-            if all([value is not None for value in self.latest_input.values()]):
+            if first:
+                # every output is computed once all symbols have a value
                 time_start = time.time()
                 self.transform()
                 self.handler_time = time.time() - time_start
+            elif self.missing == 0 and self.dependents.get(pv_name):
+                time_start = time.time()
+                self.transform(self.dependents[pv_name])
+                self.handler_time = time.time() - time_start
         except Exception as e:
             logger.error(f"Error transforming: {e}")
             raise e
 
-    def transform(self):
+    def transform(self, keys=None):
+        """Evaluate the formulas of `keys` (all outputs by default) and mark them dirty"""
         # logger.debug("Transforming")
-        transformed = {}
-        pvs_renamed = {
-            key.replace(":", "_"): value for key, value in self.latest_input.items()
-        }
-        for key, value in self.pv_mapping.items():
+        latest_input = self.latest_input
+        if keys is None:
+            keys = self.compiled.keys()
+        for key in keys:
+            func, args = self.compiled[key]
             try:
-                transformed[key] = sp.sympify(value["formula"].replace(":", "_")).subs(
-                    pvs_renamed
+                # numpy semantics, scalars broadcast against waveforms
+                self.latest_transformed[key] = self.as_output(
+                    func(*[latest_input[arg] for arg in args])
                 )
-                # converted to float
-                transformed[key] = float(transformed[key])
             except Exception as e:
                 logger.error(f"Error transforming: {e}")
                 raise e
-
-        for key, value in transformed.items():
-            self.latest_transformed[key] = value
+            self.dirty.add(key)
         self.updated = True
 
+    @staticmethod
+    def as_input_column(column):
+        """as_input for a batch column, one row per sample"""
+        column = np.asarray(column)
+        if column.ndim > 1:
+            # a waveform or image per row keeps its dtype
+            return column
+        return column.astype(float, copy=False)
+
+    @staticmethod
+    def as_output_column(result, n_rows):
+        """as_output for a batch result, constant formulas still need one value per row"""
+        result = np.asarray(result)
+        if result.ndim == 0:
+            return np.full(n_rows, float(result))
+        if result.ndim == 1:
+            return result.astype(float, copy=False)
+        return result
+
+    def transform_batch(self, columns):
+        """
+        Vectorised transform over whole input columns, used by batch deployments.
+
+        columns: dict
+            symbol -> array of values, one row per sample
+        returns dict of output -> array with the same number of rows
+
+        Rows come out as transform() would give them one at a time, scalars apply to
+        the waveform of their own row and array dtypes are kept.
+        """
+        n_rows = len(next(iter(columns.values())))
+        inputs = {
+            symbol: self.as_input_column(column) for symbol, column in columns.items()
+        }
+        transformed = {}
+        for key, (func, args) in self.compiled.items():
+            values = [inputs[arg] for arg in args]
+            arrays = [value for value in values if value.ndim > 1]
+            if arrays:
+                # a scalar column becomes (n_rows, 1, ...) to broadcast along its row, with
+                # the dtype a python float would give against the arrays
+                ndim = max(value.ndim for value in arrays)
+                dtype = np.result_type(*[value.dtype for value in arrays], 0.0)
+                values = [
+                    value
+                    if value.ndim > 1
+                    else value.astype(dtype, copy=False).reshape(
+                        value.shape + (1,) * (ndim - 1)
+                    )
+                    for value in values
+                ]
+            transformed[key] = self.as_output_column(func(*values), n_rows)
+        return transformed
+
 
 class CAImageTransfomer:
     """Input only image transformation"""
@@ -136,7 +240,10 @@ class CAImageTransfomer:
             value = self.latest_input[self.variables[key]]
             # print x and y
             try:
-                transformed[key] = np.array(value).reshape((
+                # asarray + reshape are views over the received buffer, numpy only copies
+                # when the unfolding can't be expressed as strides (e.g. a 2D C ordered
+                # frame read column major)
+                transformed[key] = np.asarray(value).reshape((
                     int(self.latest_input[self.variables[key + "_y"]]), # note the order, we are going from x,y to y,x (rows, columns) in numpy
                     int(self.latest_input[self.variables[key + "_x"]]),
                 ), 
@@ -144,12 +251,16 @@ class CAImageTransfomer:
                 
                 if self.variables[key + "_unfolding"] == "column_major":
                     transformed[key] = transformed[key].T
+                # frames are shared with the interface, consumers that need to modify or
+                # need contiguous memory make their own copy
+                transformed[key].flags.writeable = False
             except Exception as e:
                 logger.error(f"Error transforming: {e}")
         for key, value in transformed.items():
             self.latest_transformed[key] = value
         self.updated = True
 
+
 class PassThroughTransformer:
     def __init__(self, config):
         # config is a dictionary of output:intput pairs
@@ -193,3 +304,6 @@ class PassThroughTransformer:
         #     logger.debug(f"{key}: {value.shape}")
         # for key, value in self.latest_transformed.items():
         #     logger.debug(f"{key}: {value.shape}")
+
+    def transform_batch(self, columns):
+        return {key: columns[value] for key, value in self.pv_mapping.items()}
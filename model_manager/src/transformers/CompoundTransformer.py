@@ -1,7 +1,7 @@
 # defines a compound transformer that can be used add multiple transformers together
 from src.logging_utils.make_logger import get_logger
 from src.transformers import registered_transformers
-import sympy as sp
+from src.metrics import StageMetrics
 import time
 
 logger = get_logger()
@@ -19,26 +19,28 @@ class CompoundTransformer:
     def __init__(self, config):
         logger.debug("Initializing CompoundTransformer")
         self.transformers = []
+        self.names = []
         self.latest_input = {}
         self.latest_transformed = {}
         self.input_list = []
+        # symbol -> children that take it as input, so an update only visits those
+        self.routes = {}
         for transformer in config["transformers"]:
             # print(transformer, config["transformers"][transformer])
             transformer_type = config["transformers"][transformer]["type"]
             transformer_config = config["transformers"][transformer]["config"]
-            self.transformers.append(
-                registered_transformers[transformer_type](transformer_config)
-            )
-            self.input_list += self.transformers[-1].input_list
-            # merge dicts
-            self.latest_transformed = {
-                **self.latest_transformed,
-                **self.transformers[-1].latest_transformed,
-            }
-            self.latest_input = {
-                **self.latest_input,
-                **self.transformers[-1].latest_input,
-            }
+            child = registered_transformers[transformer_type](transformer_config)
+            self.transformers.append(child)
+            self.names.append(transformer)
+            self.input_list += child.input_list
+            for name in child.input_list:
+                self.routes.setdefault(name, []).append((transformer, child))
+            self.latest_transformed.update(child.latest_transformed)
+            self.latest_input.update(child.latest_input)
+        # handler time of each child, in ns
+        self.child_metrics = StageMetrics(self.names)
+        # outputs changed since the consumer last cleared the set
+        self.dirty = set()
         self.updated = False
         self.handler_time = 0
 
@@ -48,21 +50,35 @@ class CompoundTransformer:
 
         return data
 
+    def transform_batch(self, columns):
+        transformed = {}
+        for transformer in self.transformers:
+            transformed.update(
+                transformer.transform_batch(
+                    {name: columns[name] for name in transformer.input_list}
+                )
+            )
+        return transformed
+
     def handler(self, name, data):
         time_start = time.time()
         logger.debug(f"CompoundTransformer handler for {name}")
-        for transformer in self.transformers:
-            if name in transformer.input_list:
-                transformer.handler(name, data)
-                if transformer.updated:
-                    self.updated = True
-                    self.latest_transformed = {
-                        **self.latest_transformed,
-                        **transformer.latest_transformed,
-                    }
-                    self.latest_input = {
-                        **self.latest_input,
-                        **transformer.latest_input,
-                    }
+        for child_name, transformer in self.routes.get(name, []):
+            child_start = time.perf_counter_ns()
+            transformer.handler(name, data)
+            self.latest_input[name] = transformer.latest_input[name]
+            if transformer.updated:
+                self.updated = True
+                transformer.updated = False
+                # only copy what changed, children without a dirty set report everything
+                changed = getattr(transformer, "dirty", None)
+                if changed is None:
+                    changed = transformer.latest_transformed.keys()
+                for key in changed:
+                    self.latest_transformed[key] = transformer.latest_transformed[key]
+                self.dirty.update(changed)
+                if hasattr(transformer, "dirty"):
+                    transformer.dirty.clear()
+            self.child_metrics.record(child_name, time.perf_counter_ns() - child_start)
         time_end = time.time()
         self.handler_time = time_end - time_start
@@ -1,11 +1,25 @@
-registered_transformers = {}
+from src.registry import LazyRegistry
 
-from .BaseTransformers import SimpleTransformer
-from .BaseTransformers import CAImageTransfomer
-from .BaseTransformers import PassThroughTransformer
-from .CompoundTransformer import CompoundTransformer
+registered_transformers = LazyRegistry("model_manager.transformers")
+registered_transformers.register(
+    "SimpleTransformer", "src.transformers.BaseTransformers:SimpleTransformer"
+)
+registered_transformers.register(
+    "CAImageTransfomer", "src.transformers.BaseTransformers:CAImageTransfomer"
+)
+registered_transformers.register(
+    "PassThroughTransformer", "src.transformers.BaseTransformers:PassThroughTransformer"
+)
 
-registered_transformers["SimpleTransformer"] = SimpleTransformer
-registered_transformers["CAImageTransfomer"] = CAImageTransfomer
-registered_transformers["CompoundTransformer"] = CompoundTransformer
-registered_transformers["PassThroughTransformer"] = PassThroughTransformer
+# the submodule has the same name as the class, so it is imported eagerly to keep
+# `src.transformers.CompoundTransformer` bound to the class, it is cheap to import
+from src.transformers.CompoundTransformer import CompoundTransformer
+
+registered_transformers.register("CompoundTransformer", CompoundTransformer)
+
+
+def __getattr__(name):
+    # keeps `from src.transformers import SimpleTransformer` working without eager imports
+    if name in registered_transformers:
+        return registered_transformers[name]
+    raise AttributeError(f"module {__name__} has no attribute {name}")
@@ -0,0 +1,164 @@
+from src.cli import model_batch
+from src.config.config_object import ConfigObject, DeploymentConfig
+from src.interfaces.file_interface import h5dfInterface
+from src.transformers import SimpleTransformer
+import numpy as np
+import h5py
+import pydantic
+import pytest
+import types
+
+
+class SumModel:
+    def evaluate(self, input_dict):
+        return {"y": input_dict["x1"] + input_dict["x2"]}
+
+
+class ScalarOnlyModel:
+    def evaluate(self, input_dict):
+        return {"y": float(max(input_dict["x1"], input_dict["x2"]))}
+
+
+def run_batch(tmp_path, model, deployment):
+    in_path = str(tmp_path / "in.h5")
+    out_path = str(tmp_path / "out.h5")
+    with h5py.File(in_path, "w") as f:
+        f.create_dataset("PV:A", data=np.arange(25.0))
+        f.create_dataset("PV:B", data=np.ones(25))
+
+    in_transformer = SimpleTransformer(
+        {
+            "variables": {"x1": {"formula": "PV:A * 2"}, "x2": {"formula": "PV:B"}},
+            "symbols": ["PV:A", "PV:B"],
+        }
+    )
+    out_transformer = SimpleTransformer(
+        {"variables": {"PV:Y": {"formula": "y"}}, "symbols": ["y"]}
+    )
+    model_batch(
+        h5dfInterface({"path": in_path}),
+        h5dfInterface({"path": out_path, "mode": "w"}),
+        in_transformer,
+        out_transformer,
+        model,
+        types.SimpleNamespace(model_type="local"),
+        None,
+        deployment,
+    )
+    with h5py.File(out_path, "r") as f:
+        return f["PV:Y"][()]
+
+
+def test_model_batch_vectorized(tmp_path):
+    deployment = DeploymentConfig(type="batch", chunk_size=10)
+    y = run_batch(tmp_path, SumModel(), deployment)
+    assert y.shape == (25,)
+    np.testing.assert_allclose(y, np.arange(25.0) * 2 + 1)
+
+
+def test_model_batch_row_by_row(tmp_path):
+    deployment = DeploymentConfig(type="batch", chunk_size=10, vectorized=False)
+    y = run_batch(tmp_path, ScalarOnlyModel(), deployment)
+    np.testing.assert_allclose(y, np.maximum(np.arange(25.0) * 2, 1))
+
+
+class WaveformModel:
+    def evaluate(self, input_dict):
+        return {"peak": input_dict["scaled"].max(axis=-1), "scaled": input_dict["scaled"]}
+
+
+def test_model_batch_waveforms(tmp_path):
+    in_path = str(tmp_path / "in.h5")
+    out_path = str(tmp_path / "out.h5")
+    wave = np.tile(np.arange(8, dtype=np.float32), (25, 1))
+    with h5py.File(in_path, "w") as f:
+        f.create_dataset("PV:WAVE", data=wave)
+        f.create_dataset("PV:GAIN", data=np.arange(25))
+
+    in_transformer = SimpleTransformer(
+        {
+            "variables": {"scaled": {"formula": "PV:GAIN * PV:WAVE + 1"}},
+            "symbols": ["PV:GAIN", "PV:WAVE"],
+        }
+    )
+    out_transformer = SimpleTransformer(
+        {
+            "variables": {
+                "PV:PEAK": {"formula": "peak"},
+                "PV:SCALED": {"formula": "scaled * 2"},
+            },
+            "symbols": ["peak", "scaled"],
+        }
+    )
+    model_batch(
+        h5dfInterface({"path": in_path}),
+        h5dfInterface({"path": out_path, "mode": "w"}),
+        in_transformer,
+        out_transformer,
+        WaveformModel(),
+        types.SimpleNamespace(model_type="local"),
+        None,
+        DeploymentConfig(type="batch", chunk_size=10),
+    )
+    with h5py.File(out_path, "r") as f:
+        peak, scaled = f["PV:PEAK"][()], f["PV:SCALED"][()]
+
+    # each row's gain scales that row's waveform, which stays float32
+    expected = (np.arange(25)[:, None] * wave + 1) * 2
+    assert scaled.dtype == np.float32 and scaled.shape == (25, 8)
+    np.testing.assert_allclose(scaled, expected)
+    assert peak.dtype == np.float64 and peak.shape == (25,)
+    np.testing.assert_allclose(peak, np.arange(25) * 7.0 + 1)
+
+    # the same rows through the streaming transform
+    for row in range(25):
+        in_transformer.handler("PV:GAIN", {"value": row})
+        in_transformer.handler("PV:WAVE", {"value": wave[row]})
+        np.testing.assert_array_equal(
+            in_transformer.latest_transformed["scaled"], expected[row] / 2
+        )
+
+
+def test_batch_rejects_image_transformers():
+    image = {"type": "CAImageTransfomer", "config": {"variables": {}}}
+    config = {
+        "deployment": {"type": "batch"},
+        "input_data": {"get_method": "h5df", "config": {}},
+        "input_data_to_model": {
+            "type": "CompoundTransformer",
+            "config": {"transformers": {"image": image}},
+        },
+        "output_model_to_data": {"type": "PassThroughTransformer", "config": {}},
+        "output_data_to": {"put_method": "h5df", "config": {"mode": "w"}},
+        "outputs_model": {"config": {}},
+    }
+    with pytest.raises(pydantic.ValidationError, match="CAImageTransfomer"):
+        ConfigObject(**config)
+    # the same transformers are fine when streaming
+    config["deployment"]["type"] = "continuous"
+    ConfigObject(**config)
+
+
+def test_batch_needs_h5df_interfaces():
+    simple = {"variables": {"x1": {"formula": "A"}}, "symbols": ["A"]}
+    config = {
+        "deployment": {"type": "batch"},
+        "input_data": {"get_method": "h5df", "config": {}},
+        "input_data_to_model": {"type": "SimpleTransformer", "config": simple},
+        "output_model_to_data": {"type": "SimpleTransformer", "config": simple},
+        "output_data_to": {"put_method": "h5df", "config": {"mode": "w"}},
+        "outputs_model": {"config": {}},
+    }
+    ConfigObject(**config)
+
+    config["output_data_to"]["config"] = {}
+    with pytest.raises(pydantic.ValidationError, match="mode: w"):
+        ConfigObject(**config)
+
+    config["output_data_to"] = {"put_method": "p4p", "config": {}}
+    with pytest.raises(pydantic.ValidationError, match="h5df"):
+        ConfigObject(**config)
+    config["output_data_to"] = {"put_method": "h5df", "config": {"mode": "w"}}
+    config["input_data"]["get_method"] = "k2eg"
+    with pytest.raises(pydantic.ValidationError, match="h5df"):
+        ConfigObject(**config)
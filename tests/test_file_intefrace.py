@@ -18,3 +18,192 @@
 #     for key, value in data:
 #         assert key is not None
 #         assert value is not None
+
+from src.interfaces.file_interface import h5dfInterface, h5dfReplayInterface
+from src.cli import make_update_queue, model_main
+from src.config.config_object import DeploymentConfig, OutputDataToConfig
+from src.transformers import SimpleTransformer
+import numpy as np
+import asyncio
+import pydantic
+import pytest
+import h5py
+import types
+import time
+
+
+def test_h5dfInterface_columns(tmp_path):
+    path = str(tmp_path / "test.h5")
+    with h5py.File(path, "w") as f:
+        f.create_dataset("A1", data=np.arange(10.0))
+        f.create_dataset("B1", data=np.arange(10.0) * 2)
+
+    h5 = h5dfInterface({"path": path})
+    assert h5.num_rows(["A1", "B1"]) == 10
+    columns = h5.read_columns(["A1", "B1"], 2, 5)
+    assert list(columns["A1"]) == [2, 3, 4]
+    assert list(columns["B1"]) == [4, 6, 8]
+    h5.close()
+
+    out = h5dfInterface({"path": str(tmp_path / "out.h5"), "mode": "w"})
+    out.write_columns({"y": np.arange(3.0)}, 0)
+    out.write_columns({"y": np.arange(3.0, 5.0)}, 3)
+    out.close()
+    with h5py.File(str(tmp_path / "out.h5"), "r") as f:
+        assert list(f["y"][()]) == [0, 1, 2, 3, 4]
+
+
+def make_replay_file(path):
+    with h5py.File(path, "w") as f:
+        f.create_dataset("A1", data=np.arange(5.0))
+        f.create_dataset("A1_ts", data=np.array([0.0, 0.02, 0.04, 0.06, 0.08]))
+        f.create_dataset("B1", data=np.ones((3, 4, 4)))
+        f.create_dataset("B1_ts", data=np.array([0.01, 0.03, 0.05]))
+
+
+def test_h5dfReplayInterface_interleaves(tmp_path):
+    path = str(tmp_path / "replay.h5")
+    make_replay_file(path)
+    config = {
+        "path": path,
+        "rate": "max",
+        "chunk_size": 2,
+        "variables": {
+            "A1": {"name": "A1", "timestamps": "A1_ts"},
+            "B1": {"name": "B1", "timestamps": "B1_ts"},
+        },
+    }
+    replay = h5dfReplayInterface(config)
+    _, first = replay.get("A1")
+    assert first["value"] == 0
+
+    received = []
+    replay.monitor(lambda name, value: received.append((name, value)))
+    assert replay.finished.wait(5)
+    assert [name for name, _ in received] == ["A1", "B1"] * 3 + ["A1"] * 2
+    times = [value["timestamp"] for _, value in received]
+    assert times == sorted(times)
+    assert received[1][1]["value"].shape == (4, 4)
+    assert replay.get_many(["A1"])[0][1]["value"] == 4
+    replay.close()
+
+
+def test_h5dfReplayInterface_scaled_rate(tmp_path):
+    path = str(tmp_path / "replay.h5")
+    make_replay_file(path)
+    config = {
+        "path": path,
+        "rate": 0.5,  # half real time, 0.08 s of data should take ~0.16 s
+        "variables": {"A1": {"name": "A1", "timestamps": "A1_ts"}},
+    }
+    replay = h5dfReplayInterface(config)
+    start = time.monotonic()
+    replay.monitor(lambda name, value: None)
+    assert replay.finished.wait(5)
+    assert time.monotonic() - start >= 0.15
+    replay.close()
+
+
+class EchoModel:
+    def evaluate(self, inputs):
+        return {"y": inputs["x"]}
+
+
+class RecordingOutput:
+    def __init__(self):
+        self.puts = []
+
+    def put_many(self, data, **kwargs):
+        self.puts.append(dict(data))
+
+    def close(self):
+        pass
+
+
+def test_h5dfReplayInterface_end_of_stream(tmp_path, monkeypatch):
+    path = str(tmp_path / "replay.h5")
+    with h5py.File(path, "w") as f:
+        f.create_dataset("A1", data=np.arange(2000.0))
+    replay = h5dfReplayInterface(
+        {"path": path, "rate": "max", "variables": {"A1": {"name": "A1"}}}
+    )
+    output = RecordingOutput()
+    in_transformer = SimpleTransformer(
+        {"variables": {"x": {"formula": "A1"}}, "symbols": ["A1"]}
+    )
+    out_transformer = SimpleTransformer(
+        {"variables": {"Y": {"formula": "y"}}, "symbols": ["y"]}
+    )
+    monkeypatch.setenv("PUBLISH", "True")
+
+    async def run():
+        # a full speed replay gets a bounded blocking queue, an unbounded one is refused
+        assert make_update_queue(None, [replay]).maxsize > 0
+        with pytest.raises(ValueError):
+            make_update_queue(
+                DeploymentConfig(type="continuous", queue={"policy": "fifo"}), [replay]
+            )
+        # model_main finishes on its own once the last row went through the model
+        try:
+            await model_main(
+                replay,
+                output,
+                in_transformer,
+                out_transformer,
+                EchoModel(),
+                types.SimpleNamespace(model_type="local"),
+                types.SimpleNamespace(one_shot=False),
+                DeploymentConfig(
+                    type="continuous", queue={"policy": "block", "maxsize": 8}
+                ),
+            )
+        except SystemExit as e:
+            return e.code
+        return None
+
+    assert asyncio.run(asyncio.wait_for(run(), 30)) == 0
+    assert replay.replayed == 2000
+    assert output.puts[-1] == {"Y": 1999.0}
+
+
+def test_scheduled_ticks_wait_for_every_input(tmp_path, monkeypatch):
+    path = str(tmp_path / "replay.h5")
+    with h5py.File(path, "w") as f:
+        f.create_dataset("A1", data=np.arange(200.0))
+    replay = h5dfReplayInterface(
+        {"path": path, "rate": "max", "variables": {"A1": {"name": "A1"}}}
+    )
+    output = RecordingOutput()
+    # B1 never arrives, so the model never has a full set of inputs
+    in_transformer = SimpleTransformer(
+        {"variables": {"x": {"formula": "A1 + B1"}}, "symbols": ["A1", "B1"]}
+    )
+    out_transformer = SimpleTransformer(
+        {"variables": {"Y": {"formula": "y"}}, "symbols": ["y"]}
+    )
+    monkeypatch.setenv("PUBLISH", "True")
+
+    async def run():
+        try:
+            await model_main(
+                replay,
+                output,
+                in_transformer,
+                out_transformer,
+                EchoModel(),
+                types.SimpleNamespace(model_type="local"),
+                types.SimpleNamespace(one_shot=False),
+                DeploymentConfig(type="continuous", rate_hz=1000),
+            )
+        except SystemExit as e:
+            return e.code
+        return None
+
+    assert asyncio.run(asyncio.wait_for(run(), 30)) == 0
+    assert replay.replayed == 200
+    assert output.puts == []
+
+
+def test_h5dfReplayInterface_is_input_only():
+    with pytest.raises(pydantic.ValidationError, match="input only"):
+        OutputDataToConfig(put_method="h5df_replay", config={})
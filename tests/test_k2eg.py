@@ -0,0 +1,116 @@
+from src.interfaces.k2eg_interface import K2EGInterface
+import k2eg
+import threading
+import pytest
+import time
+
+
+class FakeClient:
+    """Stands in for k2eg.dml, values are served from `values` and counted"""
+
+    def __init__(self, *args, **kwargs):
+        self.values = {}
+        self.gets = []
+        self.handler = None
+
+    def monitor_many(self, urls, handler, timeout=None):
+        self.handler = handler
+
+    def push(self, name, value):
+        # a monitor update, k2eg hands over the bare pv name
+        self.handler(name, {"value": value})
+
+    def get(self, url):
+        self.gets.append(url)
+        return {"value": self.values[url]}
+
+    def put(self, url, value):
+        self.values[url] = value
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def interface(monkeypatch):
+    monkeypatch.setattr(k2eg, "dml", FakeClient)
+    interface = K2EGInterface(
+        {
+            "variables": {
+                "a": {"proto": "pva", "name": "TEST:A"},
+                "b": {"proto": "ca", "name": "TEST:B"},
+            },
+            "pipelined_puts": False,
+        }
+    )
+    yield interface
+    interface.close()
+
+
+def test_k2eg_get_from_cache(interface):
+    client = interface.client
+    client.values = {"pva://TEST:A": 1.0, "ca://TEST:B": 2.0}
+    snapshot = interface.get_many(["a"])
+    assert client.handler is not None
+    # nothing cached yet, the missing value is fetched once
+    assert client.gets == ["pva://TEST:A"]
+    assert snapshot[0][1]["value"] == 1.0
+
+    # monitor updates are served from the cache without a request
+    client.push("TEST:A", 3.0)
+    name, value = interface.get("a")
+    assert value["value"] == 3.0 and value["counter"] == 2
+    assert client.gets == ["pva://TEST:A"]
+    assert dict(interface.get_many(["a", "b"]))["b"]["value"] == 2.0
+    assert client.gets == ["pva://TEST:A", "ca://TEST:B"]
+
+
+def test_k2eg_max_age(interface):
+    interface.max_age = 0.05
+    client = interface.client
+    client.values = {"pva://TEST:A": 1.0, "ca://TEST:B": 2.0}
+    interface.get("a")
+    interface.get("a")
+    assert len(client.gets) == 1
+    time.sleep(0.1)
+    client.values["pva://TEST:A"] = 5.0
+    assert interface.get("a")[1]["value"] == 5.0
+    assert len(client.gets) == 2
+
+
+def test_k2eg_monitor_replays_updates_after_snapshot(interface):
+    client = interface.client
+    client.values = {"pva://TEST:A": 1.0, "ca://TEST:B": 2.0}
+    snapshot = dict(interface.get_many(["a", "b"]))
+    assert snapshot["a"]["value"] == 1.0
+
+    # arrives between the initial snapshot and monitor(), it must still be handed over
+    client.push("TEST:B", 4.0)
+    received = []
+    interface.monitor(lambda name, value: received.append((name, value["value"])))
+    assert received == [("b", 4.0)]
+
+    client.push("TEST:A", 6.0)
+    assert received == [("b", 4.0), ("a", 6.0)]
+
+
+def test_k2eg_monitor_update_during_replay(interface):
+    client = interface.client
+    client.values = {"pva://TEST:A": 1.0, "ca://TEST:B": 2.0}
+    interface.get_many(["a", "b"])
+    client.push("TEST:B", 4.0)
+
+    pusher = threading.Thread(target=client.push, args=("TEST:B", 5.0))
+    received = []
+
+    def handler(name, value):
+        if not pusher.is_alive() and pusher.ident is None:
+            # a monitor update lands while the cached value is being replayed
+            pusher.start()
+            pusher.join(0.2)
+        received.append((name, value["value"]))
+
+    interface.monitor(handler)
+    pusher.join(5)
+    # the replayed value is never delivered after the newer one
+    assert received == [("b", 4.0), ("b", 5.0)]
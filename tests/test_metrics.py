@@ -0,0 +1,53 @@
+from src.metrics import LatencyHistogram, StageMetrics, MetricsPublisher
+import numpy as np
+
+
+def test_latency_histogram_percentiles():
+    hist = LatencyHistogram()
+    values = np.random.default_rng(0).integers(0, 10**9, 10000)
+    for value in values:
+        hist.record(value)
+
+    summary = hist.summary()
+    assert summary["count"] == 10000
+    assert summary["max"] == values.max()
+    for p in [50, 90, 99]:
+        exact = np.percentile(values, p)
+        # log-linear buckets keep the relative error within ~1.6%
+        assert abs(summary[f"p{p}"] - exact) / exact < 0.02
+
+
+def test_latency_histogram_small_values_exact():
+    hist = LatencyHistogram()
+    for value in [1, 2, 3, 4, 100]:
+        hist.record(value)
+    assert hist.percentile(50) == 3
+    assert hist.percentile(100) == 100
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_stage_metrics_window():
+    metrics = StageMetrics(["inference"])
+    metrics.record("inference", 1000)
+    metrics.record("inference", 3000)
+    window = metrics.roll_window()
+    assert window["inference"]["count"] == 2
+    assert metrics.summary()["inference"]["count"] == 0
+
+    metrics.record("inference", 2000)
+    totals = metrics.summary(window=False)
+    assert totals["inference"]["count"] == 3
+    assert totals["inference"]["max"] == 3000
+    assert "inference: p50" in StageMetrics.format(window)
+
+
+def test_metrics_publisher():
+    metrics = StageMetrics(["inference"])
+    metrics.record("inference", 2_000_000)
+    publisher = MetricsPublisher(["inference"], "TEST:METRICS")
+    publisher.publish(metrics.roll_window())
+    _, count = publisher.interface.get("TEST:METRICS:INFERENCE:COUNT")
+    _, p50 = publisher.interface.get("TEST:METRICS:INFERENCE:P50")
+    assert count["value"] == 1
+    assert abs(p50["value"] - 2.0) < 0.05
+    publisher.close()
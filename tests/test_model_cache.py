@@ -0,0 +1,170 @@
+from src.model_utils.ModelCache import ModelArtifactCache
+import numpy as np
+import h5py
+import os
+import time
+import types
+import pytest
+
+
+def write_files(files):
+    def populate(directory):
+        for name, content in files.items():
+            with open(os.path.join(directory, name), "w") as f:
+                f.write(content)
+
+    return populate
+
+
+def test_cache_store_and_lookup(tmp_path):
+    cache = ModelArtifactCache(root=str(tmp_path))
+    key = cache.key("model", "1", "run", "model")
+    assert key == cache.key("model", "1", "run", "model")
+    assert key != cache.key("model", "2", "run", "model")
+    assert cache.lookup(key) is None
+
+    path = cache.store(key, write_files({"weights.bin": "abc"}))
+    assert cache.lookup(key) == path
+    assert cache.manifest(key)["size"] == 3
+
+    # a populate that fails must not leave a partial entry behind
+    with pytest.raises(RuntimeError):
+
+        def broken(directory):
+            raise RuntimeError("download failed")
+
+        cache.store(cache.key("model", "2", "run", "model"), broken)
+    assert cache.lookup(cache.key("model", "2", "run", "model")) is None
+
+
+def test_cache_integrity_check(tmp_path):
+    cache = ModelArtifactCache(root=str(tmp_path))
+    key = cache.key("model", "1", "run", "model")
+    path = cache.store(key, write_files({"weights.bin": "abc"}))
+    with open(os.path.join(path, "weights.bin"), "w") as f:
+        f.write("tampered")
+    assert cache.lookup(key) is None
+    assert not os.path.exists(path)
+
+
+def test_cache_lru_eviction(tmp_path):
+    cache = ModelArtifactCache(root=str(tmp_path), max_size_bytes=25)
+    keys = [cache.key("model", str(i), "run", "model") for i in range(3)]
+    cache.store(keys[0], write_files({"w": "a" * 10}))
+    time.sleep(0.01)
+    cache.store(keys[1], write_files({"w": "b" * 10}))
+    time.sleep(0.01)
+    # using the first entry makes the second one the least recently used
+    assert cache.lookup(keys[0]) is not None
+    time.sleep(0.01)
+    cache.store(keys[2], write_files({"w": "c" * 10}))
+
+    assert cache.lookup(keys[0]) is not None
+    assert cache.lookup(keys[1]) is None
+    assert cache.lookup(keys[2]) is not None
+    assert cache.size() <= 25
+
+
+def test_cache_offline_resolution(tmp_path):
+    cache = ModelArtifactCache(root=str(tmp_path))
+    assert cache.resolve_offline("model", "champion") is None
+    cache.remember("model", "champion", {"version": "3", "run_id": "abc"})
+    assert cache.resolve_offline("model", "champion")["version"] == "3"
+
+
+def register_model(tmp_path, monkeypatch):
+    """Log a pyfunc model as cache_test version 1 to a file registry in tmp_path"""
+    import mlflow
+
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    monkeypatch.chdir(tmp_path)
+    mlflow.set_tracking_uri(f"file://{tmp_path}/mlruns")
+    mlflow.set_registry_uri(f"file://{tmp_path}/mlruns")
+
+    class CacheTestModel(mlflow.pyfunc.PythonModel):
+        def get_model(self):
+            return self
+
+        def evaluate(self, input_dict):
+            return {"y": input_dict["x1"] * 2}
+
+    with mlflow.start_run():
+        mlflow.pyfunc.log_model(
+            name="model",
+            python_model=CacheTestModel(),
+            registered_model_name="cache_test",
+        )
+
+
+def disconnect_registry(tmp_path):
+    import mlflow
+
+    mlflow.set_tracking_uri(f"file://{tmp_path}/missing")
+    mlflow.set_registry_uri(f"file://{tmp_path}/missing")
+
+
+def test_mlflow_getter_uses_cache(tmp_path, monkeypatch):
+    from src.model_utils.MlflowModelGetter import MLflowModelGetter
+
+    register_model(tmp_path, monkeypatch)
+    config = {
+        "model_name": "cache_test",
+        "model_version": "1",
+        "cache_dir": str(tmp_path / "cache"),
+    }
+    model = MLflowModelGetter(config).get_model()
+    assert model.evaluate({"x1": 2})["y"] == 4
+
+    # with the registry gone the model still starts from the cache
+    disconnect_registry(tmp_path)
+    getter = MLflowModelGetter({**config, "offline": True})
+    model = getter.get_model()
+    assert model.evaluate({"x1": 3})["y"] == 6
+    assert getter.model_type == "pyfunc"
+
+
+def test_offline_env_through_setup(tmp_path, monkeypatch):
+    from src.model_utils.MlflowModelGetter import MLflowModelGetter
+    from src.cli import setup
+
+    register_model(tmp_path, monkeypatch)
+    monkeypatch.setenv("MODEL_MANAGER_CACHE_DIR", str(tmp_path / "cache"))
+    MLflowModelGetter({"model_name": "cache_test", "model_version": "1"}).get_model()
+    disconnect_registry(tmp_path)
+
+    monkeypatch.setenv("MODEL_MANAGER_OFFLINE", "True")
+    with h5py.File(tmp_path / "in.h5", "w") as f:
+        f.create_dataset("A", data=np.arange(3.0))
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        "deployment:\n"
+        "  type: batch\n"
+        "input_data:\n"
+        "  get_method: h5df\n"
+        f"  config: {{path: {tmp_path / 'in.h5'}}}\n"
+        "input_data_to_model:\n"
+        "  type: SimpleTransformer\n"
+        "  config: {symbols: [A], variables: {x1: {formula: A}}}\n"
+        "outputs_model:\n"
+        "  config: {variables: {y: {type: scalar}}}\n"
+        "output_model_to_data:\n"
+        "  type: SimpleTransformer\n"
+        "  config: {symbols: [y], variables: {Y: {formula: y}}}\n"
+        "output_data_to:\n"
+        "  put_method: h5df\n"
+        f"  config: {{path: {tmp_path / 'out.h5'}, mode: w}}\n"
+    )
+    args = types.SimpleNamespace(
+        local=None,
+        model_name="cache_test",
+        model_version="1",
+        offline=False,
+        reqirements=False,
+        config=str(config),
+        startup_profile=False,
+    )
+    _, _, _, _, model, model_getter, _, deployment = setup(args)
+    # the environment variable applies when --offline isn't given
+    assert model_getter.offline
+    assert model.evaluate({"x1": 3})["y"] == 6
+    assert deployment.type == "batch"
@@ -0,0 +1,160 @@
+from src.pipeline import ModelPipeline, SharedInterfaces
+from src.interfaces import registered_interfaces
+from src.interfaces.file_interface import h5dfReplayInterface
+from src.transformers import PassThroughTransformer, SimpleTransformer
+from src.config.config_object import DeploymentConfig
+from src.cli import setup_multi, multi_model_main, STAGES
+import numpy as np
+import asyncio
+import pytest
+import types
+import h5py
+
+
+def make_pipeline(name, channels):
+    config = {"variables": {channel: {"name": channel, "proto": "pva"} for channel in channels}}
+    transformer = PassThroughTransformer({"variables": {c: c for c in channels}})
+    pipeline = ModelPipeline(
+        name, transformer, None, None, None, config, ["inference"]
+    )
+    return pipeline, config
+
+
+def test_shared_inputs_are_deduplicated():
+    inputs = SharedInterfaces(registered_interfaces, routed=True)
+    a, config_a = make_pipeline("a", ["MULTI:A", "MULTI:B"])
+    b, config_b = make_pipeline("b", ["MULTI:B", "MULTI:C"])
+    key_a = inputs.add("p4p_server", config_a, a)
+    key_b = inputs.add("p4p_server", config_b, b)
+    assert key_a == key_b
+
+    inputs.build()
+    try:
+        assert len(inputs.interfaces) == 1
+        interface = inputs.interfaces[key_a]
+        assert sorted(interface.pv_list) == ["MULTI:A", "MULTI:B", "MULTI:C"]
+
+        assert inputs.pipelines_for(key_a, "MULTI:A") == [a]
+        assert inputs.pipelines_for(key_a, "MULTI:B") == [a, b]
+        assert inputs.pipelines_for(key_a, "MULTI:C") == [b]
+        assert inputs.pipelines_for(key_a, "MULTI:D") == []
+    finally:
+        inputs.close()
+
+
+def test_shared_inputs_split_on_options_and_reject_conflicts():
+    inputs = SharedInterfaces(registered_interfaces, routed=True)
+    a, config_a = make_pipeline("a", ["MULTI:A"])
+    b, config_b = make_pipeline("b", ["MULTI:A"])
+    config_b["init"] = False
+    key_a = inputs.add("p4p_server", config_a, a)
+    key_b = inputs.add("p4p_server", config_b, b)
+    assert key_a != key_b
+    # the same channel name on two interfaces is routed by interface
+    assert inputs.pipelines_for(key_a, "MULTI:A") == [a]
+    assert inputs.pipelines_for(key_b, "MULTI:A") == [b]
+
+    # outputs are never routed as inputs
+    outputs = SharedInterfaces(registered_interfaces)
+    key = outputs.add("p4p_server", config_a, a)
+    assert outputs.pipelines_for(key, "MULTI:A") == []
+
+    c, config_c = make_pipeline("c", ["MULTI:A"])
+    config_c["variables"]["MULTI:A"]["proto"] = "ca"
+    with pytest.raises(ValueError):
+        inputs.add("p4p_server", config_c, c)
+
+
+def test_setup_multi_rejects_executor(tmp_path):
+    path = tmp_path / "multi.yaml"
+    path.write_text(
+        "deployment:\n"
+        "  type: continuous\n"
+        "  executor:\n"
+        "    workers: 2\n"
+        "models: {}\n"
+    )
+    with pytest.raises(ValueError, match="executor"):
+        setup_multi(types.SimpleNamespace(multi=str(path), startup_profile=False))
+
+
+class RecordingOutput:
+    def __init__(self, config):
+        self.variables = config["variables"]
+        self.puts = []
+
+    def put_many(self, data, **kwargs):
+        self.puts.append(dict(data))
+
+    def close(self):
+        pass
+
+
+class ScaleModel:
+    def __init__(self, scale, offset):
+        self.scale = scale
+        self.offset = offset
+
+    def evaluate(self, inputs):
+        return {"y": inputs["x"] * self.scale + self.offset}
+
+
+def test_multi_model_main_shares_one_input(tmp_path, monkeypatch):
+    path = str(tmp_path / "replay.h5")
+    with h5py.File(path, "w") as f:
+        f.create_dataset("A1", data=np.arange(100.0))
+    monkeypatch.setenv("PUBLISH", "True")
+
+    registry = {"h5df_replay": h5dfReplayInterface, "recording": RecordingOutput}
+    inputs = SharedInterfaces(registry, routed=True)
+    outputs = SharedInterfaces(registry)
+    input_config = {"path": path, "rate": "max", "variables": {"A1": {"name": "A1"}}}
+    pipelines = []
+    for name, model in [("double", ScaleModel(2, 0)), ("shift", ScaleModel(1, 1))]:
+        output = f"{name.upper()}:Y"
+        pipeline = ModelPipeline(
+            name,
+            SimpleTransformer({"variables": {"x": {"formula": "A1"}}, "symbols": ["A1"]}),
+            SimpleTransformer({"variables": {output: {"formula": "y"}}, "symbols": ["y"]}),
+            model,
+            types.SimpleNamespace(model_type="local"),
+            input_config,
+            STAGES,
+        )
+        pipeline.in_key = inputs.add("h5df_replay", input_config, pipeline)
+        pipeline.out_key = outputs.add(
+            "recording", {"variables": {output: {"name": output}}}, pipeline
+        )
+        pipelines.append(pipeline)
+    inputs.build()
+    outputs.build()
+    assert len(inputs.interfaces) == 1 and len(outputs.interfaces) == 1
+    for pipeline in pipelines:
+        pipeline.in_interface = inputs.interfaces[pipeline.in_key]
+        pipeline.out_interface = outputs.interfaces[pipeline.out_key]
+
+    async def run():
+        # exits on its own once the replay ended and every update went through the models
+        try:
+            await multi_model_main(
+                pipelines,
+                inputs,
+                outputs,
+                types.SimpleNamespace(one_shot=False),
+                DeploymentConfig(type="continuous"),
+            )
+        except SystemExit as e:
+            return e.code
+        return None
+
+    assert asyncio.run(asyncio.wait_for(run(), 30)) == 0
+    replay = next(iter(inputs.interfaces.values()))
+    assert replay.replayed == 100
+
+    # queued updates are coalesced, the last one reaches both models and each puts only its own output
+    puts = next(iter(outputs.interfaces.values())).puts
+    assert [put for put in puts if "DOUBLE:Y" in put][-1] == {"DOUBLE:Y": 198.0}
+    assert [put for put in puts if "SHIFT:Y" in put][-1] == {"SHIFT:Y": 100.0}
+    for pipeline in pipelines:
+        inference = pipeline.metrics.summary(window=False)["inference"]
+        assert 1 <= inference["count"] <= 100
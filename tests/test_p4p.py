@@ -72,3 +72,31 @@ def test_SimplePVAInterface_put_and_get_image():
     assert image_get["value"][0][0] == arry[0][0]
 
     p4p.close()
+
+
+def test_SimplePVAInterface_get_many():
+    config = {
+        "variables": {
+            "test:float:CC": {"name": "test:float:CC", "proto": "pva"},
+            "test:float:DD": {"name": "test:float:DD", "proto": "pva"},
+            "test:image:CC": {
+                "name": "test:image:CC",
+                "proto": "pva",
+                "type": "image",
+            },
+        }
+    }
+    p4p = SimplePVAInterface(config)
+    p4p.put("test:float:CC", 3)
+    p4p.put("test:float:DD", 4)
+
+    values = p4p.get_many(p4p.variable_list)
+    assert [name for name, _ in values] == p4p.variable_list
+    values = dict(values)
+    assert values["test:float:CC"]["value"] == 3
+    assert values["test:float:DD"]["value"] == 4
+    # images are reshaped the same way get() does it
+    _, image = p4p.get("test:image:CC")
+    assert values["test:image:CC"]["value"].shape == image["value"].shape
+    assert values["test:image:CC"]["value"].ndim == 2
+    p4p.close()
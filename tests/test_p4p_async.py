@@ -0,0 +1,93 @@
+from src.interfaces import AsyncPVAInterface, SimlePVAInterfaceServer
+from src.logging_utils.make_logger import make_logger
+import numpy as np
+import asyncio
+
+logger = make_logger("model_manager")
+
+# served in process so the test doesn't depend on mailbox.py
+server_config = {
+    "variables": {
+        "test:async:AA": {"name": "test:async:AA", "proto": "pva"},
+        "test:async:BB": {"name": "test:async:BB", "proto": "pva"},
+        "test:async:IMG": {
+            "name": "test:async:IMG",
+            "proto": "pva",
+            "type": "image",
+            "image_size": {"x": 8, "y": 6},
+        },
+    }
+}
+
+
+def test_AsyncPVAInterface_get_put_monitor():
+    server = SimlePVAInterfaceServer(server_config)
+    server.put("test:async:AA", 1)
+    server.put("test:async:BB", 2)
+
+    async def run():
+        config = {
+            "variables": {
+                key: {"name": key, "proto": "pva"}
+                for key in ["test:async:AA", "test:async:BB"]
+            },
+            "timeout": 2.0,
+            "pipelined_puts": True,
+        }
+        p4p = AsyncPVAInterface(config)
+        name, value = await p4p.get("test:async:AA")
+        assert name == "test:async:AA"
+        assert value["value"] == 1
+
+        await p4p.put_many({"test:async:AA": 3, "test:async:BB": 4})
+        # put_many only hands the values to the writer task
+        assert await p4p.flush(2.0)
+        assert p4p.put_tracker.stats()["completed"] == 2
+        values = dict(await p4p.get_many(["test:async:AA", "test:async:BB"]))
+        assert values["test:async:AA"]["value"] == 3
+        assert values["test:async:BB"]["value"] == 4
+
+        updates = []
+        await p4p.monitor(lambda name, value: updates.append((name, value["value"])))
+        await asyncio.sleep(0.5)
+        await p4p.put("test:async:BB", 5)
+        for _ in range(20):
+            if ("test:async:BB", 5) in updates:
+                break
+            await asyncio.sleep(0.1)
+        p4p.close()
+        return updates
+
+    updates = asyncio.run(run())
+    server.close()
+    # initial values first, then the put
+    assert ("test:async:AA", 3) in updates
+    assert ("test:async:BB", 5) in updates
+
+
+def test_AsyncPVAInterface_image():
+    server = SimlePVAInterfaceServer(server_config)
+
+    async def run():
+        config = {
+            "variables": {
+                "test:async:IMG": {
+                    "name": "test:async:IMG",
+                    "proto": "pva",
+                    "type": "image",
+                }
+            }
+        }
+        p4p = AsyncPVAInterface(config)
+        image = np.random.rand(6, 8)
+        await p4p.put_many({"test:async:IMG": image})
+        await p4p.flush(2.0)
+        name, value = await p4p.get("test:async:IMG")
+        p4p.close()
+        return image, value["value"]
+
+    image, received = asyncio.run(run())
+    server.close()
+    # same (y, x) handling as SimplePVAInterface, compare the pixels
+    assert received.size == image.size
+    assert np.allclose(received.ravel(), image.ravel())
@@ -81,3 +81,13 @@ def test_p4p_as_image_input():
     pt.handler("test", value_dict)
     assert pt.updated == True
     assert pt.latest_transformed["IMG1"].shape == (10, 10)
+
+
+def test_SimplePVAInterfaceServer_monitor():
+    config = {"variables": {"test": {"name": "test", "proto": "pva"}}}
+    p4p = SimlePVAInterfaceServer(config)
+    received = []
+    p4p.monitor(lambda name, value: received.append((name, value["value"])))
+    p4p.put("test", 3)
+    assert received == [("test", 3)]
+    p4p.close()
@@ -0,0 +1,386 @@
+from src.pipeline import UpdateQueue, ChangeDetector, InputDeadband, OutputDeadband
+from src.pipeline import MicroBatcher, TorchInputBuffer, RateScheduler
+from src.cli import collect_batch, make_change_detector
+from src.logging_utils.make_logger import get_logger
+import src.pipeline.scheduler
+import numpy as np
+import asyncio
+import logging
+import threading
+import types
+import warnings
+import pytest
+
+
+def test_update_queue_from_thread():
+    async def run():
+        updates = UpdateQueue()
+
+        def feed():
+            for i in range(5):
+                updates.put("A1", {"value": i})
+
+        thread = threading.Thread(target=feed)
+        thread.start()
+        name, value, received = await asyncio.wait_for(updates.get(), timeout=1)
+        thread.join()
+        await asyncio.sleep(0)
+        rest = updates.drain()
+        return name, value, received, rest
+
+    name, value, received, rest = asyncio.run(run())
+    assert name == "A1"
+    assert value["value"] == 0
+    assert received > 0
+    assert [item[1]["value"] for item in rest] == [1, 2, 3, 4]
+
+
+def test_update_queue_policies():
+    async def run(policy):
+        updates = UpdateQueue(policy=policy, maxsize=3)
+
+        def feed():
+            for i in range(10):
+                updates.put("A1" if i % 2 == 0 else "B1", {"value": i})
+
+        thread = threading.Thread(target=feed)
+        thread.start()
+        if policy == "block":
+            # the monitor thread waits for room, consume while it is feeding
+            items = []
+            while len(items) < 10:
+                items.append(await asyncio.wait_for(updates.get(), timeout=1))
+        else:
+            thread.join()
+            items = [await asyncio.wait_for(updates.get(), timeout=1)]
+            items += updates.drain()
+        thread.join()
+        return [(name, value["value"]) for name, value, _ in items], updates.stats()
+
+    items, stats = asyncio.run(run("fifo"))
+    assert items == [("B1", 7), ("A1", 8), ("B1", 9)]
+    assert stats["dropped"] == 7 and stats["max_depth"] == 3
+
+    items, stats = asyncio.run(run("latest"))
+    assert items == [("A1", 8), ("B1", 9)]
+    assert stats["coalesced"] == 8 and stats["max_depth"] == 2
+
+    items, stats = asyncio.run(run("block"))
+    assert [value for _, value in items] == list(range(10))
+    assert stats["dropped"] == 0 and stats["max_depth"] <= 3
+
+
+def test_update_queue_close_releases_blocked_producers():
+    async def run():
+        updates = UpdateQueue(policy="block", maxsize=1)
+        thread = threading.Thread(
+            target=lambda: [updates.put("A1", {"value": i}) for i in range(3)]
+        )
+        thread.start()
+        await asyncio.sleep(0.05)
+        # the producer is stuck waiting for room until the queue is closed
+        assert thread.is_alive()
+        updates.close()
+        thread.join(1)
+        assert not thread.is_alive()
+        # what was queued before closing can still be taken, then get() reports the end
+        name, value, _ = await asyncio.wait_for(updates.get(), timeout=1)
+        assert value == {"value": 0}
+        assert updates.exhausted()
+        assert await asyncio.wait_for(updates.get(), timeout=1) is None
+        updates.put("A1", {"value": 5})
+        assert updates.qsize() == 0
+
+    asyncio.run(run())
+
+
+def test_micro_batcher_stack_unstack():
+    snapshots = [{"x1": 1.0, "img": np.ones((2, 2)) * i} for i in range(3)]
+    inputs = MicroBatcher.stack(snapshots, "local")
+    assert inputs["x1"].shape == (3,)
+    assert inputs["img"].shape == (3, 2, 2)
+
+    samples = MicroBatcher.unstack({"y": inputs["img"].sum(axis=(1, 2))}, 3)
+    assert [sample["y"] for sample in samples] == [0, 4, 8]
+
+    with pytest.raises(ValueError):
+        MicroBatcher.unstack({"y": 1.0}, 3)
+
+
+def test_collect_batch_limits():
+    async def run():
+        updates = UpdateQueue()
+        batcher = MicroBatcher(max_batch_size=4, max_wait_ms=20)
+        for i in range(6):
+            updates.put("A1", {"value": i})
+        await asyncio.sleep(0)
+
+        def apply_update(name, value):
+            batcher.add({"x1": value["value"]})
+
+        await collect_batch(updates, apply_update, batcher)
+        full = [snapshot["x1"] for snapshot in batcher.take()]
+
+        # the last two updates don't fill a batch, collection stops on the time budget
+        await collect_batch(updates, apply_update, batcher)
+        partial = [snapshot["x1"] for snapshot in batcher.take()]
+        return full, partial
+
+    full, partial = asyncio.run(run())
+    assert full == [0, 1, 2, 3]
+    assert partial == [4, 5]
+
+
+def test_torch_input_buffer_reuses_tensors():
+    buffer = TorchInputBuffer(["x1", "img", "img32"])
+    img32 = np.ones((4, 4), dtype=np.float32)
+    values = {"x1": 1.5, "img": np.ones((4, 4)), "img32": img32}
+
+    inputs = buffer.fill(values)
+    x1_ptr = inputs["x1"].data_ptr()
+    img_ptr = inputs["img"].data_ptr()
+    assert float(inputs["x1"]) == 1.5
+    assert inputs["img"].shape == (4, 4)
+    # float32 images are shared with numpy rather than copied
+    assert inputs["img32"].data_ptr() == img32.ctypes.data
+
+    values["x1"] = 2.5
+    values["img"] = np.full((4, 4), 3.0)
+    inputs = buffer.fill(values)
+    assert inputs["x1"].data_ptr() == x1_ptr
+    assert inputs["img"].data_ptr() == img_ptr
+    assert float(inputs["x1"]) == 2.5
+    assert float(inputs["img"][0, 0]) == 3.0
+    # the transformer values themselves are left alone
+    assert isinstance(values["x1"], float)
+    assert isinstance(values["img"], np.ndarray)
+
+
+def test_torch_input_buffer_shares_read_only_frames():
+    buffer = TorchInputBuffer(["img"])
+    # transformed frames and p4p arrays are read-only, they are still not copied
+    frame = np.arange(16, dtype=np.float32).reshape(4, 4)
+    frame.flags.writeable = False
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        inputs = buffer.fill({"img": frame})
+    assert inputs["img"].data_ptr() == frame.ctypes.data
+    assert float(inputs["img"][1, 2]) == 6.0
+
+
+def test_torch_input_buffer_matches_plain_inputs():
+    import torch
+
+    def evaluate(inputs):
+        # works on the plain numpy values and on tensors alike
+        return float((inputs["img"] * inputs["x1"] + inputs["img32"]).sum()) + float(
+            inputs["wave"][3]
+        )
+
+    values = {
+        "x1": 1.5,
+        "img": np.random.rand(8, 8),
+        "img32": np.random.rand(8, 8).astype(np.float32),
+        "wave": torch.arange(10, dtype=torch.float64),
+    }
+    buffer = TorchInputBuffer(values.keys())
+    for _ in range(2):
+        inputs = buffer.fill(values)
+        for key, value in values.items():
+            assert inputs[key].dtype == torch.float32
+            assert np.allclose(inputs[key].numpy(), np.asarray(value, dtype=np.float32))
+        assert evaluate(inputs) == pytest.approx(evaluate(values), rel=1e-5)
+        values["img"] = np.random.rand(8, 8)
+
+
+def test_change_detector_identities():
+    changes = ChangeDetector()
+    assert changes.changed("A", {"value": 1.0, "timestamp": 10.0})
+    # same timestamp is a re-read even if compared values would differ
+    assert not changes.changed("A", {"value": 1.0, "timestamp": 10.0})
+    assert changes.changed("A", {"value": 1.0, "timestamp": 11.0})
+
+    assert changes.changed("B", {"value": 5, "counter": 1})
+    assert not changes.changed("B", {"value": 5, "counter": 1})
+    assert changes.changed("B", {"value": 5, "counter": 2})
+
+    assert changes.changed("C", {"value": 2.0})
+    assert not changes.changed("C", {"value": 2.0})
+    assert changes.changed("C", {"value": 3.0})
+    assert changes.suppressed == {"A": 1, "B": 1, "C": 1}
+
+
+def test_change_detector_arrays():
+    frame = np.random.rand(512, 512)
+    for arrays in ["sample", "hash"]:
+        changes = ChangeDetector(arrays=arrays, sample_size=64)
+        assert changes.changed("IMG", {"value": frame})
+        # an identical frame in a new buffer, or a transposed view, are handled
+        assert not changes.changed("IMG", {"value": frame.copy()})
+        assert changes.changed("IMG", {"value": frame * 2})
+        assert changes.changed("IMG", {"value": (frame * 2).T})
+
+    # by default the whole buffer is hashed, so a single pixel change is seen
+    changes = ChangeDetector()
+    changes.changed("IMG", {"value": frame})
+    edited = frame.copy()
+    edited[1, 1] += 1
+    assert changes.changed("IMG", {"value": edited})
+
+
+def test_sampled_change_detection_warns(caplog, monkeypatch):
+    logger = get_logger()
+    monkeypatch.setattr(logger, "propagate", True)
+    with caplog.at_level(logging.WARNING, logger=logger.name):
+        changes = make_change_detector(types.SimpleNamespace(change_detection=True))
+        assert changes.arrays == "hash"
+        assert "samples" not in caplog.text
+        changes = make_change_detector(
+            types.SimpleNamespace(change_detection={"arrays": "sample"})
+        )
+    assert changes.arrays == "sample"
+    assert "samples 256 elements" in caplog.text
+
+
+def test_input_deadband():
+    deadband = InputDeadband(
+        {
+            "x": {"name": "BPM:X", "proto": "pva", "deadband": 0.1},
+            "q": {
+                "name": "Q",
+                "proto": "pva",
+                "deadband": {"relative": 0.01, "absolute": 0.5},
+            },
+            "w": {"name": "W", "proto": "pva", "deadband": 0.5},
+            "free": {"name": "FREE", "proto": "pva"},
+        }
+    )
+    assert deadband.passes("x", {"value": 1.0})
+    # noise around the last value let through is dropped, the channel name maps to the key
+    assert not deadband.passes("BPM:X", {"value": 1.05})
+    assert not deadband.passes("x", {"value": 1.09})
+    # a slow drift gets through once it adds up
+    assert deadband.passes("BPM:X", {"value": 1.15})
+    assert not deadband.passes("x", {"value": 1.2})
+
+    # the larger of absolute and relative applies
+    assert deadband.passes("q", {"value": 1000.0})
+    assert not deadband.passes("q", {"value": 1009.0})
+    assert deadband.passes("q", {"value": 1011.0})
+    assert deadband.passes("q", {"value": 0.0})
+    assert not deadband.passes("q", {"value": 0.4})
+
+    # waveforms pass once any element moved further than the deadband
+    wave = np.zeros(10000)
+    assert deadband.passes("w", {"value": wave})
+    assert not deadband.passes("w", {"value": wave + 0.3})
+    bumped = wave.copy()
+    bumped[5000] = 1.0
+    assert deadband.passes("w", {"value": bumped})
+
+    for _ in range(3):
+        assert deadband.passes("free", {"value": 1.0})
+    assert deadband.suppressed == {"x": 3, "q": 2, "w": 1}
+    assert "suppressed 6 updates" in deadband.summary()
+
+    with pytest.raises(ValueError):
+        InputDeadband({"x": {"name": "X", "deadband": {"percent": 1}}})
+    with pytest.raises(ValueError):
+        InputDeadband({"x": {"name": "X", "deadband": -1}})
+
+
+def test_output_deadband():
+    deadband = OutputDeadband(
+        {"OUT:Y": {"name": "OUT:Y", "proto": "pva", "deadband": 0.1}}, default=0
+    )
+    image = np.arange(64.0).reshape(8, 8)
+    data = {"OUT:Y": 1.0, "OUT:IMG": image, "OUT:MODE": "run"}
+    assert deadband.filter(data) == data
+
+    # the outputs without a setting of their own only skip identical values
+    image[0, 0] = -1.0
+    assert set(deadband.filter({"OUT:Y": 1.05, "OUT:IMG": image, "OUT:MODE": "run"})) == {
+        "OUT:IMG"
+    }
+    assert deadband.filter({"OUT:Y": 1.05, "OUT:IMG": image.copy(), "OUT:MODE": "run"}) == {}
+    assert set(deadband.filter({"OUT:Y": 1.2, "OUT:IMG": image[:4], "OUT:MODE": "stop"})) == {
+        "OUT:Y",
+        "OUT:IMG",
+        "OUT:MODE",
+    }
+
+    assert deadband.stats() == {
+        "OUT:Y": {"published": 2, "suppressed": 2},
+        "OUT:IMG": {"published": 3, "suppressed": 1},
+        "OUT:MODE": {"published": 2, "suppressed": 2},
+    }
+    assert deadband.summary().startswith("Output deadbands suppressed 5 updates")
+
+
+class FakeClock:
+    """perf_counter_ns and asyncio.sleep for the scheduler, time only moves when told to"""
+
+    def __init__(self):
+        self.now = 10**9
+        self.late = 0
+
+    def perf_counter_ns(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        # the loop wakes `late` ns after the requested time
+        self.now += round(seconds * 1e9) + self.late
+
+    def work(self, ns):
+        self.now += ns
+
+
+def test_rate_scheduler(monkeypatch):
+    clock = FakeClock()
+    scheduler_module = src.pipeline.scheduler
+    monkeypatch.setattr(scheduler_module.time, "perf_counter_ns", clock.perf_counter_ns)
+    monkeypatch.setattr(scheduler_module.asyncio, "sleep", clock.sleep)
+
+    async def run():
+        scheduler = RateScheduler(200)
+        period = scheduler.period_ns
+        first = await scheduler.wait()
+        assert first == 10**9
+        for _ in range(20):
+            # a little work every tick doesn't push the schedule back
+            clock.work(1_000_000)
+            assert scheduler.finished() == 0
+            deadline = await scheduler.wait()
+        assert deadline - first == 20 * period
+        assert clock.now == deadline
+
+        # waking late is jitter, the next deadline stays on the grid
+        clock.late = 300_000
+        clock.work(1_000_000)
+        assert scheduler.finished() == 0
+        deadline = await scheduler.wait()
+        assert deadline == first + 21 * period
+        assert clock.now == deadline + 300_000
+
+        # work over several periods overruns the deadlines it covers, they are skipped
+        clock.work(17_500_000)
+        assert scheduler.finished() == 3
+        deadline = await scheduler.wait()
+        assert deadline - first == 25 * period
+
+        # a tick with nothing to evaluate still counts, and still keeps to the grid
+        clock.work(6_000_000)
+        assert scheduler.skip() == 1
+        assert await scheduler.wait() - deadline == 2 * period
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["ticks"] == 24
+    assert stats["missed"] == 4
+    assert stats["skipped"] == 1
+    assert stats["jitter"]["count"] == 24
+    assert stats["jitter"]["max"] == 300_000
+    assert "missed 4 | skipped 1" in RateScheduler.format(stats)
+
+    with pytest.raises(ValueError):
+        RateScheduler(0)
@@ -0,0 +1,123 @@
+from src.interfaces import SimplePVAInterface, SimlePVAInterfaceServer
+from src.interfaces.pipelined_puts import PipelinedPuts, PutTracker
+from src.logging_utils.make_logger import make_logger
+from src.pipeline import OutputDeadband
+from src.cli import publish_output
+from src.metrics import StageMetrics
+import asyncio
+import pytest
+import threading
+import time
+
+logger = make_logger("model_manager")
+
+
+def test_pipelined_puts_return_at_once_and_coalesce():
+    release = threading.Event()
+    written = []
+
+    def write(data):
+        # a slow output, the first batch blocks until released
+        release.wait(5)
+        written.append(dict(data))
+        return {"B": RuntimeError("put failed")} if "B" in data else {}
+
+    puts = PipelinedPuts(write, name="test")
+    start = time.perf_counter()
+    puts.put({"A": 1})
+    time.sleep(0.05)  # the writer picks up the first batch and blocks
+    puts.put({"A": 2, "B": 1})
+    puts.put({"A": 3})
+    assert time.perf_counter() - start < 1.0
+
+    stats = puts.tracker.stats(reset=False)
+    # A=2 was replaced by A=3 before it was issued
+    assert stats["superseded"] == 1
+    assert stats["in_flight"] == 3
+
+    release.set()
+    assert puts.flush(5)
+    puts.close()
+    assert written == [{"A": 1}, {"A": 3, "B": 1}]
+
+    stats = puts.tracker.stats()
+    assert stats["in_flight"] == 0
+    assert stats["completed"] == 2
+    assert stats["failed"] == 1
+    assert "B" in stats["errors"]
+    assert stats["latency"]["count"] == 2
+    assert "failed 1" in PutTracker.format(stats)
+
+
+def test_failed_puts_are_not_suppressed_by_the_output_deadband(monkeypatch):
+    monkeypatch.setenv("PUBLISH", "True")
+    fail = {"B"}
+
+    def write(data):
+        return {name: RuntimeError("put failed") for name in data if name in fail}
+
+    puts = PipelinedPuts(write, name="test")
+    deadband = OutputDeadband({}, default=0)
+    puts.tracker.on_failure(deadband.failed)
+    assert deadband.filter({"A": 1.0, "B": 1.0}) == {"A": 1.0, "B": 1.0}
+    puts.put({"A": 1.0, "B": 1.0})
+    assert puts.flush(5)
+    # B was never written, so the same value goes out again, A is suppressed
+    fail.clear()
+    assert deadband.filter({"A": 1.0, "B": 1.0}) == {"B": 1.0}
+    puts.put({"B": 1.0})
+    assert puts.flush(5)
+    assert deadband.filter({"A": 1.0, "B": 1.0}) == {}
+    puts.close()
+
+    class FailingOutput:
+        def put_many(self, data, **kwargs):
+            raise RuntimeError("put failed")
+
+    class Transformer:
+        def __init__(self):
+            self.updated = False
+            self.latest_transformed = {}
+
+        def handler(self, name, value):
+            self.latest_transformed[name] = value["value"]
+            self.updated = True
+
+    # with puts that wait for the write, put_many raising does the same
+    deadband = OutputDeadband({}, default=0)
+    metrics = StageMetrics(["output_transform", "put"])
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            publish_output(
+                {"Y": 2.0}, Transformer(), FailingOutput(), metrics, deadband
+            )
+        )
+    assert deadband.filter({"Y": 2.0}) == {"Y": 2.0}
+
+
+def test_SimplePVAInterface_pipelined_put_many():
+    variables = {
+        "test:puts:AA": {"name": "test:puts:AA", "proto": "pva"},
+        "test:puts:BB": {"name": "test:puts:BB", "proto": "pva"},
+    }
+    server = SimlePVAInterfaceServer({"variables": variables})
+    client = SimplePVAInterface(
+        {"variables": variables, "timeout": 2.0, "pipelined_puts": True}
+    )
+    client.put_many({"test:puts:AA": 1, "test:puts:BB": 2})
+    assert client.flush(5)
+    stats = client.put_tracker.stats()
+    assert stats["completed"] == 2
+    assert stats["failed"] == 0
+    assert server.get("test:puts:AA")[1]["value"] == 1
+    assert server.get("test:puts:BB")[1]["value"] == 2
+
+    # writes are waited for unless pipelined puts are asked for
+    blocking = SimplePVAInterface({"variables": variables, "timeout": 2.0})
+    assert blocking.put_tracker is None
+    blocking.put_many({"test:puts:AA": 3})
+    assert server.get("test:puts:AA")[1]["value"] == 3
+
+    blocking.close()
+    client.close()
+    server.close()
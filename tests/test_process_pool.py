@@ -0,0 +1,96 @@
+from src.pipeline import ProcessInferenceExecutor
+import numpy as np
+import pytest
+import time
+
+MODEL = """
+import numpy as np
+import os
+
+
+class Model:
+    def evaluate(self, inputs):
+        return {"y": float(np.sum(inputs["image"])) + inputs["x"], "pid": os.getpid()}
+
+
+class ModelFactory:
+    def get_model(self):
+        return Model()
+"""
+
+
+def wait_released(executor):
+    # blocks are released by a done callback, which can run just after result() returns
+    deadline = time.time() + 5
+    while len(executor.blocks.free) != len(executor.blocks.blocks):
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_process_executor_shared_memory_in_order(tmp_path):
+    path = tmp_path / "model.py"
+    path.write_text(MODEL)
+    executor = ProcessInferenceExecutor(
+        "local",
+        {"model_path": str(path), "model_factory_class": "ModelFactory"},
+        workers=2,
+        shm_min_bytes=1024,
+    )
+    try:
+        image = np.ones((64, 64))
+        futures = [executor.submit({"image": image * i, "x": i}) for i in range(8)]
+        outputs = [future.result(timeout=30) for future in futures]
+        assert [output["y"] for output in outputs] == [4096.0 * i + i for i in range(8)]
+
+        # every image went through shared memory and the blocks are reused once released
+        assert 0 < len(executor.blocks.blocks) <= 8
+        n_blocks = len(executor.blocks.blocks)
+        wait_released(executor)
+        executor.submit({"image": image, "x": 0}).result(timeout=30)
+        wait_released(executor)
+        assert len(executor.blocks.blocks) == n_blocks
+    finally:
+        executor.close()
+
+
+def test_process_executor_fails_when_a_worker_cant_load(tmp_path):
+    # only the second worker to start fails, the pool must not be reported ready
+    path = tmp_path / "model.py"
+    path.write_text(
+        MODEL.replace(
+            "    def get_model(self):\n",
+            "    def get_model(self):\n"
+            "        import glob\n"
+            f"        marker = {str(tmp_path / 'started')!r}\n"
+            "        if glob.glob(marker):\n"
+            "            raise RuntimeError('no model here')\n"
+            "        open(marker, 'w').close()\n",
+        )
+    )
+    start = time.time()
+    with pytest.raises(RuntimeError, match="failed to load the model"):
+        ProcessInferenceExecutor(
+            "local",
+            {"model_path": str(path), "model_factory_class": "ModelFactory"},
+            workers=2,
+        )
+    assert time.time() - start < 60
+
+
+def test_process_executor_fails_when_a_worker_dies_loading(tmp_path):
+    # a worker killed while loading never reports, the broken pool must fail the start
+    path = tmp_path / "model.py"
+    path.write_text(
+        MODEL.replace(
+            "    def get_model(self):\n",
+            "    def get_model(self):\n        os._exit(1)\n",
+        )
+    )
+    start = time.time()
+    with pytest.raises(RuntimeError, match="failed to load the model"):
+        ProcessInferenceExecutor(
+            "local",
+            {"model_path": str(path), "model_factory_class": "ModelFactory"},
+            workers=2,
+        )
+    assert time.time() - start < 60
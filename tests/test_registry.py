@@ -0,0 +1,46 @@
+from src.registry import LazyRegistry, startup_report
+import subprocess, sys, os
+import pytest
+
+
+def test_lazy_registry_imports_on_lookup():
+    registry = LazyRegistry("model_manager.test_registry")
+    registry.register("json_decoder", "json.decoder:JSONDecoder")
+    registry.register("direct", dict)
+
+    assert "json_decoder" in registry
+    assert registry.keys() == ["direct", "json_decoder"]
+    assert registry.import_times == {}
+
+    import json.decoder
+
+    assert registry["json_decoder"] is json.decoder.JSONDecoder
+    assert registry["direct"] is dict
+    assert "json_decoder" in registry.import_times
+    assert "model_manager.test_registry:json_decoder" in startup_report()
+
+    with pytest.raises(KeyError):
+        registry["missing"]
+
+
+def test_cli_import_does_not_load_backends():
+    # a cold import of the cli shouldn't pull in any optional backend
+    code = (
+        "import sys, src.cli; "
+        "print(','.join(m for m in ['p4p', 'k2eg', 'h5py', 'mlflow', 'torch', 'sympy'] if m in sys.modules))"
+    )
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.join(os.path.dirname(__file__), "..", "model_manager")
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+
+
+def test_class_names_still_importable():
+    from src.transformers import SimpleTransformer
+    from src.interfaces import SimlePVAInterfaceServer
+
+    assert SimpleTransformer.__name__ == "SimpleTransformer"
+    assert SimlePVAInterfaceServer.__name__ == "SimlePVAInterfaceServer"
@@ -5,7 +5,12 @@ from src.transformers.BaseTransformers import (
 )
 from src.transformers.CompoundTransformer import CompoundTransformer
 from src.logging_utils.make_logger import get_logger
+from src.cli import publish_output, report_stats, transformer_children
+from src.metrics import StageMetrics
 import numpy as np
+import asyncio
+import logging
+import pytest
 import math
 
 logger = get_logger()
@@ -116,6 +121,36 @@ def test_ca_image_transformer():
     assert img_transformer.latest_transformed["img_2"][2, 3] == 12
 
 
+
+def test_ca_image_transformer_views():
+    # frames are read-only views over the received buffer in both unfoldings
+    config = {
+        "variables": {
+            "img": {
+                "img_ch": "IMG",
+                "img_x_ch": "IMG_X",
+                "img_y_ch": "IMG_Y",
+                "unfold": "column_major",
+            },
+        },
+    }
+    for unfold in ["row_major", "column_major"]:
+        config["variables"]["img"]["unfold"] = unfold
+        img_transformer = CAImageTransfomer(config)
+        frame = np.arange(12, dtype=float)
+        img_transformer.handler("IMG_X", {"value": 4})
+        img_transformer.handler("IMG_Y", {"value": 3})
+        img_transformer.handler("IMG", {"value": frame})
+
+        image = img_transformer.latest_transformed["img"]
+        assert np.shares_memory(image, frame)
+        assert not image.flags.writeable
+        if unfold == "row_major":
+            assert image.shape == (3, 4) and image[0, 1] == 1
+        else:
+            assert image.shape == (4, 3) and image[0, 1] == 1 and image[1, 0] == 3
+
+
 config4 = {
     "transformers": {
         "transformer_1": {"type": "SimpleTransformer", "config": config2},
@@ -189,3 +224,224 @@ def test_pass_through_transformer():
     assert pt.latest_transformed["IMG1"].shape == (3, 3)
     assert pt.latest_transformed["var1"] == 1
     print(pt.latest_transformed)
+
+
+config6 = {
+    "variables": {
+        "x1": {"formula": "LUME:TEST:A * 2 + LUME:TEST:B"},
+        "x2": {"formula": "1.5"},
+    },
+    "symbols": ["LUME:TEST:A", "LUME:TEST:B"],
+}
+
+
+def test_simple_transformer_compiled_formulas():
+    st = SimpleTransformer(config6)
+
+    st.handler("LUME:TEST:A", {"value": 2})
+    st.handler("LUME:TEST:B", {"value": 3})
+    assert st.latest_transformed["x1"] == 7
+    assert st.latest_transformed["x2"] == 1.5
+
+    # formulas are compiled once, later updates reuse them
+    st.handler("LUME:TEST:A", {"value": 4})
+    assert st.latest_transformed["x1"] == 11
+
+
+def test_simple_transformer_unknown_symbol():
+    config = {"variables": {"x1": {"formula": "A1 + C1"}}, "symbols": ["A1"]}
+    try:
+        SimpleTransformer(config)
+        assert False, "unknown symbol should be rejected at construction"
+    except Exception as e:
+        assert "C1" in str(e)
+
+
+def test_simple_transformer_incremental_updates():
+    config = {
+        "variables": {
+            "x1": {"formula": "A1 * 2"},
+            "x2": {"formula": "B1 + 1"},
+            "x3": {"formula": "A1 + B1"},
+        },
+        "symbols": ["A1", "B1", "C1"],
+    }
+    st = SimpleTransformer(config)
+    assert st.dependents == {"A1": ["x1", "x3"], "B1": ["x2", "x3"], "C1": []}
+
+    st.handler("A1", {"value": 1})
+    st.handler("B1", {"value": 2})
+    assert st.missing == 1 and st.updated == False
+    st.handler("C1", {"value": 0})
+    assert st.missing == 0
+    assert st.dirty == {"x1", "x2", "x3"}
+    assert st.latest_transformed == {"x1": 2, "x2": 3, "x3": 3}
+
+    st.dirty.clear()
+    st.handler("A1", {"value": 5})
+    assert st.dirty == {"x1", "x3"}
+    assert st.latest_transformed == {"x1": 10, "x2": 3, "x3": 7}
+
+    # a symbol no formula uses doesn't recompute anything
+    st.dirty.clear()
+    st.updated = False
+    st.handler("C1", {"value": 1})
+    assert st.dirty == set() and st.updated == False
+
+
+def test_simple_transformer_waveforms():
+    config = {
+        "variables": {
+            "scaled": {"formula": "GAIN * WAVE + OFFSET"},
+            "ratio": {"formula": "WAVE / REF"},
+            "image": {"formula": "IMG - OFFSET"},
+            "offset": {"formula": "OFFSET * 2"},
+        },
+        "symbols": ["WAVE", "REF", "IMG", "GAIN", "OFFSET"],
+    }
+    st = SimpleTransformer(config)
+    wave = np.linspace(0, 1, 10000, dtype=np.float32)
+    st.handler("WAVE", {"value": wave})
+    st.handler("REF", {"value": [1.0, 2.0] * 5000})
+    st.handler("IMG", {"value": np.ones((4, 6), dtype=np.float32)})
+    st.handler("GAIN", {"value": 2})
+    st.handler("OFFSET", {"value": 0.5})
+
+    # scalars broadcast against waveforms and images, dtypes follow numpy
+    scaled = st.latest_transformed["scaled"]
+    assert scaled.dtype == np.float32 and scaled.shape == (10000,)
+    np.testing.assert_allclose(scaled, 2 * wave + 0.5)
+    assert st.latest_transformed["ratio"][1] == wave[1] / 2
+    image = st.latest_transformed["image"]
+    assert image.shape == (4, 6) and image.dtype == np.float32
+    assert np.all(image == 0.5)
+    # scalar formulas are still floats
+    assert st.latest_transformed["offset"] == 1.0
+    assert type(st.latest_transformed["offset"]) == float
+
+    # waveforms that can't broadcast fail like any other bad input
+    try:
+        st.handler("REF", {"value": np.ones(3)})
+        assert False, "mismatched waveform lengths should raise"
+    except ValueError:
+        pass
+
+
+def test_compound_transformer_routing():
+    config = {
+        "transformers": {
+            "a": {
+                "type": "SimpleTransformer",
+                "config": {
+                    "variables": {"xa": {"formula": "A1 + S1"}, "ya": {"formula": "A1"}},
+                    "symbols": ["A1", "S1"],
+                },
+            },
+            "b": {
+                "type": "SimpleTransformer",
+                "config": {"variables": {"xb": {"formula": "S1 * 2"}}, "symbols": ["S1"]},
+            },
+        }
+    }
+    ct = CompoundTransformer(config)
+    assert [child for child, _ in ct.routes["S1"]] == ["a", "b"]
+    assert [child for child, _ in ct.routes["A1"]] == ["a"]
+
+    merged = ct.latest_transformed
+    ct.handler("A1", {"value": 1})
+    ct.handler("S1", {"value": 2})
+    assert ct.latest_transformed is merged
+    assert merged == {"xa": 3, "ya": 1, "xb": 4}
+
+    ct.dirty.clear()
+    ct.handler("S1", {"value": 3})
+    assert ct.dirty == {"xa", "xb"}
+    assert merged == {"xa": 4, "ya": 1, "xb": 6}
+    assert ct.child_metrics.summary(window=False)["a"]["count"] == 3
+
+
+def test_dirty_outputs_limit_puts(monkeypatch):
+    monkeypatch.setenv("PUBLISH", "True")
+
+    class RecordingOutput:
+        def __init__(self):
+            self.puts = []
+
+        def put_many(self, data, **kwargs):
+            self.puts.append(dict(data))
+
+    out_transformer = SimpleTransformer(
+        {
+            "variables": {
+                "Y": {"formula": "y * 2"},
+                "Z": {"formula": "z"},
+                "VERSION": {"formula": "3"},
+            },
+            "symbols": ["y", "z"],
+        }
+    )
+    output = RecordingOutput()
+    metrics = StageMetrics(["output_transform", "put"])
+    asyncio.run(
+        publish_output({"y": 1.0, "z": 2.0}, out_transformer, output, metrics)
+    )
+    asyncio.run(publish_output({"y": 2.0}, out_transformer, output, metrics))
+    # the first put has every output, the second only what was recomputed
+    assert output.puts == [{"Y": 2.0, "Z": 2.0, "VERSION": 3.0}, {"Y": 4.0}]
+    assert out_transformer.dirty == set()
+
+
+def test_failed_put_is_retried_next_cycle(monkeypatch):
+    monkeypatch.setenv("PUBLISH", "True")
+
+    class FlakyOutput:
+        def __init__(self):
+            self.puts = []
+            self.fail = True
+
+        def put_many(self, data, **kwargs):
+            if self.fail:
+                self.fail = False
+                raise RuntimeError("put failed")
+            self.puts.append(dict(data))
+
+    out_transformer = SimpleTransformer(
+        {
+            "variables": {"Y": {"formula": "y * 2"}, "VERSION": {"formula": "3"}},
+            "symbols": ["y"],
+        }
+    )
+    output = FlakyOutput()
+    metrics = StageMetrics(["output_transform", "put"])
+    with pytest.raises(RuntimeError, match="put failed"):
+        asyncio.run(publish_output({"y": 1.0}, out_transformer, output, metrics))
+    # the constant output isn't recomputed, it still has to be put on the next cycle
+    asyncio.run(publish_output({"y": 2.0}, out_transformer, output, metrics))
+    assert output.puts == [{"Y": 4.0, "VERSION": 3.0}]
+    assert out_transformer.dirty == set()
+
+
+def test_compound_child_metrics_are_reported(caplog, monkeypatch):
+    ct = CompoundTransformer(
+        {
+            "transformers": {
+                "a": {
+                    "type": "SimpleTransformer",
+                    "config": {"variables": {"xa": {"formula": "A1"}}, "symbols": ["A1"]},
+                },
+            }
+        }
+    )
+    st = SimpleTransformer(config1)
+    children = transformer_children(ct, st)
+    assert children == [ct.child_metrics]
+    ct.handler("A1", {"value": 1})
+
+    # the package logger doesn't propagate to the root logger caplog listens on
+    monkeypatch.setattr(logger, "propagate", True)
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        report_stats(None, children=children)
+    assert "transformer children: a: p50" in caplog.text
+    # the window was rolled into the totals
+    assert ct.child_metrics.summary()["a"]["count"] == 0
+    assert ct.child_metrics.summary(window=False)["a"]["count"] == 1